@@ -0,0 +1,81 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Compare deciding recipe results by trying every condition check on every
+task with the compiled decision table. Run as:
+
+    python3 -m benchmarks.decision [--tasks N] [--repeat N]
+"""
+import argparse
+import timeit
+
+from defusedxml.ElementTree import fromstring
+
+from benchmarks.generator import generate_job
+from skt.decision import DecisionTable, get_task_features
+from skt.decision import result_condition_checks
+from skt.model import summarize_recipe_set
+
+
+def decide_linear(recipe):
+    """Try all condition checks on all tasks, like before compiling."""
+    prev_task = None
+    for task in recipe.tasks:
+        for cond_check in result_condition_checks:
+            retval = cond_check(task, prev_task)
+            if retval is not None:
+                return retval
+        prev_task = task
+
+    return None
+
+
+def decide_table(table, recipe):
+    """Look the tasks up in the decision table."""
+    prev_task = None
+    for task in recipe.tasks:
+        check = table.lookup(get_task_features(task, prev_task))
+        if check is not None:
+            return check.retval
+        prev_task = task
+
+    return None
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=20)
+    parser.add_argument('--tasks', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # every task but the last one passed, so all of them are checked
+    root = fromstring(generate_job(1, args.recipes, args.tasks, 0))
+    for recipe in root.iter('recipe'):
+        recipe.findall('task')[-1].attrib['result'] = 'Fail'
+    recipes = summarize_recipe_set(root)
+
+    table = DecisionTable(result_condition_checks)
+    for name, func in [('linear', decide_linear),
+                       ('table', lambda recipe: decide_table(table, recipe))]:
+        seconds = min(timeit.repeat(lambda: [func(recipe)
+                                             for recipe in recipes],
+                                    number=1, repeat=args.repeat))
+        print(f'{name:6} {args.recipes} recipes x {args.tasks + 1} tasks: '
+              f'{seconds * 1000:.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Stand-in for the bkr command line client, supporting the job-results,
+job-submit and job-cancel commands skt runs. It talks to a lab served by
+benchmarks.lab at $SKT_FAKE_BEAKER_HUB. Calls failed by the lab print one of
+the error strings the bkr transport retries on. Install it as bkr with a
+wrapper like:
+
+    #!/bin/sh
+    exec python3 -m benchmarks.fakebkr "$@"
+"""
+import argparse
+import os
+import random
+import sys
+import xmlrpc.client
+
+from skt.beaker import BkrTransport
+
+
+def main(argv=None):
+    """
+    Run a bkr command.
+
+    Returns:
+        Exit code.
+    """
+    parser = argparse.ArgumentParser(prog='bkr', description=__doc__)
+    subparsers = parser.add_subparsers(dest='command')
+    parser_results = subparsers.add_parser('job-results')
+    parser_results.add_argument('--prettyxml', action='store_true')
+    parser_results.add_argument('taskspec')
+    parser_submit = subparsers.add_parser('job-submit')
+    parser_submit.add_argument('--job-owner')
+    parser_submit.add_argument('jobxml', nargs='?', default='-')
+    parser_cancel = subparsers.add_parser('job-cancel')
+    parser_cancel.add_argument('job_ids', nargs='+')
+    args = parser.parse_args(argv)
+
+    hub = xmlrpc.client.ServerProxy(
+        os.environ['SKT_FAKE_BEAKER_HUB'] + '/RPC2', allow_none=True
+    )
+    try:
+        if args.command == 'job-results':
+            sys.stdout.write(hub.taskactions.to_xml(args.taskspec, False,
+                                                    True, True))
+        elif args.command == 'job-submit':
+            jobid = hub.jobs.upload(sys.stdin.read())
+            print(f"Submitted: ['{jobid}']")
+        elif args.command == 'job-cancel':
+            for job_id in args.job_ids:
+                hub.taskactions.stop(job_id, 'cancel', 'Cancelled by skt')
+                print(f'Cancelled {job_id}')
+        else:
+            parser.print_usage(sys.stderr)
+            return 2
+    except xmlrpc.client.ProtocolError:
+        err_strings = BkrTransport.submit_err_strings \
+            if args.command == 'job-submit' \
+            else BkrTransport.results_err_strings
+        sys.stderr.write(random.choice(err_strings) + '\n')
+        return 1
+    except xmlrpc.client.Fault as exc:
+        sys.stderr.write(exc.faultString + '\n')
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+In-memory and local stand-ins for Beaker, used by the benchmarks and the
+tests: a transport keeping the jobs in memory and a server answering the
+XML-RPC calls of a Beaker hub.
+"""
+import itertools
+import socketserver
+import threading
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+
+from defusedxml.ElementTree import fromstring
+from defusedxml.ElementTree import tostring
+
+
+def get_taskspec_results(job, taskspec):
+    """Return results of a job or of one of its recipe sets, like
+    'bkr job-results' does.
+
+    Args:
+        job:      xml root of the job
+        taskspec: ID of the job or recipe set.
+    Returns:
+        xml root
+    """
+    for recipe_set in job.findall('recipeSet'):
+        if taskspec == 'RS:{}'.format(recipe_set.attrib['id']):
+            return recipe_set
+
+    return job
+
+
+class FakeTransport:
+    """In-memory Beaker transport. Submitted jobs get new IDs and all their
+    recipes and tasks pass right away, unless the job is given in advance."""
+
+    def __init__(self, *jobs):
+        """
+        Args:
+            jobs: xml roots of job results, returned for the first
+                  submissions
+        """
+        self.jobs = {}
+        self.queued_jobs = list(jobs)
+        self.job_ids = itertools.count(1)
+        self.submitted = []
+        self.cancelled = []
+        self.calls = []
+
+    def job_results(self, taskspec):
+        """Return the results XML for a job or recipe set."""
+        self.calls.append(taskspec)
+        job = self.jobs[taskspec] if taskspec.startswith('J:') else \
+            next(job for job in self.jobs.values()
+                 if job.find('recipeSet[@id="{}"]'.format(taskspec[3:]))
+                 is not None)
+        return tostring(get_taskspec_results(job, taskspec))
+
+    def job_submit(self, xml, jobowner=None):
+        """Submit a job, return its ID."""
+        # pylint: disable=unused-argument
+        self.submitted.append(xml)
+        job_number = next(self.job_ids)
+        if self.queued_jobs:
+            job = self.queued_jobs.pop(0)
+        else:
+            job = fromstring(xml)
+            for set_number, recipe_set in enumerate(job.findall('recipeSet')):
+                set_id = '{}{}'.format(job_number, set_number)
+                recipe_set.attrib['id'] = set_id
+                for recipe_number, recipe in \
+                        enumerate(recipe_set.findall('recipe')):
+                    recipe.attrib.update({
+                        'id': '{}{}'.format(set_id, recipe_number),
+                        'status': 'Completed', 'result': 'Pass'
+                    })
+                    for task in recipe.findall('task'):
+                        task.attrib.update({'status': 'Completed',
+                                            'result': 'Pass'})
+
+        jobid = 'J:{}'.format(job_number)
+        self.jobs[jobid] = job
+        return jobid
+
+    def job_cancel(self, job_id):
+        """Cancel a job."""
+        self.cancelled.append(job_id)
+        return True
+
+    async def async_job_results(self, taskspec):
+        """Same as job_results()."""
+        return self.job_results(taskspec)
+
+    async def async_job_submit(self, xml, jobowner=None):
+        """Same as job_submit()."""
+        return self.job_submit(xml, jobowner)
+
+    async def async_job_cancel(self, job_id):
+        """Same as job_cancel()."""
+        return self.job_cancel(job_id)
+
+
+class RequestHandler(SimpleXMLRPCRequestHandler):
+    """Keep-alive request handler counting the connections it serves."""
+    protocol_version = 'HTTP/1.1'
+    rpc_paths = ()
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        # pylint: disable=redefined-builtin
+        pass
+
+
+class BeakerServer(socketserver.ThreadingMixIn, SimpleXMLRPCServer):
+    """
+    Beaker hub stand-in. Serves job results from self.results, records
+    logins, submitted and cancelled jobs.
+    """
+    # pylint: disable=too-many-instance-attributes
+    daemon_threads = True
+    handler_class = RequestHandler
+
+    def __init__(self, results=None, port=0):
+        super().__init__(('127.0.0.1', port),
+                         requestHandler=self.handler_class,
+                         allow_none=True, logRequests=False)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = []
+        self.submitted = []
+        self.cancelled = []
+        self.results = results or {}
+        self.thread = None
+
+        self.register_function(self.login_password, 'auth.login_password')
+        self.register_function(self.upload, 'jobs.upload')
+        self.register_function(self.to_xml, 'taskactions.to_xml')
+        self.register_function(self.stop, 'taskactions.stop')
+
+    @property
+    def url(self):
+        """URL of the hub."""
+        return 'http://{}:{}'.format(*self.server_address)
+
+    def start(self):
+        """Serve requests in a background thread."""
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       kwargs={'poll_interval': 0.05},
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def stop_serving(self):
+        """Stop the background thread and close the socket."""
+        self.shutdown()
+        self.server_close()
+
+    def login_password(self, username, password, proxy_user=None):
+        """auth.login_password"""
+        self.logins.append((username, password, proxy_user))
+        return username
+
+    def upload(self, jobxml):
+        """jobs.upload"""
+        with self.lock:
+            self.submitted.append(jobxml)
+            return 'J:{}'.format(len(self.submitted))
+
+    def to_xml(self, taskid, clone=False, exclude_enclosing_job=True,
+               include_logs=True):
+        """taskactions.to_xml"""
+        # pylint: disable=unused-argument
+        return self.results[taskid]
+
+    def stop(self, taskid, stop_type, msg):
+        """taskactions.stop"""
+        self.cancelled.append((taskid, stop_type, msg))
+        return True
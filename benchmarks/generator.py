@@ -0,0 +1,170 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Generator of synthetic Beaker job results."""
+import random
+from xml.sax.saxutils import quoteattr
+
+from skt.results import EWD_TEXT
+
+KPKGINSTALL_URL = ('https://github.com/CKI-project/tests-beaker/archive/'
+                   'master.zip#distribution/kpkginstall')
+
+
+def generate_task(task_id, name, result='Pass', status='Completed',
+                  fetch_url=None, log_size=0, result_text='', waived=False):
+    """
+    Generate the results XML of a task.
+
+    Args:
+        task_id:     ID of the task.
+        name:        Name of the task.
+        result:      Result of the task.
+        status:      Status of the task.
+        fetch_url:   URL the task is fetched from, or None.
+        log_size:    Approximate size of the logged result text, bytes.
+        result_text: Text of the task result, padded to log_size.
+        waived:      True if the task should be waived.
+
+    Returns:
+        Task XML string.
+    """
+    # pylint: disable=too-many-arguments
+    parts = [f'<task id="{task_id}" name={quoteattr(name)} '
+             f'result="{result}" status="{status}" '
+             f'avg_time="600" duration="00:05:00">']
+    if fetch_url:
+        parts.append(f'<fetch url={quoteattr(fetch_url)}/>')
+    if waived:
+        parts.append('<params><param name="CKI_WAIVED" value="true"/>'
+                     '</params>')
+    parts.append('<logs>' + ''.join(
+        f'<log name="log{i}.txt" href="http://example.com/{task_id}/{i}"/>'
+        for i in range(3)
+    ) + '</logs>')
+
+    text = result_text + 'x' * max(log_size - len(result_text), 0)
+    parts.append(f'<results><result path="{name}" result="{result}" '
+                 f'score="0" id="{task_id}">{text}<logs><log name="out" '
+                 f'href="http://example.com/{task_id}/out"/></logs>'
+                 f'</result></results>')
+    parts.append('</task>')
+
+    return ''.join(parts)
+
+
+def generate_recipe_tasks(rng, tasks, waived=0.0, fault=None):
+    """
+    Pick the (name, result, status, waived, result text) of the tasks of a
+    recipe, after kpkginstall.
+
+    Args:
+        rng:    random.Random to pick the waived and faulty tasks with.
+        tasks:  Number of tasks.
+        waived: Share of the tasks which are waived, between 0 and 1.
+        fault:  None if all tasks pass, 'panic' if a task panics, 'abort' if
+                a task aborts, or 'ewd' if the external watchdog expires in
+                the boot test. Tasks after the fault are aborted.
+
+    Returns:
+        List of tuples.
+    """
+    specs = [(f'/test/{number}', 'Pass', 'Completed',
+              rng.random() < waived, '') for number in range(tasks)]
+    if fault == 'ewd':
+        specs.insert(0, ('Boot test', 'Warn', 'Aborted', False, EWD_TEXT))
+        faulty = 0
+    elif fault in ('panic', 'abort') and specs:
+        faulty = rng.randrange(len(specs))
+        name, _, _, is_waived, _ = specs[faulty]
+        specs[faulty] = (name, 'Panic', 'Aborted', is_waived, '') \
+            if fault == 'panic' else (name, 'Warn', 'Aborted', is_waived, '')
+    else:
+        return specs
+
+    for index in range(faulty + 1, len(specs)):
+        name, _, _, is_waived, _ = specs[index]
+        specs[index] = (name, 'Warn', 'Aborted', is_waived, '')
+
+    return specs
+
+
+def generate_job(recipe_sets=10, recipes=4, tasks=20, log_size=1024,
+                 waived=0.0, panics=0.0, aborts=0.0, ewd=0.0, seed=0):
+    """
+    Generate synthetic Beaker job results. By default every task passed.
+
+    Args:
+        recipe_sets: Number of recipe sets.
+        recipes:     Number of recipes per recipe set.
+        tasks:       Number of tasks per recipe, besides kpkginstall.
+        log_size:    Approximate size of the logged text of each task
+                     result, bytes.
+        waived:      Share of the tasks which are waived.
+        panics:      Share of the recipes where a task panics.
+        aborts:      Share of the recipes where a task aborts.
+        ewd:         Share of the recipes where the external watchdog expires
+                     in the boot test.
+        seed:        Seed picking the waived tasks and the faulty recipes, so
+                     the same arguments always generate the same results.
+
+    Returns:
+        Job results XML string.
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    rng = random.Random(seed)
+    parts = ['<job id="1" group="cki" result="Pass" status="Completed">'
+             '<whiteboard>skt synthetic</whiteboard>']
+    recipe_id = 1
+    task_id = 1
+    for set_id in range(1, recipe_sets + 1):
+        parts.append(f'<recipeSet id="{set_id}">')
+        for _ in range(recipes):
+            draw = rng.random()
+            fault = None
+            for name, share in [('panic', panics), ('abort', aborts),
+                                ('ewd', ewd)]:
+                if draw < share:
+                    fault = name
+                    break
+                draw -= share
+            result, status = {None: ('Pass', 'Completed'),
+                              'panic': ('Panic', 'Aborted')}.get(
+                                  fault, ('Warn', 'Aborted'))
+
+            parts.append(
+                f'<recipe id="{recipe_id}" '
+                f'system="host{recipe_id}.example.com" '
+                f'result="{result}" status="{status}"><distroRequires>'
+                f'<distro_name op="=" value="Fedora"/></distroRequires>'
+                f'<hostRequires><and><arch op="=" value="x86_64"/></and>'
+                f'</hostRequires><logs><log name="console.log" '
+                f'href="http://example.com/{recipe_id}/console.log"/></logs>'
+            )
+            parts.append(generate_task(task_id, '/distribution/kpkginstall',
+                                       fetch_url=KPKGINSTALL_URL,
+                                       log_size=log_size))
+            task_id += 1
+            for name, task_result, task_status, is_waived, text in \
+                    generate_recipe_tasks(rng, tasks, waived, fault):
+                parts.append(generate_task(
+                    task_id, name, task_result, task_status,
+                    log_size=log_size, result_text=text, waived=is_waived
+                ))
+                task_id += 1
+            parts.append('</recipe>')
+            recipe_id += 1
+        parts.append('</recipeSet>')
+    parts.append('</job>')
+
+    return ''.join(parts)
@@ -0,0 +1,531 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Simulated Beaker lab for load testing skt without real machines. Submitted
+recipes wait in the queue, install, run their tasks one after another and
+pass, fail, abort, panic or hit the external watchdog. Calls can be slowed
+down and failed on a schedule. Serve a lab over XML-RPC, for the HTTP
+transport or the fake bkr client in benchmarks.fakebkr, with:
+
+    python3 -m benchmarks.lab [--port N] [--speed N] [--abort SHARE] ...
+"""
+import argparse
+import collections
+import itertools
+import logging
+import random
+import threading
+import time
+import xmlrpc.client
+
+from defusedxml.ElementTree import fromstring, tostring
+
+from benchmarks.fakes import BeakerServer, RequestHandler
+from skt.beaker import HUB_COMMANDS
+from skt.results import EWD_TEXT
+
+# Final (result, status) of the recipes of each scenario
+SCENARIO_RESULTS = {
+    'pass': ('Pass', 'Completed'),
+    'fail': ('Fail', 'Completed'),
+    'abort': ('Warn', 'Aborted'),
+    'panic': ('Panic', 'Aborted'),
+    'ewd': ('Warn', 'Aborted'),
+}
+
+
+class FaultSchedule:
+    """Latency and failures injected into the calls to a lab."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, outages=(),
+                 seed=0):
+        """
+        Args:
+            latency:    Delay added to every call, seconds.
+            jitter:     Maximum random delay added on top of latency,
+                        seconds.
+            error_rate: Share of the calls which fail, between 0 and 1.
+            outages:    List of (start, end) tuples of seconds since the
+                        schedule was created, all calls in between fail.
+            seed:       Seed of the random delays and failures.
+        """
+        # pylint: disable=too-many-arguments
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.outages = list(outages)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def before_call(self):
+        """
+        Delay a call.
+
+        Returns:
+            True if the call should fail, False otherwise.
+        """
+        with self.lock:
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+            fail = self.rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+
+        elapsed = time.monotonic() - self.started
+        return fail or any(start <= elapsed < end
+                           for start, end in self.outages)
+
+
+class SimulatedRecipe:
+    """Timeline of a recipe, all times are lab seconds."""
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, element, scenario, start, running, task_ends, final):
+        """
+        Args:
+            element:   etree node of the recipe, updated with its state.
+            scenario:  Name of the scenario, see SCENARIO_RESULTS.
+            start:     Time the recipe leaves the queue and installs.
+            running:   Time the first task starts.
+            task_ends: List of times each task finishes.
+            final:     List of final (result, status) of each task.
+        """
+        # pylint: disable=too-many-arguments
+        self.element = element
+        self.recipe_id = 'R:' + element.attrib['id']
+        self.scenario = scenario
+        self.start = start
+        self.running = running
+        self.task_ends = task_ends
+        self.final = final
+        # Index of the task hitting the external watchdog, or None
+        self.ewd_index = next((index for index, (_, status) in enumerate(final)
+                               if status == 'Aborted'), None) \
+            if scenario == 'ewd' else None
+        self.finish = task_ends[-1] if task_ends else running
+        self.cancelled = None
+
+    @property
+    def end(self):
+        """Time the recipe finishes or got cancelled."""
+        if self.cancelled is not None:
+            return min(self.finish, self.cancelled)
+
+        return self.finish
+
+    def update(self, now):
+        """Set the attributes of the recipe and its tasks to their state at
+        lab time now."""
+        tasks = self.element.findall('task')
+        cancelled = self.cancelled is not None and \
+            self.cancelled < self.finish and now >= self.cancelled
+        done = min(now, self.end)
+        current = True
+        for index, task in enumerate(tasks):
+            if now >= self.running and self.task_ends[index] <= done:
+                result, status = self.final[index]
+                if index == self.ewd_index and task.find('results') is None:
+                    task.append(fromstring(
+                        f'<results><result path="/" result="Warn">'
+                        f'{EWD_TEXT}</result></results>'
+                    ))
+            elif cancelled:
+                result, status = 'Warn', 'Cancelled'
+            elif now >= self.running and current:
+                result, status = 'New', 'Running'
+                current = False
+            else:
+                result, status = 'New', 'New'
+            task.attrib.update({'result': result, 'status': status})
+
+        if cancelled:
+            result, status = 'Warn', 'Cancelled'
+        elif now >= self.finish:
+            result, status = SCENARIO_RESULTS[self.scenario]
+        elif now >= self.running:
+            result, status = 'New', 'Running'
+        elif now >= self.start:
+            result, status = 'New', 'Installing'
+        else:
+            result, status = 'New', 'Queued'
+        self.element.attrib.update({'result': result, 'status': status})
+
+        return now >= self.end
+
+
+class Lab:
+    """
+    Simulated Beaker lab. Times are scaled down by speed, so an hour long
+    job finishes in a minute of real time with speed 60.
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, speed=60.0, queue_delay=600, install_time=300,
+                 task_time=300, scenarios=None, faults=None, seed=0):
+        """
+        Args:
+            speed:        Number of lab seconds passing in a real second.
+            queue_delay:  Maximum time a recipe set waits for machines, lab
+                          seconds.
+            install_time: Time to install a recipe's machine, lab seconds.
+            task_time:    Average run time of a task, lab seconds.
+            scenarios:    Dictionary of the shares of the recipes which
+                          'fail', 'abort' in the first task, 'panic' or hit
+                          the external watchdog in the boot test ('ewd'). The
+                          other recipes pass.
+            faults:       FaultSchedule of the calls, or None.
+            seed:         Seed of the timelines and scenarios.
+        """
+        # pylint: disable=too-many-arguments
+        self.speed = speed
+        self.queue_delay = queue_delay
+        self.install_time = install_time
+        self.task_time = task_time
+        self.scenarios = scenarios or {}
+        self.faults = faults or FaultSchedule()
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.ids = itertools.count(1)
+        self.jobs = {}
+        # Job ID and node of each recipe set
+        self.recipe_sets = {}
+        # SimulatedRecipe objects of each job
+        self.job_recipes = collections.defaultdict(list)
+        self.cancelled = []
+        # Calls and failed calls by Beaker command
+        self.calls = collections.Counter()
+        self.failed_calls = collections.Counter()
+
+    def now(self):
+        """Current lab time, seconds."""
+        return (time.monotonic() - self.started) * self.speed
+
+    def real_time(self, lab_time):
+        """Value of time.monotonic() at a lab time."""
+        return self.started + lab_time / self.speed
+
+    def fail_call(self, command):
+        """
+        Count a call and apply the fault schedule to it.
+
+        Args:
+            command: Beaker command of the call, like 'job-results'.
+
+        Returns:
+            True if the call should fail, False otherwise.
+        """
+        fail = self.faults.before_call()
+        with self.lock:
+            self.calls[command] += 1
+            if fail:
+                self.failed_calls[command] += 1
+
+        return fail
+
+    def __pick_scenario(self):
+        draw = self.rng.random()
+        for name in ['fail', 'abort', 'panic', 'ewd']:
+            share = self.scenarios.get(name, 0)
+            if draw < share:
+                return name
+            draw -= share
+
+        return 'pass'
+
+    def __simulate(self, recipe, start):
+        """Create the timeline of a recipe starting at lab time start."""
+        tasks = recipe.findall('task')
+        kpkginstall = next((index for index, task in enumerate(tasks)
+                            if 'kpkginstall' in task.attrib.get('name', '')),
+                           None)
+        tests = list(range(0 if kpkginstall is None else kpkginstall + 1,
+                           len(tasks)))
+
+        scenario = self.__pick_scenario()
+        fault = None
+        if scenario == 'abort' and tasks:
+            fault = 0
+        elif scenario == 'ewd':
+            boot = [index for index in tests
+                    if tasks[index].attrib.get('name') == 'Boot test']
+            fault = (boot or tests or [None])[0]
+        elif scenario in ['fail', 'panic'] and tests:
+            fault = self.rng.choice(tests)
+        if fault is None:
+            scenario = 'pass'
+
+        final = [('Pass', 'Completed')] * len(tasks)
+        if scenario == 'fail':
+            final[fault] = ('Fail', 'Completed')
+        elif fault is not None:
+            final[fault] = ('Panic' if scenario == 'panic' else 'Warn',
+                            'Aborted')
+            final[fault + 1:] = [('Warn', 'Aborted')] * \
+                (len(tasks) - fault - 1)
+
+        running = start + self.install_time
+        task_ends = []
+        end = running
+        for index in range(len(tasks)):
+            if scenario == 'fail' or fault is None or index <= fault:
+                # tasks after an abort or panic don't run at all
+                end += self.rng.uniform(0.5, 1.5) * self.task_time
+            task_ends.append(end)
+
+        return SimulatedRecipe(recipe, scenario, start, running, task_ends,
+                               final)
+
+    def submit(self, xml):
+        """
+        Submit a job.
+
+        Args:
+            xml: Job XML.
+
+        Returns:
+            ID of the job, like J:1.
+        """
+        job = fromstring(xml)
+        with self.lock:
+            now = self.now()
+            jobid = 'J:{}'.format(len(self.jobs) + 1)
+            job.attrib.update({'id': jobid[2:], 'result': 'New',
+                               'status': 'Queued'})
+            for recipe_set in job.findall('recipeSet'):
+                recipe_set.attrib['id'] = str(next(self.ids))
+                self.recipe_sets['RS:' + recipe_set.attrib['id']] = \
+                    (jobid, recipe_set)
+                # recipes of a set are scheduled together
+                start = now + self.rng.uniform(0, self.queue_delay)
+                for recipe in recipe_set.findall('recipe'):
+                    recipe.attrib['id'] = str(next(self.ids))
+                    for task in recipe.findall('task'):
+                        task.attrib['id'] = str(next(self.ids))
+                    self.job_recipes[jobid].append(
+                        self.__simulate(recipe, start)
+                    )
+            self.jobs[jobid] = job
+
+        return jobid
+
+    def results(self, taskspec):
+        """
+        Get the current results of a job or recipe set, like bkr
+        job-results does.
+
+        Args:
+            taskspec: ID of the job or recipe set.
+
+        Returns:
+            Results XML string.
+        """
+        with self.lock:
+            now = self.now()
+            if taskspec in self.jobs:
+                jobid, node = taskspec, self.jobs[taskspec]
+            else:
+                jobid, node = self.recipe_sets[taskspec]
+
+            finished = [recipe.update(now)
+                        for recipe in self.job_recipes[jobid]]
+            self.jobs[jobid].attrib['status'] = \
+                'Completed' if all(finished) else 'Running'
+
+            return tostring(node).decode()
+
+    def cancel(self, job_id):
+        """
+        Cancel a job.
+
+        Args:
+            job_id: ID of the job.
+
+        Returns:
+            True if the job exists, False otherwise.
+        """
+        with self.lock:
+            if job_id not in self.jobs:
+                return False
+
+            now = self.now()
+            for recipe in self.job_recipes[job_id]:
+                if recipe.cancelled is None:
+                    recipe.cancelled = now
+            self.cancelled.append(job_id)
+
+        return True
+
+    def finish_times(self):
+        """
+        Get the times the recipes finished so far.
+
+        Returns:
+            Dictionary of recipe IDs to values of time.monotonic().
+        """
+        with self.lock:
+            now = self.now()
+            return {recipe.recipe_id: self.real_time(recipe.end)
+                    for recipes in self.job_recipes.values()
+                    for recipe in recipes if recipe.end <= now}
+
+
+class LabTransport:
+    """
+    Beaker transport calling a lab in-process. Failed calls are retried
+    like the bkr and HTTP transports do.
+    """
+
+    def __init__(self, lab, retry_delay=1):
+        """
+        Args:
+            lab:         Lab to call.
+            retry_delay: Delay between retries of failed calls, seconds.
+        """
+        self.lab = lab
+        self.retry_delay = retry_delay
+
+    def __call(self, command, func, *args):
+        while self.lab.fail_call(command):
+            logging.warning('%s failed (503 Service Unavailable), retrying',
+                            command)
+            time.sleep(self.retry_delay)
+
+        return func(*args)
+
+    def job_results(self, taskspec):
+        """Get the results XML of a job or recipe set."""
+        return self.__call('job-results', self.lab.results, taskspec)
+
+    def job_submit(self, xml, jobowner=None):
+        """Submit a job, return its ID."""
+        # pylint: disable=unused-argument
+        return self.__call('job-submit', self.lab.submit, xml)
+
+    def job_cancel(self, job_id):
+        """Cancel a job."""
+        return self.__call('job-cancel', self.lab.cancel, job_id)
+
+
+class LabRequestHandler(RequestHandler):
+    """Request handler failing calls with 503 Service Unavailable according
+    to the fault schedule of the lab."""
+
+    def decode_request_content(self, data):
+        data = super().decode_request_content(data)
+        if data is None:
+            return None
+
+        _, method = xmlrpc.client.loads(data)
+        # logging in isn't retried by the transports, don't fail it
+        if method in HUB_COMMANDS and \
+                self.server.lab.fail_call(HUB_COMMANDS[method]):
+            self.send_error(503)
+            return None
+
+        return data
+
+
+class LabServer(BeakerServer):
+    """Beaker hub stand-in serving a lab over XML-RPC."""
+    handler_class = LabRequestHandler
+
+    def __init__(self, lab, port=0):
+        """
+        Args:
+            lab:  Lab to serve.
+            port: Port to listen on, any free port by default.
+        """
+        super().__init__(port=port)
+        self.lab = lab
+
+    def upload(self, jobxml):
+        """jobs.upload"""
+        return self.lab.submit(jobxml)
+
+    def to_xml(self, taskid, clone=False, exclude_enclosing_job=True,
+               include_logs=True):
+        """taskactions.to_xml"""
+        # pylint: disable=unused-argument
+        return self.lab.results(taskid)
+
+    def stop(self, taskid, stop_type, msg):
+        """taskactions.stop"""
+        # pylint: disable=unused-argument
+        return self.lab.cancel(taskid)
+
+
+def parse_outage(value):
+    """Parse a START:END outage argument into a tuple of seconds."""
+    start, _, end = value.partition(':')
+    return float(start), float(end)
+
+
+def add_lab_arguments(parser):
+    """Add the arguments configuring a lab to an argument parser."""
+    parser.add_argument('--speed', type=float, default=60,
+                        help='Lab seconds passing in a real second')
+    parser.add_argument('--queue-delay', type=float, default=600,
+                        help='Maximum time in the queue, lab seconds')
+    parser.add_argument('--install-time', type=float, default=300,
+                        help='Time to install a machine, lab seconds')
+    parser.add_argument('--task-time', type=float, default=300,
+                        help='Average run time of a task, lab seconds')
+    for scenario in ['fail', 'abort', 'panic', 'ewd']:
+        parser.add_argument('--' + scenario, type=float, default=0,
+                            help=f'Share of the recipes which {scenario}')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Delay added to every call, seconds')
+    parser.add_argument('--jitter', type=float, default=0,
+                        help='Maximum random delay added to every call, '
+                             'seconds')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='Share of the calls failing with 503')
+    parser.add_argument('--outage', type=parse_outage, action='append',
+                        default=[], metavar='START:END',
+                        help='Fail all calls between these seconds since '
+                             'the start, can be repeated')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def lab_from_args(args):
+    """Create a lab configured by the arguments of add_lab_arguments()."""
+    faults = FaultSchedule(args.latency, args.jitter, args.error_rate,
+                           args.outage, args.seed)
+    scenarios = {scenario: getattr(args, scenario)
+                 for scenario in ['fail', 'abort', 'panic', 'ewd']}
+    return Lab(args.speed, args.queue_delay, args.install_time,
+               args.task_time, scenarios, faults, args.seed)
+
+
+def main():
+    """Serve a lab until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=0)
+    add_lab_arguments(parser)
+    args = parser.parse_args()
+
+    server = LabServer(lab_from_args(args), args.port)
+    print(f'Serving the lab at {server.url}, use it with:')
+    print(f'    export SKT_FAKE_BEAKER_HUB={server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
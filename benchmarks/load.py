@@ -0,0 +1,196 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Run a job against a simulated Beaker lab and report the throughput of the
+Beaker calls and how long skt takes to notice finished recipes. Run as:
+
+    python3 -m benchmarks.load [--recipe-sets N] [--transport TRANSPORT]
+                               [--error-rate SHARE] [--outage START:END] ...
+
+The lab is called in-process, over XML-RPC with the HTTP transport, or
+through the fake bkr client in benchmarks.fakebkr. See benchmarks.lab for
+the lab options.
+"""
+import argparse
+import logging
+import os
+import shlex
+import sys
+import tempfile
+import time
+
+from benchmarks.generator import KPKGINSTALL_URL
+from benchmarks.lab import LabServer, LabTransport, add_lab_arguments
+from benchmarks.lab import lab_from_args
+from skt.beaker import BkrTransport, HTTPTransport
+from skt.runner import BeakerRunner
+
+
+class LoadRunner(BeakerRunner):
+    """Runner recording when it saw each recipe finish."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Value of time.monotonic() when each recipe was seen finished
+        self.detected = {}
+
+    def _process_recipe_set(self, recipe_set_id, root):
+        keep_watching = super()._process_recipe_set(recipe_set_id, root)
+        now = time.monotonic()
+        for recipe_id in self.completed_recipes.get(recipe_set_id, ()):
+            self.detected.setdefault(recipe_id, now)
+
+        return keep_watching
+
+
+def build_template(recipe_sets, recipes, tasks):
+    """
+    Build a job template.
+
+    Args:
+        recipe_sets: Number of recipe sets.
+        recipes:     Number of recipes per recipe set.
+        tasks:       Number of tests per recipe, after the distro and kernel
+                     installation and the boot test.
+
+    Returns:
+        Job XML string.
+    """
+    recipe = (
+        '<recipe><distroRequires><distro_name op="=" value="Fedora"/>'
+        '</distroRequires><hostRequires><and>'
+        '<arch op="=" value="x86_64"/></and></hostRequires>'
+        '<task name="/distribution/install"/>'
+        f'<task name="/distribution/kpkginstall">'
+        f'<fetch url="{KPKGINSTALL_URL}"/></task>'
+        '<task name="Boot test"/>' +
+        ''.join(f'<task name="/test/{number}"/>' for number in range(tasks)) +
+        '</recipe>'
+    )
+    recipe_set = '<recipeSet>' + recipe * recipes + '</recipeSet>'
+    return ('<job group="cki"><whiteboard>skt load test</whiteboard>' +
+            recipe_set * recipe_sets + '</job>')
+
+
+def install_fake_bkr(tmpdir, hub_url):
+    """Put the fake bkr client first in $PATH, talking to hub_url."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.path.join(tmpdir, 'bkr')
+    with open(path, 'w') as fileh:
+        fileh.write('#!/bin/sh\n'
+                    f'PYTHONPATH={shlex.quote(root)}${{PYTHONPATH:+:'
+                    f'$PYTHONPATH}} exec {shlex.quote(sys.executable)} '
+                    '-m benchmarks.fakebkr "$@"\n')
+    os.chmod(path, 0o755)
+    os.environ['PATH'] = tmpdir + os.pathsep + os.environ['PATH']
+    os.environ['SKT_FAKE_BEAKER_HUB'] = hub_url
+
+
+def percentile(values, share):
+    """Get a percentile of a sorted list."""
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def report(lab, myrunner, retcode, seconds):
+    """Print the results of a load test."""
+    calls = sum(lab.calls.values())
+    print(f'verdict {retcode} after {seconds:.1f}s, '
+          f'{len(lab.jobs)} job(s) submitted, {len(lab.cancelled)} '
+          f'cancelled')
+    print(f'beaker calls: {calls} ({calls / seconds:.1f}/s), failed: '
+          f'{sum(lab.failed_calls.values())}')
+    for command, count in sorted(lab.calls.items()):
+        print(f'    {command:12} {count:6} calls, '
+              f'{lab.failed_calls[command]:6} failed')
+
+    finish_times = lab.finish_times()
+    latencies = sorted(max(myrunner.detected[recipe_id] - finished, 0)
+                       for recipe_id, finished in finish_times.items()
+                       if recipe_id in myrunner.detected)
+    if latencies:
+        print(f'detection latency of {len(latencies)} recipes: '
+              f'mean {sum(latencies) / len(latencies):.2f}s, '
+              f'p50 {percentile(latencies, 0.5):.2f}s, '
+              f'p95 {percentile(latencies, 0.95):.2f}s, '
+              f'max {latencies[-1]:.2f}s')
+    unseen = len(set(finish_times) - set(myrunner.detected))
+    if unseen:
+        print(f'{unseen} finished recipes were never seen finished')
+    if finish_times:
+        last = max(finish_times.values())
+        print(f'verdict {time.monotonic() - last:.2f}s after the last '
+              f'recipe finished')
+
+
+def main():
+    """Run the load test."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipe-sets', type=int, default=100)
+    parser.add_argument('--recipes', type=int, default=1,
+                        help='Recipes per recipe set')
+    parser.add_argument('--tasks', type=int, default=5,
+                        help='Tests per recipe')
+    parser.add_argument('--transport', choices=['memory', 'http', 'bkr'],
+                        default='memory')
+    parser.add_argument('--watchdelay', type=float, default=5,
+                        help='Delay between polls, real seconds')
+    parser.add_argument('--poll-workers', type=int, default=1)
+    parser.add_argument('--max-aborted', type=int, default=3)
+    parser.add_argument('--retry-delay', type=float, default=1,
+                        help='Delay between retries of failed calls, real '
+                             'seconds')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    add_lab_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose
+                        else logging.ERROR)
+    lab = lab_from_args(args)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        template = os.path.join(tmpdir, 'job.xml')
+        with open(template, 'w') as fileh:
+            fileh.write(build_template(args.recipe_sets, args.recipes,
+                                       args.tasks))
+
+        server = None
+        if args.transport == 'memory':
+            transport = LabTransport(lab, args.retry_delay)
+        else:
+            server = LabServer(lab).start()
+            if args.transport == 'http':
+                transport = HTTPTransport(server.url,
+                                          pool_size=max(args.poll_workers,
+                                                        1))
+                transport.retry_delay = args.retry_delay
+            else:
+                install_fake_bkr(tmpdir, server.url)
+                transport = BkrTransport()
+
+        try:
+            myrunner = LoadRunner(template, transport=transport)
+            myrunner.watchdelay = args.watchdelay
+            myrunner.poll_workers = args.poll_workers
+
+            start = time.monotonic()
+            retcode = myrunner.run('http://example.com/kernel.tar.gz',
+                                   args.max_aborted, 'load-test', True)
+            report(lab, myrunner, retcode, time.monotonic() - start)
+        finally:
+            if server is not None:
+                server.stop_serving()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Compare the memory retained per finished recipe set by its results tree and
+by its compact records. Run as:
+
+    python3 -m benchmarks.model [--recipe-sets N] [--tasks N]
+"""
+import argparse
+import tracemalloc
+
+from defusedxml.ElementTree import fromstring
+
+from benchmarks.generator import generate_job
+from skt.model import summarize_recipe_set
+
+
+def retained(func):
+    """
+    Measure memory retained by the result of a function.
+
+    Returns:
+        (result, bytes) tuple.
+    """
+    tracemalloc.start()
+    result = func()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, size
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipe-sets', type=int, default=50)
+    parser.add_argument('--recipes', type=int, default=4)
+    parser.add_argument('--tasks', type=int, default=50)
+    parser.add_argument('--log-size', type=int, default=256,
+                        help='Size of the result text of each task, bytes')
+    args = parser.parse_args()
+
+    xml = generate_job(args.recipe_sets, args.recipes, args.tasks,
+                       args.log_size).encode()
+    root, tree_size = retained(lambda: fromstring(xml))
+    recipe_sets = root.findall('recipeSet')
+    _, records_size = retained(
+        lambda: [summarize_recipe_set(recipe_set)
+                 for recipe_set in recipe_sets]
+    )
+
+    print(f'{args.recipe_sets} recipe sets, {args.recipes} recipes each, '
+          f'{args.tasks + 1} tasks per recipe')
+    print(f'tree    {tree_size / args.recipe_sets / 1024:.1f}KiB '
+          f'per recipe set')
+    print(f'records {records_size / args.recipe_sets / 1024:.1f}KiB '
+          f'per recipe set')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Compare peak memory and time of parsing big job results in memory and
+incrementally from a spool file. Run as:
+
+    python3 -m benchmarks.parsing [--recipe-sets N] [--tasks N] [--log-size N]
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+from defusedxml.ElementTree import fromstring
+
+from benchmarks.generator import generate_job
+from skt.results import parse_results_file
+
+
+def in_memory(path):
+    """Read the whole results XML and parse it, like bkr output is."""
+    with open(path, 'rb') as fileh:
+        xml = fileh.read()
+    return xml, fromstring(xml)
+
+
+def streamed(path):
+    """Parse the results XML incrementally from the spool file."""
+    with open(path, 'rb') as fileh:
+        return parse_results_file(fileh)
+
+
+def measure(func, path):
+    """
+    Measure peak memory and time of a parsing function.
+
+    Returns:
+        (peak memory in bytes, memory retained by the result in bytes,
+         seconds) tuple.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(path)
+    seconds = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    return peak, retained, seconds
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipe-sets', type=int, default=20)
+    parser.add_argument('--recipes', type=int, default=4)
+    parser.add_argument('--tasks', type=int, default=50)
+    parser.add_argument('--log-size', type=int, default=4096,
+                        help='Size of the result text of each task, bytes')
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile('w') as spool:
+        spool.write(generate_job(args.recipe_sets, args.recipes, args.tasks,
+                                 args.log_size))
+        spool.flush()
+        print(f'results XML: {spool.tell() / 2 ** 20:.1f} MiB')
+
+        for name, func in [('in-memory', in_memory), ('streamed', streamed)]:
+            peak, retained, seconds = measure(func, spool.name)
+            print(f'{name:9} peak={peak / 2 ** 20:.1f}MiB '
+                  f'retained={retained / 2 ** 20:.1f}MiB '
+                  f'time={seconds:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
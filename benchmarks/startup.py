@@ -0,0 +1,189 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Time the startup of the skt command and check it against the budget. Run as:
+
+    python3 -m benchmarks.startup [--repeat 5] [--budget CASE=SECONDS] ...
+
+The cases are:
+
+    import      Importing the skt.executable entry point.
+    help        Running "skt --help", beyond starting the interpreter.
+    first_call  Running "skt run" until its first call reaches a simulated
+                Beaker hub, beyond starting the interpreter.
+
+Exits with 1 if the median time of a case is over its budget.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.lab import Lab, LabServer
+from benchmarks.load import build_template
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Startup time budget of each case, seconds
+BUDGETS = {'import': 0.05, 'help': 0.1, 'first_call': 0.5}
+
+RUN_SKT = 'from skt.executable import main; main()'
+
+RC_TEMPLATE = """[state]
+kernel_package_url = http://example.com/kernel.tar.gz
+kernel_version = startup-test
+kernel_arch = x86_64
+
+[runner]
+jobtemplate = {jobtemplate}
+"""
+
+
+def python(*args, env=None, **kwargs):
+    """Start the Python interpreter with skt importable."""
+    env = dict(env or os.environ)
+    env['PYTHONPATH'] = ROOT + (os.pathsep + env['PYTHONPATH']
+                                if env.get('PYTHONPATH') else '')
+    return subprocess.Popen([sys.executable] + list(args), env=env,
+                            **kwargs)
+
+
+def wall_time(*args):
+    """Time running the interpreter to completion, seconds."""
+    start = time.monotonic()
+    python(*args, stdout=subprocess.DEVNULL,
+           stderr=subprocess.DEVNULL).wait()
+    return time.monotonic() - start
+
+
+def time_import():
+    """Time importing the entry point, seconds, as -X importtime sees it."""
+    process = python('-X', 'importtime', '-c', 'import skt.executable',
+                     stderr=subprocess.PIPE, universal_newlines=True)
+    _, stderr = process.communicate()
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == 'skt.executable':
+            return int(fields[1]) / 1e6
+
+    raise RuntimeError('skt.executable was not imported:\n' + stderr)
+
+
+def time_help():
+    """Time "skt --help" beyond starting the interpreter, seconds."""
+    return max(wall_time('-c', RUN_SKT, '--help') - wall_time('-c', 'pass'),
+               0)
+
+
+def time_first_call():
+    """Time "skt run" until its first Beaker call beyond starting the
+    interpreter, seconds."""
+    first_call = threading.Event()
+    lab = Lab()
+    fail_call = lab.fail_call
+
+    def record_call(command):
+        first_call.set()
+        return fail_call(command)
+
+    lab.fail_call = record_call
+    server = LabServer(lab).start()
+    # skt is killed in the middle of its calls, don't log that
+    server.handle_error = lambda request, client_address: None
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            jobtemplate = os.path.join(tmpdir, 'job.xml')
+            with open(jobtemplate, 'w') as fileh:
+                fileh.write(build_template(1, 1, 1))
+            client_conf = os.path.join(tmpdir, 'client.conf')
+            with open(client_conf, 'w') as fileh:
+                fileh.write('HUB_URL = "{}"\n'.format(server.url))
+            rc_path = os.path.join(tmpdir, 'rc')
+            with open(rc_path, 'w') as fileh:
+                fileh.write(RC_TEMPLATE.format(jobtemplate=jobtemplate))
+
+            interpreter = wall_time('-c', 'pass')
+            start = time.monotonic()
+            process = python(
+                '-c', RUN_SKT, '--rc', rc_path, '--workdir', tmpdir, 'run',
+                '--beaker-transport', 'http',
+                env=dict(os.environ, BEAKER_CLIENT_CONF=client_conf),
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                universal_newlines=True
+            )
+            while not first_call.wait(0.001):
+                if process.poll() is not None:
+                    raise RuntimeError('skt exited before calling Beaker:\n' +
+                                       process.stderr.read())
+            seconds = time.monotonic() - start
+            process.terminate()
+            process.communicate()
+    finally:
+        server.stop_serving()
+
+    return max(seconds - interpreter, 0)
+
+
+CASES = {'import': time_import, 'help': time_help,
+         'first_call': time_first_call}
+
+
+def parse_budget(value):
+    """Parse a CASE=SECONDS budget argument."""
+    case, _, seconds = value.partition('=')
+    if case not in CASES:
+        raise argparse.ArgumentTypeError('unknown case {}'.format(case))
+
+    return case, float(seconds)
+
+
+def main():
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('cases', nargs='*', metavar='CASE',
+                        help='Cases to run, all by default: ' +
+                        ', '.join(CASES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=parse_budget, action='append',
+                        default=[], metavar='CASE=SECONDS',
+                        help='Override the budget of a case, can be '
+                             'repeated')
+    args = parser.parse_args()
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        parser.error('unknown cases: ' + ', '.join(sorted(unknown)))
+    budgets = dict(BUDGETS, **dict(args.budget))
+
+    over_budget = []
+    for case in args.cases or list(CASES):
+        seconds = statistics.median(CASES[case]()
+                                    for _ in range(args.repeat))
+        print('{:12} {:8.1f} ms (budget {:.0f} ms)'.format(
+            case, seconds * 1000, budgets[case] * 1000
+        ))
+        if seconds > budgets[case]:
+            over_budget.append(case)
+
+    if over_budget:
+        print('Over the startup budget: ' + ', '.join(over_budget))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
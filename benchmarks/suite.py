@@ -0,0 +1,236 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Time the hot paths of the runner on synthetic job results and compare them
+with the stored baseline. Run as:
+
+    python3 -m benchmarks.suite [--save] [--tolerance 0.5] [CASE ...]
+
+Exits with 1 if a case got slower than the baseline by more than the
+tolerance. Timings are only comparable on the same machine, so save a new
+baseline with --save before comparing changes on another one.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import timeit
+
+from defusedxml.ElementTree import fromstring
+
+from benchmarks.fakes import FakeTransport
+from benchmarks.generator import generate_job
+from skt.runner import BeakerRunner
+from skt.verdict import VerdictAggregator
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# Job template the runners submit, the fake transport returns the
+# synthetic job for it
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), 'template.xml')
+
+# Synthetic job the cases run on
+JOB = {'recipe_sets': 20, 'recipes': 4, 'tasks': 50, 'log_size': 512,
+       'waived': 0.1, 'panics': 0.05, 'aborts': 0.05, 'ewd': 0.05}
+# Number of blacklisted hosts
+BLACKLIST_SIZE = 5000
+
+
+def new_runner():
+    """Create a runner with an in-memory transport."""
+    myrunner = BeakerRunner(TEMPLATE_PATH, transport=FakeTransport())
+    myrunner.watchdelay = 0
+    return myrunner
+
+
+def bench_parse(xml):
+    """Parse the job results."""
+    return lambda: fromstring(xml)
+
+
+def bench_decide(xml):
+    """Decide the result of every recipe, without memoized analyses."""
+    myrunner = new_runner()
+    recipes = [('R:' + recipe.attrib['id'], recipe)
+               for recipe in fromstring(xml).iter('recipe')]
+
+    def decide():
+        myrunner.recipe_analyses.clear()
+        for recipe_id, recipe in recipes:
+            myrunner.decide_run_result_by_task(recipe, recipe_id)
+
+    return decide
+
+
+def bench_not_booting(xml):
+    """Check whether the kernel booted in every recipe."""
+    # pylint: disable=protected-access
+    myrunner = new_runner()
+    recipes = list(fromstring(xml).iter('recipe'))
+
+    def not_booting():
+        myrunner.recipe_analyses.clear()
+        for recipe in recipes:
+            myrunner._not_booting(recipe)
+
+    return not_booting
+
+
+def bench_getresults(xml):
+    """Get the return code of the whole job from its results trees."""
+    # pylint: disable=protected-access
+    myrunner = new_runner()
+    results = {'RS:' + recipe_set.attrib['id']: recipe_set
+               for recipe_set in fromstring(xml).findall('recipeSet')}
+
+    def getresults():
+        myrunner.job_to_recipe_set_map = {'J:1': set(results)}
+        myrunner.recipe_set_results = dict(results)
+        myrunner.recipe_set_summaries = {}
+        myrunner.recipe_analyses = {}
+        myrunner.verdicts = VerdictAggregator()
+        return myrunner._BeakerRunner__getresults()
+
+    return getresults
+
+
+def bench_blacklist_hreq(xml):
+    """Add a big blacklist to the host requirements of every recipe."""
+    # pylint: disable=protected-access
+    myrunner = new_runner()
+    myrunner.blacklisted = [f'host{number}.example.com'
+                            for number in range(BLACKLIST_SIZE)]
+    recipes = len(list(fromstring(xml).iter('recipe')))
+
+    def blacklist_hreq():
+        for _ in range(recipes):
+            myrunner._BeakerRunner__blacklist_hreq(fromstring(
+                '<hostRequires><and><arch op="=" value="x86_64"/></and>'
+                '</hostRequires>'
+            ))
+
+    return blacklist_hreq
+
+
+def bench_watch_loop(xml):
+    """Submit the job and watch it until the verdict, resubmitting the
+    aborted recipe sets."""
+    def watch_loop():
+        myrunner = BeakerRunner(TEMPLATE_PATH,
+                                transport=FakeTransport(fromstring(xml)))
+        myrunner.watchdelay = 0
+        return myrunner.run('http://example.com/kernel.tar.gz', 1000,
+                            '4.17.0-rc1', True)
+
+    return watch_loop
+
+
+CASES = {
+    'parse': bench_parse,
+    'decide_run_result_by_task': bench_decide,
+    'not_booting': bench_not_booting,
+    'getresults': bench_getresults,
+    'blacklist_hreq': bench_blacklist_hreq,
+    'watch_loop': bench_watch_loop,
+}
+
+
+def run_cases(names, repeat):
+    """
+    Time the cases.
+
+    Args:
+        names:  Names of the cases to run.
+        repeat: Number of times to run each case, the fastest run counts.
+
+    Returns:
+        Dictionary of case names to seconds.
+    """
+    xml = generate_job(**JOB).encode()
+    timings = {}
+    for name in names:
+        func = CASES[name](xml)
+        timings[name] = min(timeit.repeat(func, number=1, repeat=repeat))
+
+    return timings
+
+
+def compare(timings, baseline, tolerance):
+    """
+    Compare timings with the baseline and print them.
+
+    Args:
+        timings:   Dictionary of case names to seconds.
+        baseline:  Dictionary of case names to seconds of the baseline.
+        tolerance: Allowed slowdown, as a share of the baseline.
+
+    Returns:
+        List of names of the cases which got slower.
+    """
+    regressions = []
+    for name, seconds in timings.items():
+        line = f'{name:26} {seconds * 1000:9.2f}ms'
+        if name in baseline:
+            ratio = seconds / baseline[name]
+            line += f' {ratio:6.2f}x baseline'
+            if ratio > 1 + tolerance:
+                line += ' REGRESSION'
+                regressions.append(name)
+        print(line)
+
+    return regressions
+
+
+def main():
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('cases', nargs='*', metavar='CASE',
+                        help='Cases to run, all by default: ' +
+                        ', '.join(CASES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='Allowed slowdown as a share of the baseline')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true',
+                        help='Save the timings as the new baseline')
+    args = parser.parse_args()
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        parser.error('unknown cases: ' + ', '.join(sorted(unknown)))
+
+    # the watch loop logs every aborted recipe
+    logging.disable(logging.CRITICAL)
+
+    timings = run_cases(args.cases or list(CASES), args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fileh:
+            baseline = json.load(fileh)
+
+    regressions = compare(timings, baseline, args.tolerance)
+    if args.save:
+        baseline.update(timings)
+        with open(args.baseline, 'w') as fileh:
+            json.dump(baseline, fileh, indent=2, sort_keys=True)
+            fileh.write('\n')
+        return
+
+    if regressions:
+        print('Slower than the baseline: ' + ', '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
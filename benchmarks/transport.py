@@ -0,0 +1,95 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Compare per-call latency of the Beaker transports against a local hub
+stand-in. Run as:
+
+    python3 -m benchmarks.transport [--calls N]
+
+The bkr transport is only measured if the bkr client is installed.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.fakes import BeakerServer
+from benchmarks.generator import generate_job
+from skt.beaker import BkrTransport, HTTPTransport
+
+
+def measure(func, calls):
+    """
+    Call func repeatedly and measure the latency of each call.
+
+    Args:
+        func:  Function to call, without arguments.
+        calls: Number of calls.
+
+    Returns:
+        List of latencies, seconds.
+    """
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+
+    return latencies
+
+
+def report(name, latencies):
+    """Print latency statistics of a transport."""
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f'{name:5} calls={len(latencies)} '
+          f'mean={statistics.mean(latencies) * 1000:.2f}ms '
+          f'median={statistics.median(latencies) * 1000:.2f}ms '
+          f'p95={p95 * 1000:.2f}ms')
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=50,
+                        help='Number of job-results calls per transport')
+    args = parser.parse_args()
+
+    server = BeakerServer({'J:1': generate_job(recipe_sets=10)}).start()
+
+    try:
+        transport = HTTPTransport(server.url, 'user', 'password')
+        report('http', measure(lambda: transport.job_results('J:1'),
+                               args.calls))
+
+        if not shutil.which('bkr'):
+            print('bkr   skipped, bkr client is not installed')
+            return
+
+        with tempfile.NamedTemporaryFile('w') as config:
+            config.write(f'HUB_URL = "{server.url}"\n'
+                         'AUTH_METHOD = "password"\n'
+                         'USERNAME = "user"\nPASSWORD = "password"\n')
+            config.flush()
+            os.environ['BEAKER_CLIENT_CONF'] = config.name
+            report('bkr', measure(lambda: BkrTransport.job_results('J:1'),
+                                  args.calls))
+    finally:
+        server.stop_serving()
+
+
+if __name__ == '__main__':
+    main()
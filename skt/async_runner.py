@@ -0,0 +1,296 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Runner watching Beaker jobs from an asyncio event loop."""
+import asyncio
+import functools
+import itertools
+import logging
+import time
+
+from skt import tracing
+from skt.runner import BeakerRunner
+from skt.scheduler import PollScheduler
+
+
+class AsyncBeakerRunner(BeakerRunner):
+    """
+    Beaker test runner doing all Beaker calls of the watch loop as
+    concurrent asyncio tasks, instead of blocking on each of them. Up to
+    self.poll_workers calls run at the same time. The bkr client is run as
+    an asynchronous subprocess; transports without asynchronous methods are
+    called from the event loop's thread pool.
+
+    The results are processed by the same code as in BeakerRunner, so the
+    verdicts are the same. Resubmissions requested while processing a sweep
+    are submitted concurrently once the sweep is processed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Job XMLs to submit once the current sweep is processed
+        self.__submissions = []
+        # True while the watch loop runs, so cancel_pending_jobs() only
+        # marks the jobs to be cancelled by the loop
+        self.__watching = False
+        self.__semaphore = None
+        self.__semaphore_loop = None
+
+    def __get_semaphore(self):
+        """Get the semaphore limiting parallel calls for the running loop."""
+        loop = asyncio.get_event_loop()
+        if self.__semaphore_loop is not loop:
+            self.__semaphore = asyncio.Semaphore(max(self.poll_workers, 1))
+            self.__semaphore_loop = loop
+
+        return self.__semaphore
+
+    async def _call(self, method, *args):
+        """
+        Call a transport method without blocking the event loop.
+
+        Args:
+            method: Name of the transport method, like 'job_results'.
+            args:   Arguments to pass to the method.
+
+        Returns:
+            Value returned by the method.
+        """
+        async with self.__get_semaphore():
+            async_method = getattr(self.transport, 'async_' + method, None)
+            if async_method is not None:
+                return await async_method(*args)
+
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(
+                None, functools.partial(getattr(self.transport, method), *args)
+            )
+
+    async def _async_getresultstree(self, taskspec):
+        """Same as getresultstree(), but doesn't block the event loop."""
+        with tracing.span('getresultstree', taskspec=taskspec):
+            if self._get_spooler() is not None:
+                with await self._call('spool_job_results',
+                                      taskspec) as fileobj:
+                    return self._parse_results_file(taskspec, fileobj)
+
+            return self._parse_results(
+                taskspec, await self._call('job_results', taskspec)
+            )
+
+    async def _async_fetch_batch(self, batch):
+        """Same as fetch_batch(), but doesn't block the event loop."""
+        results = self._split_results(
+            batch, await self._async_getresultstree(batch[0])
+        )
+
+        # ask directly for recipe sets missing in the job results
+        return [(recipe_set_id, recipe_set if recipe_set is not None
+                 else await self._async_getresultstree(recipe_set_id))
+                for recipe_set_id, recipe_set in results]
+
+    async def _async_fetch_watchlist(self, recipe_set_ids):
+        """
+        Retrieve results of watched recipe sets, using one call per job, all
+        calls running concurrently.
+
+        Args:
+            recipe_set_ids: IDs of the recipe sets to fetch.
+
+        Returns:
+            Iterable of (recipe set ID, etree node) tuples.
+        """
+        batches = self.pending_batches(recipe_set_ids)
+        results = await asyncio.gather(*[self._async_fetch_batch(batch)
+                                         for batch in batches])
+
+        return itertools.chain.from_iterable(results)
+
+    def _submit_and_watch(self, xml):
+        if not self.__watching:
+            super()._submit_and_watch(xml)
+            return
+
+        # Called while processing a sweep, submit when it's processed
+        self.__submissions.append(xml)
+
+    async def __submit_and_watch(self, xml):
+        with tracing.span('jobsubmit') as span:
+            jobid = await self._call('job_submit', xml, self.jobowner)
+            span.set(job=jobid)
+        if not jobid:
+            raise Exception('Unable to submit the job!')
+
+        logging.info("submitted jobid: %s", jobid)
+        self._watch_job(jobid, await self._async_getresultstree(jobid))
+
+    async def _async_flush_submissions(self):
+        """Submit all queued jobs concurrently and watch them."""
+        submissions, self.__submissions = self.__submissions, []
+        await asyncio.gather(*[self.__submit_and_watch(xml)
+                               for xml in submissions])
+
+    def cancel_pending_jobs(self):
+        """
+        Cancel all recipe sets from self.watchlist. When called from the
+        watch loop, the jobs are cancelled by the loop once it stops.
+        """
+        if not self.__watching:
+            asyncio.run(self._async_cancel_pending_jobs())
+
+    async def _async_cancel_pending_jobs(self):
+        """Same as cancel_pending_jobs(), with all calls running
+        concurrently."""
+        logging.info('Cancelling pending jobs!')
+        self._drop_resubmissions('cancelling the jobs')
+        job_ids = sorted(self.job_to_recipe_set_map)
+
+        # Fetch the watched recipe sets the verdict has no results of yet, so
+        # we don't get KeyError later on (nitpick).
+        unfetched = self._get_unfetched()
+        if unfetched and \
+                getattr(self.transport, 'async_job_results', None) is None:
+            # calls in the default executor would be waited for when the
+            # event loop is closed, use the daemon threads of BeakerRunner
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._refresh_unfetched)
+        elif unfetched:
+            # fetches missing the deadline are cancelled before they store
+            # anything
+            try:
+                await asyncio.wait_for(
+                    self._async_fetch_watchlist(unfetched),
+                    self.cancel_deadline
+                )
+            except asyncio.TimeoutError:
+                pass
+        self._forget_unfetched()
+
+        if hasattr(self.transport, 'job_cancel_many'):
+            cancelled = await self._call('job_cancel_many', job_ids)
+        else:
+            cancelled = all(await asyncio.gather(
+                *[self._call('job_cancel', job_id) for job_id in job_ids]
+            ))
+        if not cancelled:
+            logging.info('Failed to cancel the remaining recipe sets!')
+
+    async def __sleep(self, delay):
+        """Same as _sleep_until_notified(), but doesn't block the event
+        loop."""
+        if self.notifications is None:
+            await asyncio.sleep(delay)
+            return set()
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._sleep_until_notified,
+                                          delay)
+
+    async def __wait_for_poll(self, scheduler):
+        """
+        Sleep until it's time to poll some of the watched recipe sets, or
+        until a notification about them arrives.
+
+        Returns:
+            List of IDs of the recipe sets to poll.
+        """
+        if scheduler is None:
+            delay = self._full_poll_delay()
+            notified = set()
+            if delay > 0:
+                notified = await self.__sleep(delay)
+            return self._recipe_sets_to_poll(notified)
+
+        scheduler.sync(self.watchlist)
+        delay = scheduler.next_due() - time.monotonic()
+        notified = set()
+        if delay > 0:
+            notified = await self.__sleep(delay)
+
+        return sorted(set(scheduler.pop_due()) | notified)
+
+    async def _async_watchloop(self):
+        """Watch the recipe sets until all of them finish."""
+        scheduler = None
+        if self.adaptive_polling:
+            scheduler = PollScheduler(self.watchdelay, self.poll_floor,
+                                      self.poll_ceiling)
+
+        self.next_full_poll = None
+        while not self.finished():
+            recipe_set_ids = await self.__wait_for_poll(scheduler)
+            started = time.monotonic()
+            if self.max_aborted <= self.aborted_count:
+                self.has_aborted = True
+                # Remove / cancel all the remaining recipe set IDs and abort
+                await self._async_cancel_pending_jobs()
+                return
+
+            with tracing.span('sweep', recipe_sets=len(recipe_set_ids)):
+                results = await self._async_fetch_watchlist(recipe_set_ids)
+                for recipe_set_id, root in results:
+                    if not self._process_recipe_set(recipe_set_id, root):
+                        # everything gets cancelled, don't submit anything
+                        # new
+                        self.__submissions = []
+                        await self._async_cancel_pending_jobs()
+                        return
+
+                    if scheduler and recipe_set_id in self.watchlist:
+                        scheduler.reschedule(recipe_set_id, root)
+
+                if self._verdict_decided():
+                    self.__submissions = []
+                    if self.fail_fast_cancel:
+                        await self._async_cancel_pending_jobs()
+                    return
+
+                self._flush_resubmissions(force=not self.watchlist)
+                await self._async_flush_submissions()
+            self._record_sweep(started)
+            self._checkpoint()
+
+    async def _async_wait(self, *jobids):
+        """Same as wait(), as a coroutine."""
+        roots = await asyncio.gather(*[self._async_getresultstree(jobid)
+                                       for jobid in jobids])
+        for jobid, root in zip(jobids, roots):
+            self._watch_job(jobid, root)
+        await self._async_watch()
+
+    async def _async_watch(self):
+        """Same as _watch(), as a coroutine."""
+        self.__watching = True
+        try:
+            await self._async_watchloop()
+        finally:
+            self.__watching = False
+            self.__submissions = []
+
+        self._log_change_stats()
+
+    def wait(self, *jobids):
+        """
+        Add jobids to watchlist, run the watch loop in an event loop and wait
+        for the jobs to finish.
+
+        Args:
+            jobids: ids of Beaker jobs like 1234
+
+        """
+        asyncio.run(self._async_wait(*jobids))
+
+    def _watch(self):
+        """Run the watch loop in an event loop and wait for all watched
+        recipe sets to finish."""
+        asyncio.run(self._async_watch())
@@ -0,0 +1,560 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Transports used by the runner to talk to Beaker."""
+import ast
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from defusedxml.ElementTree import fromstring
+from defusedxml.ElementTree import tostring
+from cki_lib.misc import safe_popen
+
+from skt import metrics
+
+# Beaker commands of the hub methods, so both transports report the same
+# metrics
+HUB_COMMANDS = {
+    'taskactions.to_xml': 'job-results',
+    'jobs.upload': 'job-submit',
+    'taskactions.stop': 'job-cancel',
+}
+
+# Beaker client configuration files, in the order bkr reads them
+CLIENT_CONFIG_FILES = ['~/.beaker_client/config', '/etc/beaker/client.conf']
+
+
+class BkrTransport:
+    """Talk to Beaker by running the bkr command line client."""
+    # Errors worth retrying the job-results and job-submit calls on
+    results_err_strings = ["ProtocolError", "503 Service Unavailable"]
+    submit_err_strings = ["connection to beaker.engineering.redhat.com failed",
+                          "Can't connect to MySQL server on"]
+    # Delay between retries, seconds
+    retry_delay = 10
+
+    @classmethod
+    def __submit_args(cls, jobowner):
+        args = ["bkr", "job-submit"]
+
+        if jobowner is not None:
+            args += ["--job-owner=%s" % jobowner]
+
+        args += ["-"]
+        return args
+
+    @classmethod
+    def __check_results(cls, stdout, stderr, returncode):
+        if returncode:
+            logging.warning(stdout)
+            logging.warning(stderr)
+            raise RuntimeError('failed getting Beaker job-results')
+
+        return stdout
+
+    @classmethod
+    def __parse_submitted(cls, stdout, stderr, retcode):
+        for line in stdout.split("\n"):
+            match = re.match(r"^Submitted: \['([^']+)'\]$", line)
+            if match:
+                return match.group(1)
+
+        logging.info(f'retcode={retcode}, stderr={stderr}')
+        logging.info(stdout)
+        return None
+
+    @classmethod
+    def __retry_popen(cls, args, err_strings, stdin_data=None, **kwargs):
+        """
+        Run a command with safe_popen(), retrying it while its stderr
+        contains any of err_strings. Unlike retry_safe_popen() of cki_lib,
+        the retries are counted.
+
+        Returns:
+            (stdout, stderr, returncode) tuple.
+        """
+        while True:
+            stdout, stderr, returncode = safe_popen(args,
+                                                    stdin_data=stdin_data,
+                                                    **kwargs)
+            if not stderr or not any(err_string in stderr
+                                     for err_string in err_strings):
+                return stdout, stderr, returncode
+
+            logging.warning('%s failed, retrying', ' '.join(args[:2]))
+            metrics.inc('skt_beaker_retries_total', command=args[1])
+            time.sleep(cls.retry_delay)
+
+    @classmethod
+    def job_results(cls, taskspec):
+        """
+        Retrieve Beaker results for taskspec in Beaker's native XML format.
+
+        Args:
+            taskspec:   ID of the job, recipe or recipe set.
+
+        Returns:
+            The results XML as a string.
+        """
+        args = ["bkr", "job-results", "--prettyxml", taskspec]
+        return cls.__check_results(*cls.__retry_popen(args,
+                                                      cls.results_err_strings,
+                                                      stderr=subprocess.PIPE,
+                                                      stdout=subprocess.PIPE))
+
+    @classmethod
+    def spool_job_results(cls, taskspec):
+        """
+        Retrieve Beaker results for taskspec into a temporary file, so the
+        results XML is never held in memory as a whole.
+
+        Args:
+            taskspec:   ID of the job, recipe or recipe set.
+
+        Returns:
+            Temporary file object with the results XML, positioned at its
+            start. The caller is responsible for closing it.
+        """
+        args = ["bkr", "job-results", "--prettyxml", taskspec]
+        while True:
+            spool = tempfile.TemporaryFile()
+            proc = subprocess.Popen(args, stdout=spool, stderr=subprocess.PIPE)
+            _, stderr = proc.communicate()
+            stderr = stderr.decode('utf-8') if stderr else ''
+
+            if any(err_string in stderr
+                   for err_string in cls.results_err_strings):
+                spool.close()
+                logging.warning('bkr job-results failed, retrying')
+                metrics.inc('skt_beaker_retries_total', command='job-results')
+                time.sleep(cls.retry_delay)
+                continue
+
+            if proc.returncode:
+                spool.close()
+                logging.warning(stderr)
+                raise RuntimeError('failed getting Beaker job-results')
+
+            spool.seek(0)
+            return spool
+
+    @classmethod
+    def job_submit(cls, xml, jobowner=None):
+        """
+        Submit a Beaker job.
+
+        Args:
+            xml:      Job XML to submit.
+            jobowner: Name of a Beaker user on whose behalf the job should be
+                      submitted, or None, if the owner should be the current
+                      user.
+
+        Returns:
+            ID of the submitted job, None if the submission failed.
+        """
+        args = cls.__submit_args(jobowner)
+        return cls.__parse_submitted(*cls.__retry_popen(
+            args, cls.submit_err_strings, stdin_data=xml,
+            stdin=subprocess.PIPE, stderr=subprocess.PIPE,
+            stdout=subprocess.PIPE
+        ))
+
+    @classmethod
+    def job_cancel(cls, job_id):
+        """
+        Cancel a Beaker job.
+
+        Args:
+            job_id: ID of the job to cancel, like J:1234.
+
+        Returns:
+            True if the job was cancelled, False otherwise.
+        """
+        _, _, ret = safe_popen(['bkr', 'job-cancel', job_id])
+        return not ret
+
+    @classmethod
+    def job_cancel_many(cls, job_ids):
+        """
+        Cancel several Beaker jobs with a single bkr call.
+
+        Args:
+            job_ids: List of IDs of the jobs to cancel, like J:1234.
+
+        Returns:
+            True if all jobs were cancelled, False otherwise.
+        """
+        if not job_ids:
+            return True
+
+        _, _, ret = safe_popen(['bkr', 'job-cancel'] + list(job_ids))
+        return not ret
+
+    @classmethod
+    async def __async_popen(cls, args, err_strings=(), stdin_data=None,
+                            capture=True):
+        """
+        Run a command without blocking the event loop, retrying it while its
+        stderr contains any of err_strings.
+
+        Returns:
+            (stdout, stderr, returncode) tuple.
+        """
+        # only called from a running event loop, asyncio is loaded already
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        if isinstance(stdin_data, str):
+            stdin_data = stdin_data.encode('utf-8')
+        pipe = asyncio.subprocess.PIPE if capture else None
+
+        while True:
+            proc = await asyncio.create_subprocess_exec(
+                *args, stdin=asyncio.subprocess.PIPE if stdin_data else None,
+                stdout=pipe, stderr=pipe
+            )
+            stdout, stderr = await proc.communicate(stdin_data)
+            stdout = stdout.decode('utf-8') if stdout is not None else ''
+            stderr = stderr.decode('utf-8') if stderr is not None else ''
+
+            if not any(err_string in stderr for err_string in err_strings):
+                return stdout, stderr, proc.returncode
+
+            logging.warning('%s failed, retrying', ' '.join(args[:2]))
+            metrics.inc('skt_beaker_retries_total', command=args[1])
+            await asyncio.sleep(cls.retry_delay)
+
+    @classmethod
+    async def async_job_results(cls, taskspec):
+        """Same as job_results(), but doesn't block the event loop."""
+        args = ["bkr", "job-results", "--prettyxml", taskspec]
+        return cls.__check_results(
+            *await cls.__async_popen(args, cls.results_err_strings)
+        )
+
+    @classmethod
+    async def async_job_submit(cls, xml, jobowner=None):
+        """Same as job_submit(), but doesn't block the event loop."""
+        args = cls.__submit_args(jobowner)
+        return cls.__parse_submitted(
+            *await cls.__async_popen(args, cls.submit_err_strings,
+                                     stdin_data=xml)
+        )
+
+    @classmethod
+    async def async_job_cancel(cls, job_id):
+        """Same as job_cancel(), but doesn't block the event loop."""
+        _, _, ret = await cls.__async_popen(['bkr', 'job-cancel', job_id],
+                                            capture=False)
+        return not ret
+
+    @classmethod
+    async def async_job_cancel_many(cls, job_ids):
+        """Same as job_cancel_many(), but doesn't block the event loop."""
+        if not job_ids:
+            return True
+
+        _, _, ret = await cls.__async_popen(
+            ['bkr', 'job-cancel'] + list(job_ids), capture=False
+        )
+        return not ret
+
+
+class _SessionTransport(xmlrpc.client.Transport):
+    """XML-RPC transport sending the requests through a requests session."""
+
+    def __init__(self, session, url, timeout):
+        super().__init__()
+        self.session = session
+        self.url = url
+        self.timeout = timeout
+
+    def request(self, host, handler, request_body, verbose=False):
+        # pylint: disable=unused-argument
+        response = self.session.post(self.url, data=request_body,
+                                     headers={'Content-Type': 'text/xml'},
+                                     timeout=self.timeout)
+        if response.status_code != 200:
+            raise xmlrpc.client.ProtocolError(self.url, response.status_code,
+                                              response.reason,
+                                              response.headers)
+
+        parser, unmarshaller = self.getparser()
+        parser.feed(response.content)
+        parser.close()
+        return unmarshaller.close()
+
+
+class HTTPTransport:
+    """
+    Talk to the Beaker hub directly over HTTP. All calls share one
+    authenticated session and reuse its pooled keep-alive connections.
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, hub_url, username=None, password=None,
+                 auth_method='password', pool_size=10, timeout=300):
+        """
+        Initialize a transport talking to a Beaker hub.
+
+        Args:
+            hub_url:     URL of the Beaker hub, like https://beaker.example.com
+            username:    Name of the Beaker user to log in as.
+            password:    Password of the Beaker user.
+            auth_method: 'password' or 'krbv'. Kerberos authentication needs
+                         the requests-gssapi package.
+            pool_size:   Maximum number of connections kept open to the hub.
+            timeout:     Timeout of a single HTTP request, seconds.
+        """
+        # pylint: disable=too-many-arguments
+        self.hub_url = hub_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.auth_method = auth_method
+        self.pool_size = pool_size
+        # Number of attempts and delay between them for calls failing with
+        # errors worth retrying, like 503 Service Unavailable
+        self.retries = 5
+        self.retry_delay = 10
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.hub = xmlrpc.client.ServerProxy(
+            self.hub_url + '/RPC2', allow_none=True,
+            transport=_SessionTransport(self.session, self.hub_url + '/RPC2',
+                                        timeout)
+        )
+
+        self.__logged_in = False
+        self.__login_lock = threading.Lock()
+
+    @classmethod
+    def from_client_config(cls, pool_size=10):
+        """
+        Create a transport from the Beaker client configuration used by bkr:
+        the file in $BEAKER_CLIENT_CONF, ~/.beaker_client/config or
+        /etc/beaker/client.conf.
+
+        Args:
+            pool_size: Maximum number of connections kept open to the hub.
+
+        Returns:
+            HTTPTransport instance.
+        """
+        paths = CLIENT_CONFIG_FILES
+        if os.environ.get('BEAKER_CLIENT_CONF'):
+            paths = [os.environ['BEAKER_CLIENT_CONF']]
+
+        config = {}
+        for path in paths:
+            path = os.path.expanduser(path)
+            if os.path.exists(path):
+                config = cls.parse_client_config(path)
+                break
+
+        if 'HUB_URL' not in config:
+            raise RuntimeError('HUB_URL missing in Beaker client config')
+
+        return cls(config['HUB_URL'], config.get('USERNAME'),
+                   config.get('PASSWORD'),
+                   config.get('AUTH_METHOD', 'password'), pool_size)
+
+    @classmethod
+    def parse_client_config(cls, path):
+        """
+        Parse a Beaker client configuration file, which consists of
+        KEY = "value" lines.
+
+        Args:
+            path: Path to the configuration file.
+
+        Returns:
+            Dictionary with the configuration.
+        """
+        config = {}
+        with open(path) as fileh:
+            for line in fileh:
+                key, sep, value = line.partition('=')
+                key = key.strip()
+                if not sep or not key or key.startswith('#'):
+                    continue
+                try:
+                    config[key] = ast.literal_eval(value.strip())
+                except (ValueError, SyntaxError):
+                    logging.debug('Ignoring unparsable config line: %s', line)
+
+        return config
+
+    def __login(self):
+        """Log in to the hub once; the session keeps the auth cookie."""
+        with self.__login_lock:
+            if self.__logged_in:
+                return
+
+            if self.auth_method == 'krbv':
+                try:
+                    # pylint: disable=import-outside-toplevel
+                    from requests_gssapi import HTTPSPNEGOAuth
+                except ImportError:
+                    raise RuntimeError('Kerberos authentication needs the '
+                                       'requests-gssapi package')
+                response = self.session.get(self.hub_url + '/login',
+                                            auth=HTTPSPNEGOAuth())
+                response.raise_for_status()
+            elif self.username:
+                self.hub.auth.login_password(self.username, self.password)
+
+            self.__logged_in = True
+
+    def __call(self, method, *args):
+        """
+        Call an XML-RPC method of the hub, retrying it when the hub is
+        temporarily unavailable.
+
+        Args:
+            method: Name of the method, like 'jobs.upload'.
+            args:   Arguments to pass to the method.
+
+        Returns:
+            Value returned by the method.
+        """
+        self.__login()
+
+        func = self.hub
+        for name in method.split('.'):
+            func = getattr(func, name)
+
+        for attempt in range(1, self.retries + 1):
+            try:
+                return func(*args)
+            except (xmlrpc.client.ProtocolError,
+                    requests.ConnectionError) as exc:
+                if attempt == self.retries:
+                    raise
+                logging.warning('%s failed (%s), retrying', method, exc)
+                metrics.inc('skt_beaker_retries_total',
+                            command=HUB_COMMANDS.get(method, method))
+                time.sleep(self.retry_delay)
+
+        return None
+
+    def job_results(self, taskspec):
+        """
+        Retrieve Beaker results for taskspec in Beaker's native XML format.
+
+        Args:
+            taskspec:   ID of the job, recipe or recipe set.
+
+        Returns:
+            The results XML as a string.
+        """
+        try:
+            return self.__call('taskactions.to_xml', taskspec, False, True,
+                               True)
+        except (xmlrpc.client.Error, requests.RequestException) as exc:
+            logging.warning(exc)
+            raise RuntimeError('failed getting Beaker job-results')
+
+    def job_submit(self, xml, jobowner=None):
+        """
+        Submit a Beaker job.
+
+        Args:
+            xml:      Job XML to submit.
+            jobowner: Name of a Beaker user on whose behalf the job should be
+                      submitted, or None, if the owner should be the current
+                      user.
+
+        Returns:
+            ID of the submitted job, None if the submission failed.
+        """
+        if jobowner is not None:
+            # Same as bkr job-submit --job-owner
+            job = fromstring(xml)
+            job.attrib['user'] = jobowner
+            xml = tostring(job)
+
+        if isinstance(xml, bytes):
+            xml = xml.decode('utf-8')
+
+        try:
+            return self.__call('jobs.upload', xml)
+        except (xmlrpc.client.Error, requests.RequestException) as exc:
+            logging.info(exc)
+            return None
+
+    def job_cancel(self, job_id):
+        """
+        Cancel a Beaker job.
+
+        Args:
+            job_id: ID of the job to cancel, like J:1234.
+
+        Returns:
+            True if the job was cancelled, False otherwise.
+        """
+        try:
+            self.__call('taskactions.stop', job_id, 'cancel',
+                        'Cancelled by skt')
+        except (xmlrpc.client.Error, requests.RequestException) as exc:
+            logging.info(exc)
+            return False
+
+        return True
+
+    def job_cancel_many(self, job_ids):
+        """
+        Cancel several Beaker jobs, sending the calls concurrently over the
+        pooled connections.
+
+        Args:
+            job_ids: List of IDs of the jobs to cancel, like J:1234.
+
+        Returns:
+            True if all jobs were cancelled, False otherwise.
+        """
+        if not job_ids:
+            return True
+
+        workers = min(self.pool_size, len(job_ids))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return all(executor.map(self.job_cancel, job_ids))
+
+
+def get_transport(name, pool_size=10):
+    """
+    Create a Beaker transport.
+
+    Args:
+        name:      Transport name, 'bkr' or 'http'.
+        pool_size: Maximum number of parallel calls the transport should be
+                   ready for.
+
+    Returns:
+        Transport instance.
+    """
+    if name == 'http':
+        return HTTPTransport.from_client_config(pool_size=pool_size)
+
+    return BkrTransport()
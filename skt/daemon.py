@@ -0,0 +1,498 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Daemon watching the runs of many skt clients with a single poller.
+
+Clients talk to the daemon over a Unix socket, one JSON object per line. A
+client sends a single request with the run parameters, like
+
+    {"jobtemplate": "/path/to/job.xml", "max_aborted": 3, "wait": true}
+
+and the daemon answers with the watch state of the run whenever it changes,
+and once more when the run is done:
+
+    {"jobs": {"J:1234": ["RS:5678"]}, "completed_recipes": [],
+     "aborted_count": 0, "resubmit_queue": [], "done": false}
+    {"jobs": {"J:1234": ["RS:5678"]}, "completed_recipes": ["R:9012"],
+     "aborted_count": 0, "resubmit_queue": [], "done": true, "retcode": 0}
+"""
+import collections
+import json
+import logging
+import os
+import platform
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from skt import metrics
+from skt import tracing
+from skt.decision import DecisionTable, load_condition_checks
+from skt.decision import result_condition_checks
+from skt.export import ResultExporter
+from skt.misc import SKT_ERROR, SKT_SUCCESS
+from skt.runner import BeakerRunner
+from skt.splitting import load_task_durations
+
+
+def get_watch_state(runner):
+    """
+    Get the watch state of a run in a form which can be sent to clients.
+
+    Args:
+        runner: BeakerRunner doing the run.
+
+    Returns:
+        Dictionary with the job IDs mapped to sorted lists of their recipe
+        set IDs under "jobs", the sorted IDs of finished recipes under
+        "completed_recipes", the number of aborted recipe sets under
+        "aborted_count" and the recipe sets queued to be resubmitted under
+        "resubmit_queue".
+    """
+    return {
+        'jobs': {jobid: sorted(recipe_sets) for jobid, recipe_sets
+                 in runner.job_to_recipe_set_map.items()},
+        'completed_recipes': sorted(
+            recipe_id for recipes in runner.completed_recipes.values()
+            for recipe_id in recipes
+        ),
+        'aborted_count': runner.aborted_count,
+        'resubmit_queue': runner.queued_resubmissions(),
+    }
+
+
+class Watch:
+    """A run the daemon watches for a client."""
+
+    def __init__(self, runner):
+        """
+        Args:
+            runner: BeakerRunner doing the run.
+        """
+        self.runner = runner
+        # Messages for the client, the last one has 'done' set
+        self.updates = queue.Queue()
+        self.last_state = None
+
+    def update(self, done=False):
+        """Queue a message for the client if anything changed."""
+        state = get_watch_state(self.runner)
+        if state == self.last_state and not done:
+            return
+
+        self.last_state = state
+        message = dict(state, done=done)
+        if done:
+            message['retcode'] = self.runner.retcode
+        self.updates.put(message)
+
+
+class WatchDaemon:
+    """
+    Run and watch the runs of many clients. A single poller fetches results
+    of the watched recipe sets of all runs every self.watchdelay seconds,
+    sharing one transport and up to self.poll_workers parallel calls.
+    """
+
+    def __init__(self, transport, poll_workers=1, watchdelay=60):
+        """
+        Initialize the daemon.
+
+        Args:
+            transport:    Object used to talk to Beaker, shared by all runs.
+            poll_workers: Maximum number of results fetched in parallel.
+            watchdelay:   Delay between polls, seconds.
+        """
+        self.transport = transport
+        self.poll_workers = poll_workers
+        self.watchdelay = watchdelay
+        self.watches = []
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def start_run(self, request):
+        """
+        Submit the job of a client and start watching it.
+
+        Args:
+            request: Dictionary with the run parameters. jobtemplate is
+                     required, jobowner, blacklist, max_aborted, wait,
+                     stream_results, condition_rules, split_jobs,
+                     task_durations, export_results, fail_fast and
+                     fail_fast_cancel are optional.
+
+        Returns:
+            Watch of the run.
+        """
+        runner = BeakerRunner(request['jobtemplate'], request.get('jobowner'),
+                              request.get('blacklist'), self.transport)
+        runner.stream_results = bool(request.get('stream_results'))
+        runner.split_jobs = request.get('split_jobs') or 1
+        runner.fail_fast = request.get('fail_fast')
+        runner.fail_fast_cancel = bool(request.get('fail_fast_cancel'))
+        if request.get('condition_rules'):
+            runner.decision_table = DecisionTable(
+                load_condition_checks(request['condition_rules']) +
+                result_condition_checks
+            )
+        if request.get('export_results'):
+            runner.result_export = ResultExporter(request['export_results'])
+
+        watch = Watch(runner)
+        try:
+            if request.get('task_durations'):
+                runner.task_durations = load_task_durations(
+                    request['task_durations']
+                )
+            jobids = runner.submit(request.get('max_aborted', 3))
+            if not request.get('wait'):
+                # not waiting -> change retcode to success
+                runner.retcode = SKT_SUCCESS
+                watch.update(done=True)
+                return watch
+
+            runner.watch_jobs(*jobids)
+        except Exception:
+            logging.error(traceback.format_exc())
+            watch.update(done=True)
+            return watch
+
+        watch.update()
+        with self.lock:
+            self.watches.append(watch)
+
+        return watch
+
+    def __finish(self, watch, decide=True):
+        """
+        Stop watching a run and report its result to the client.
+
+        Args:
+            watch:  Watch of the run.
+            decide: True to decide the result of the run, False if the run
+                    failed and the result stays SKT_ERROR.
+        """
+        with self.lock:
+            self.watches.remove(watch)
+
+        try:
+            watch.runner.finish(decide)
+        except Exception:
+            logging.error(traceback.format_exc())
+
+        watch.update(done=True)
+
+    def __fetch(self, watches):
+        """
+        Fetch results of all watched recipe sets of all runs.
+
+        Args:
+            watches: List of watches of the runs to fetch.
+
+        Returns:
+            Dictionary of watches to lists of (recipe set ID, etree node)
+            tuples, or to the exception raised while fetching.
+        """
+        batches = [(watch, batch) for watch in watches
+                   for batch in watch.runner.pending_batches()]
+        results = {watch: [] for watch in watches}
+        if not batches:
+            return results
+
+        workers = min(max(self.poll_workers, 1), len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [(watch, executor.submit(watch.runner.fetch_batch,
+                                               batch))
+                       for watch, batch in batches]
+
+        for watch, future in futures:
+            try:
+                batch_results = future.result()
+            except Exception as exc:
+                logging.error('Failed fetching results: %s', exc)
+                results[watch] = exc
+                continue
+
+            if not isinstance(results[watch], Exception):
+                results[watch].extend(batch_results)
+
+        return results
+
+    def poll(self):
+        """Poll all watched runs once and process their results."""
+        started = time.monotonic()
+        with self.lock:
+            watches = list(self.watches)
+
+        active = []
+        for watch in watches:
+            try:
+                if watch.runner.check_max_aborted():
+                    self.__finish(watch)
+                    continue
+            except Exception:
+                logging.error(traceback.format_exc())
+                self.__finish(watch, decide=False)
+                continue
+
+            active.append(watch)
+
+        with tracing.span('poll', runs=len(active)):
+            self.__process(active)
+
+        self.__record_poll(started)
+
+    def __process(self, watches):
+        """
+        Fetch and process the results of the watched runs.
+
+        Args:
+            watches: List of Watch objects to poll.
+        """
+        for watch, results in self.__fetch(watches).items():
+            if isinstance(results, Exception):
+                self.__finish(watch, decide=False)
+                continue
+
+            try:
+                stopped = not watch.runner.apply(results)
+            except Exception:
+                logging.error(traceback.format_exc())
+                self.__finish(watch, decide=False)
+                continue
+
+            if stopped or watch.runner.finished():
+                self.__finish(watch)
+            else:
+                watch.update()
+
+    def __record_poll(self, started):
+        """
+        Record metrics of a poll of all watched runs.
+
+        Args:
+            started: Value of time.monotonic() when the poll started.
+        """
+        if not metrics.enabled():
+            return
+
+        with self.lock:
+            runners = [watch.runner for watch in self.watches]
+        metrics.observe('skt_sweep_duration_seconds',
+                        time.monotonic() - started)
+        metrics.set_gauge('skt_watchlist_size',
+                          sum(len(runner.watchlist) for runner in runners))
+        statuses = collections.Counter()
+        for runner in runners:
+            statuses.update(runner.count_recipe_statuses())
+        metrics.replace_gauge('skt_recipes', {
+            (('status', status),): count for status, count in statuses.items()
+        })
+
+    def serve_polls(self):
+        """Poll the watched runs until stop() is called."""
+        while not self.stopping.wait(self.watchdelay):
+            self.poll()
+
+    def stop(self):
+        """Stop polling."""
+        self.stopping.set()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Handle a run request of a client."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            request = None
+        if not isinstance(request, dict) or 'jobtemplate' not in request:
+            self.send({'error': 'invalid request', 'done': True,
+                       'retcode': SKT_ERROR})
+            return
+
+        watch = self.server.daemon.start_run(request)
+        while True:
+            message = watch.updates.get()
+            try:
+                self.send(message)
+            except OSError:
+                # the client is gone, the run is still watched to the end
+                logging.warning('Client of %s disconnected',
+                                ' '.join(watch.last_state['jobs']))
+                return
+
+            if message['done']:
+                return
+
+    def send(self, message):
+        """Send a message to the client."""
+        self.wfile.write(json.dumps(message).encode() + b'\n')
+        self.wfile.flush()
+
+
+class DaemonServer(socketserver.ThreadingMixIn,
+                   socketserver.UnixStreamServer):
+    """Unix socket server passing client requests to a WatchDaemon."""
+    daemon_threads = True
+
+    def __init__(self, socket_path, daemon):
+        """
+        Listen on a Unix socket only the current user can connect to.
+
+        Args:
+            socket_path: Path to the socket.
+            daemon:      WatchDaemon running the requested runs.
+        """
+        self.daemon = daemon
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, RequestHandler)
+        finally:
+            os.umask(old_umask)
+
+
+def serve(socket_path, daemon):
+    """
+    Serve client requests and poll their runs until interrupted.
+
+    Args:
+        socket_path: Path to the socket to listen on.
+        daemon:      WatchDaemon running the requested runs.
+    """
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = DaemonServer(socket_path, daemon)
+    poller = threading.Thread(target=daemon.serve_polls, daemon=True)
+    poller.start()
+    logging.info('Listening on %s', socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        daemon.stop()
+        server.server_close()
+        os.unlink(socket_path)
+
+
+class DaemonClient:
+    """
+    Stand-in for BeakerRunner, which has a daemon do the run. The watch
+    state of the run is kept in self.job_to_recipe_set_map,
+    self.completed_recipes, self.aborted_count and self.resubmit_queue, and
+    the result in
+    self.retcode, like BeakerRunner does.
+    """
+
+    def __init__(self, socket_path, jobtemplate, jobowner=None,
+                 blacklist=None):
+        """
+        Initialize a client of the daemon listening on socket_path.
+
+        Args:
+            socket_path: Path to the socket of the daemon.
+            jobtemplate: Path to a Beaker job template.
+            jobowner:    Name of a Beaker user on whose behalf the job should
+                         be submitted, or None.
+            blacklist:   Path to file containing hostnames to blacklist from
+                         running on, or None.
+        """
+        self.socket_path = socket_path
+        self.request = {
+            'jobtemplate': os.path.abspath(os.path.expanduser(jobtemplate)),
+            'jobowner': jobowner,
+            'blacklist': blacklist and os.path.abspath(blacklist),
+        }
+        self.stream_results = False
+        self.condition_rules = None
+        self.split_jobs = 1
+        # Path to the file with expected run times of tasks, see
+        # skt.splitting.load_task_durations()
+        self.task_durations = None
+        # Path to the file the daemon exports the results of the recipes to,
+        # see skt.export, or None
+        self.export_results = None
+        # See BeakerRunner.fail_fast and BeakerRunner.fail_fast_cancel
+        self.fail_fast = None
+        self.fail_fast_cancel = False
+        self.job_to_recipe_set_map = {}
+        # Finished recipes of the run, the daemon doesn't group them by
+        # recipe sets so all of them are kept under None
+        self.completed_recipes = {}
+        self.aborted_count = 0
+        # Recipe sets the daemon queued to be resubmitted
+        self.resubmit_queue = []
+        # Called without arguments whenever the watch state changes, or None
+        self.checkpoint = None
+        self.checkpoint_interval = None
+        self.retcode = SKT_ERROR
+
+    def run(self, url, max_aborted, release, wait=False,
+            arch=platform.machine()):
+        """
+        Have the daemon run tests in Beaker, see BeakerRunner.run().
+
+        Returns:
+            Return code of the run, SKT_ERROR if the daemon can't be reached.
+        """
+        # pylint: disable=too-many-arguments,unused-argument
+        request = dict(self.request, max_aborted=max_aborted, wait=wait,
+                       stream_results=self.stream_results,
+                       condition_rules=self.condition_rules,
+                       split_jobs=self.split_jobs,
+                       task_durations=self.task_durations,
+                       export_results=self.export_results,
+                       fail_fast=self.fail_fast,
+                       fail_fast_cancel=self.fail_fast_cancel)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(self.socket_path)
+                sock.sendall(json.dumps(request).encode() + b'\n')
+                with sock.makefile('rb') as messages:
+                    for line in messages:
+                        message = json.loads(line)
+                        self.__update(message)
+                        if message.get('done'):
+                            self.retcode = message['retcode']
+                            break
+                        if self.checkpoint:
+                            self.checkpoint()
+        except (OSError, ValueError):
+            exc = sys.exc_info()
+            logging.error('\n'.join(traceback.format_exception(*exc)))
+
+        return self.retcode
+
+    def __update(self, message):
+        """Update the watch state from a message of the daemon."""
+        self.job_to_recipe_set_map = {
+            jobid: set(recipe_sets)
+            for jobid, recipe_sets in message.get('jobs', {}).items()
+        }
+        self.completed_recipes = {
+            None: set(message.get('completed_recipes', []))
+        }
+        self.aborted_count = message.get('aborted_count', 0)
+        self.resubmit_queue = message.get('resubmit_queue', [])
+
+    def queued_resubmissions(self):
+        """Get the recipe sets the daemon queued to be resubmitted, see
+        BeakerRunner.queued_resubmissions()."""
+        return list(self.resubmit_queue)
@@ -0,0 +1,214 @@
+# Copyright (c) 2017-2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Rules deciding the result of a recipe by its tasks."""
+import collections
+import itertools
+import json
+
+from skt import misc
+from skt.misc import SKT_SUCCESS, SKT_FAIL, SKT_ERROR
+
+# Features of a task the conditions are checked against
+TaskFeatures = collections.namedtuple('TaskFeatures', [
+    'result', 'status', 'waived', 'prev_task_panicked_and_waived'
+])
+
+# Features with boolean values, all other features hold strings
+BOOLEAN_FEATURES = ['waived', 'prev_task_panicked_and_waived']
+
+# Stands for all values of a feature which no condition checks for
+OTHER = object()
+
+
+def get_task_features(task, prev_task):
+    """
+    Get the features of a task the conditions are checked against.
+
+    Args:
+        task:      TaskRecord of the task.
+        prev_task: TaskRecord of the task that was run before this one, or
+                   None if this task is the first task in the recipe.
+
+    Returns:
+        TaskFeatures.
+    """
+    return TaskFeatures(
+        task.result, task.status, task.waived,
+        prev_task is not None and prev_task.waived and
+        prev_task.result == 'Panic'
+    )
+
+
+class ConditionCheck:
+    def __init__(self, retval, **kwargs):
+        self.retval = retval
+        self.kwargs = kwargs
+
+    def __str__(self):
+        values = ' '.join([f'{arg}={self.kwargs[arg]}' for arg in self.kwargs])
+
+        return f'retval={self.retval} {values}'
+
+    def __call__(self, task, prev_task):
+        """ Evaluates the condition and return retval if matched, else None.
+
+            Args:
+                task: TaskRecord of the task
+                prev_task: TaskRecord of the task that was run before this
+                           one, or None if this task is the first task in the
+                           recipe
+        """
+        if self.matches(get_task_features(task, prev_task)):
+            return self.retval
+
+        return None
+
+    def matches(self, features):
+        """ Check whether task features meet the condition.
+
+            Args:
+                features: TaskFeatures of the task
+            Returns:
+                True if the features match all the conditions, else False
+        """
+        if not self.kwargs:
+            # don't match empty conditions as satisfied
+            return False
+
+        for arg in self.kwargs:
+            if getattr(features, arg) != self.kwargs[arg]:
+                # the status entry doesn't match all the conditions
+                return False
+
+        # the status entry matches all the conditions
+        return True
+
+
+result_condition_checks = [
+    # This contains objects that will return <retval> (first parameter), when
+    # all the specified conditions are met. Empty conditions with no keywords
+    # are never met.
+
+    # Previous task was waived and panicked, which causes the next
+    # task to abort. The task is waived for a reason, return
+    # SKT_SUCCESS.
+    ConditionCheck(SKT_SUCCESS, result='Warn', waived=False, status='Aborted',
+                   prev_task_panicked_and_waived=True),
+
+    # A non-waived task panicked, return SKT_FAIL and don't confuse
+    # this with infra-errors.
+    ConditionCheck(SKT_FAIL, result='Panic', waived=False),
+
+    # A non-waived tasked aborted, return SKT_ERROR, possible
+    # infra issue.
+    ConditionCheck(SKT_ERROR, result='Warn',  waived=False, status='Aborted'),
+
+    # The rest of the fall-through conditions.
+    ConditionCheck(SKT_FAIL, result='Warn', waived=False),
+    ConditionCheck(SKT_FAIL, result='Fail', waived=False),
+]
+
+
+class DecisionTable:
+    """
+    Condition checks compiled into a table mapping every combination of task
+    features to the first check they match. Feature values which no check
+    tests for are looked up as OTHER, so the table stays small.
+    """
+
+    def __init__(self, checks):
+        """
+        Compile condition checks.
+
+        Args:
+            checks: List of ConditionChecks, in the order they apply.
+        """
+        self.checks = list(checks)
+        self.domains = []
+        for feature in TaskFeatures._fields:
+            if feature in BOOLEAN_FEATURES:
+                self.domains.append((False, True))
+                continue
+
+            self.domains.append(tuple({check.kwargs[feature]
+                                       for check in self.checks
+                                       if feature in check.kwargs}) +
+                                (OTHER,))
+
+        self.table = {}
+        for features in itertools.product(*self.domains):
+            features = TaskFeatures(*features)
+            self.table[features] = next(
+                (check for check in self.checks if check.matches(features)),
+                None
+            )
+
+    def lookup(self, features):
+        """
+        Find the first condition check task features match.
+
+        Args:
+            features: TaskFeatures of the task.
+
+        Returns:
+            The matching ConditionCheck, None if there is none.
+        """
+        return self.table[TaskFeatures(*(
+            value if value in domain else OTHER
+            for value, domain in zip(features, self.domains)
+        ))]
+
+
+def load_condition_checks(path):
+    """
+    Load condition checks from a JSON file. The file holds a list of rules,
+    each of them an object with "retval" set to the name of a return code
+    like "SKT_FAIL" and the conditions as the other members, like:
+
+        [{"retval": "SKT_FAIL", "result": "Warn", "status": "Cancelled"}]
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        List of ConditionChecks, in the order of the rules.
+
+    Raises:
+        ValueError if a rule is invalid.
+    """
+    with open(path) as fileh:
+        rules = json.load(fileh)
+
+    checks = []
+    for rule in rules:
+        rule = dict(rule)
+        retval = rule.pop('retval', None)
+        if not str(retval).startswith('SKT_') or \
+                not hasattr(misc, str(retval)):
+            raise ValueError(f'Invalid retval in rule {rule}: {retval}')
+
+        for feature, value in rule.items():
+            if feature not in TaskFeatures._fields:
+                raise ValueError(f'Unknown condition {feature} in rule {rule}')
+            if feature in BOOLEAN_FEATURES and not isinstance(value, bool):
+                raise ValueError(f'Condition {feature} in rule {rule} must '
+                                 f'be true or false')
+            if feature not in BOOLEAN_FEATURES and \
+                    not isinstance(value, str):
+                raise ValueError(f'Condition {feature} in rule {rule} must '
+                                 f'be a string')
+
+        checks.append(ConditionCheck(getattr(misc, retval), **rule))
+
+    return checks
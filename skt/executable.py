@@ -21,10 +21,11 @@ import signal
 import sys
 import tempfile
 
-from rcdefinition.rc_data import SKTData
+from skt.misc import SKT_ERROR, VERDICTS
 
-from skt.misc import SKT_ERROR
-from skt.runner import BeakerRunner
+# The modules needed by the commands are imported when running them, so
+# "skt --help" and argument errors don't wait for the runner, the Beaker
+# transports and their dependencies to load. See benchmarks/startup.py.
 
 LOGGER = logging.getLogger()
 
@@ -34,18 +35,131 @@ def full_path(path):
     return os.path.abspath(os.path.expanduser(path))
 
 
-def cmd_run(skt_data):
+def save_state(skt_data, runner):
+    """
+    Save SKT job state (jobs, recipesets, completed recipes, aborted count,
+    recipe sets queued for resubmission, retcode) to rc-file.
+
+    Args:
+        skt_data: SKTData, parsed rc config file overriden with cmd-line args
+        runner:   The runner whose state is saved.
+    """
+    skt_data.state.jobs = ' '.join(runner.job_to_recipe_set_map.keys())
+    skt_data.state.recipesets = ' '.join(
+        list(itertools.chain.from_iterable(
+            runner.job_to_recipe_set_map.values()
+        ))
+    )
+    skt_data.state.completed_recipes = ' '.join(sorted(
+        itertools.chain.from_iterable(runner.completed_recipes.values())
+    ))
+    skt_data.state.aborted_count = runner.aborted_count
+    skt_data.state.resubmit_queue = ' '.join(runner.queued_resubmissions())
+
+    skt_data.state.retcode = runner.retcode
+
+    # Replace the rc-file at once, so being killed or interrupted by the
+    # signal handler saving the state again doesn't leave it truncated
+    path = skt_data.state.rc
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix='.skt-rc-')
+    try:
+        with os.fdopen(fd, 'w') as fhandle:
+            fhandle.write(skt_data.serialize())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # also SystemExit raised by the signal handler
+        os.unlink(tmp_path)
+        raise
+
+
+def cmd_run(skt_data, resume=False):
     """
     Run tests on a built kernel using the specified "runner". Only "Beaker"
     runner is currently supported.
 
     Args:
         skt_data: SKTData, parsed rc config file overriden with cmd-line args
+        resume:   True to continue watching the jobs saved in the rc file by
+                  an interrupted run instead of submitting new ones.
     """
+    # pylint: disable=import-outside-toplevel
+    # The modules of optional features are only imported when they're used
+    from skt.beaker import get_transport
+    from skt.runner import BeakerRunner
+
     jobtemplate = skt_data.runner.jobtemplate
     jobowner = skt_data.runner.jobowner
     blacklist = skt_data.runner.blacklist
-    runner = BeakerRunner(jobtemplate, jobowner, blacklist)
+    poll_workers = getattr(skt_data.state, 'poll_workers', None) or 1
+    condition_rules = getattr(skt_data.state, 'condition_rules', None)
+    daemon_socket = getattr(skt_data.state, 'daemon_socket', None)
+    task_durations = getattr(skt_data.state, 'task_durations', None)
+    export_results = getattr(skt_data.state, 'export_results', None)
+    fail_fast = getattr(skt_data.state, 'fail_fast', None)
+    fail_fast = fail_fast and {name: retcode for retcode, name
+                               in VERDICTS.items()}[fail_fast]
+    if daemon_socket and not resume:
+        # have a running skt daemon submit and watch the job
+        from skt.daemon import DaemonClient
+        runner = DaemonClient(full_path(daemon_socket), jobtemplate, jobowner,
+                              blacklist)
+        runner.condition_rules = condition_rules and full_path(
+            condition_rules
+        )
+        runner.task_durations = task_durations and full_path(task_durations)
+        runner.export_results = export_results and full_path(export_results)
+    else:
+        transport = get_transport(
+            getattr(skt_data.state, 'beaker_transport', None) or 'bkr',
+            pool_size=poll_workers
+        )
+        runner_class = BeakerRunner
+        if getattr(skt_data.state, 'use_asyncio', False):
+            from skt.async_runner import AsyncBeakerRunner
+            runner_class = AsyncBeakerRunner
+        runner = runner_class(jobtemplate, jobowner, blacklist, transport)
+        runner.poll_workers = poll_workers
+        runner.adaptive_polling = bool(getattr(skt_data.state,
+                                               'adaptive_polling', False))
+        if condition_rules:
+            from skt.decision import DecisionTable, load_condition_checks
+            from skt.decision import result_condition_checks
+            runner.decision_table = DecisionTable(
+                load_condition_checks(condition_rules) +
+                result_condition_checks
+            )
+        if task_durations:
+            from skt.splitting import load_task_durations
+            runner.task_durations = load_task_durations(task_durations)
+        runner.resubmit_window = getattr(skt_data.state, 'resubmit_window',
+                                         None) or 0
+        runner.checkpoint_interval = getattr(
+            skt_data.state, 'checkpoint_interval', None
+        ) or 300
+        if export_results:
+            from skt.export import ResultExporter
+            runner.result_export = ResultExporter(full_path(export_results))
+        notifications = getattr(skt_data.state, 'notifications', None)
+        if notifications:
+            from skt.notifications import from_url
+            runner.notifications = from_url(
+                notifications
+            ).start()
+    runner.fail_fast = fail_fast
+    runner.fail_fast_cancel = bool(getattr(skt_data.state, 'fail_fast_cancel',
+                                           False))
+    # save the watch state periodically, so an interrupted run can be resumed
+    # even if the cleanup handler never runs
+    runner.checkpoint = lambda: save_state(skt_data, runner)
+    runner.stream_results = bool(getattr(skt_data.state, 'stream_results',
+                                         False))
+    runner.split_jobs = getattr(skt_data.state, 'split_jobs', None) or 1
     try:
         cmd_run.cleanup_done
     except AttributeError:
@@ -64,16 +178,7 @@ def cmd_run(skt_data):
         if cmd_run.cleanup_done:
             return
 
-        skt_data.state.jobs = ' '.join(runner.job_to_recipe_set_map.keys())
-        skt_data.state.recipesets = ' '.join(
-            list(itertools.chain.from_iterable(
-                runner.job_to_recipe_set_map.values()
-            ))
-        )
-
-        skt_data.state.retcode = runner.retcode
-        with open(skt_data.state.rc, 'w') as fhandle:
-            fhandle.write(skt_data.serialize())
+        save_state(skt_data, runner)
 
         # NOTE: Don't cancel jobs. Per ticket #1140, Beaker jobs must continue
         # to run when a timeout is reached and skt is killed in the GitLab
@@ -92,6 +197,20 @@ def cmd_run(skt_data):
     atexit.register(cleanup_handler)
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    if resume:
+        jobs = (skt_data.state.jobs or '').split()
+        if not jobs:
+            LOGGER.error('No jobs to resume in %s', skt_data.state.rc)
+            return SKT_ERROR
+
+        return runner.resume(
+            jobs, set((skt_data.state.recipesets or '').split()),
+            set((skt_data.state.completed_recipes or '').split()),
+            int(skt_data.state.aborted_count or 0),
+            skt_data.state.max_aborted_count,
+            (getattr(skt_data.state, 'resubmit_queue', None) or '').split()
+        )
+
     return runner.run(skt_data.state.kernel_package_url,
                       skt_data.state.max_aborted_count,
                       skt_data.state.kernel_version,
@@ -99,6 +218,65 @@ def cmd_run(skt_data):
                       arch=skt_data.state.kernel_arch)
 
 
+def cmd_daemon(skt_data):
+    """
+    Serve runs of "skt run --daemon-socket" clients, polling Beaker for all
+    of them at once, until interrupted.
+
+    Args:
+        skt_data: SKTData, parsed rc config file overriden with cmd-line args
+    """
+    # pylint: disable=import-outside-toplevel
+    from skt.beaker import get_transport
+    from skt.daemon import WatchDaemon, serve
+
+    poll_workers = getattr(skt_data.state, 'poll_workers', None) or 1
+    transport = get_transport(
+        getattr(skt_data.state, 'beaker_transport', None) or 'bkr',
+        pool_size=poll_workers
+    )
+    daemon = WatchDaemon(transport, poll_workers)
+    serve(full_path(skt_data.state.socket), daemon)
+
+    return 0
+
+
+def setup_metrics(skt_data):
+    """
+    Enable metrics and start exporting them, if requested.
+
+    Args:
+        skt_data: SKTData, parsed rc config file overriden with cmd-line args
+    """
+    port = getattr(skt_data.state, 'metrics_port', None)
+    textfile = getattr(skt_data.state, 'metrics_textfile', None)
+    if not port and not textfile:
+        return
+
+    from skt import metrics  # pylint: disable=import-outside-toplevel
+    metrics.enable()
+    if port:
+        metrics.start_http_server(port)
+    if textfile:
+        metrics.start_textfile_writer(full_path(textfile))
+
+
+def setup_tracing(skt_data):
+    """
+    Enable tracing and write the trace at exit, if requested.
+
+    Args:
+        skt_data: SKTData, parsed rc config file overriden with cmd-line args
+    """
+    trace_file = getattr(skt_data.state, 'trace_file', None)
+    if not trace_file:
+        return
+
+    from skt import tracing  # pylint: disable=import-outside-toplevel
+    tracing.enable()
+    atexit.register(tracing.write_trace, full_path(trace_file))
+
+
 def setup_logging(verbose):
     """
     Setup the root logger.
@@ -112,6 +290,75 @@ def setup_logging(verbose):
     logging.getLogger('urllib3').setLevel(logging.WARNING)
 
 
+def add_watch_arguments(parser):
+    """
+    Add the arguments of the commands watching jobs to a sub-command parser.
+
+    Args:
+        parser: The sub-command parser.
+    """
+    parser.add_argument('--max-aborted-count', type=int,
+                        help='Ignore <count> aborted jobs to work around '
+                             'temporary infrastructure issues. Defaults '
+                             'to 3.')
+    parser.add_argument('--poll-workers', type=int,
+                        help='Fetch results of up to <count> recipe sets '
+                             'in parallel. Defaults to 1.')
+    parser.add_argument('--beaker-transport', choices=['bkr', 'http'],
+                        help='Talk to Beaker by running the bkr client '
+                             '(bkr), or directly over HTTP using the bkr '
+                             'client configuration (http). Defaults to '
+                             'bkr.')
+    parser.add_argument('--adaptive-polling', action='store_true',
+                        help='Poll each recipe set as often as its state '
+                             'needs instead of polling all recipe sets '
+                             'every minute.')
+    parser.add_argument('--stream-results', action='store_true',
+                        help='Spool Beaker results to a temporary file '
+                             'and parse them incrementally, dropping '
+                             'logs, to keep memory use low with big '
+                             'jobs. Only used with the bkr transport.')
+    parser.add_argument('--condition-rules',
+                        help='JSON file with rules deciding results of '
+                             'recipes by their tasks, checked before the '
+                             'built-in rules.')
+    parser.add_argument('--async', action='store_true',
+                        dest='use_asyncio',
+                        help='Do the Beaker calls of the watch loop '
+                             'concurrently from an asyncio event loop, '
+                             'up to --poll-workers at a time.')
+    parser.add_argument('--resubmit-window', type=int,
+                        help='Wait up to <seconds> for more aborted recipe '
+                             'sets, so they can be resubmitted together as '
+                             'one job. Defaults to 0, resubmitting the '
+                             'recipe sets aborted in one poll together.')
+    parser.add_argument('--checkpoint-interval', type=int,
+                        help='Save the watch state to the rc file every '
+                             '<seconds> while waiting, so the run can be '
+                             'resumed. Defaults to 300.')
+    parser.add_argument('--notifications', metavar='URL',
+                        help='Poll watched jobs as soon as notifications '
+                             'about them arrive from this source, like '
+                             'file:///path/events.jsonl or stomp://user:'
+                             'password@broker:61613/topic/beaker. They are '
+                             'still polled every minute.')
+    parser.add_argument('--export-results', metavar='PATH',
+                        help='Append a JSON line with the result and verdict '
+                             'of every recipe to this file as soon as the '
+                             'recipe finishes.')
+    parser.add_argument('--fail-fast', nargs='?', const='error',
+                        choices=['fail', 'boot', 'error'], metavar='RESULT',
+                        help='Stop waiting once a finished recipe set has a '
+                             'recipe with this result or a more severe one '
+                             '(fail < boot < error), and report it as the '
+                             'result of the run. Without a value, only an '
+                             'error, which no other recipe can change, '
+                             'stops waiting.')
+    parser.add_argument('--fail-fast-cancel', action='store_true',
+                        help='Cancel the remaining jobs when failing fast '
+                             'instead of leaving them running.')
+
+
 def setup_parser():
     """
     Create an skt command line parser.
@@ -135,24 +382,96 @@ def setup_parser():
         action="store_true",
         default=False
     )
-
-    subparsers = parser.add_subparsers()
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve Prometheus metrics of the Beaker calls '
+                             'and the watch loop on this port, at /metrics')
+    parser.add_argument('--metrics-textfile',
+                        help='Write Prometheus metrics of the Beaker calls '
+                             'and the watch loop to this file for the node '
+                             'exporter textfile collector')
+    parser.add_argument('--trace-file',
+                        help='Write a trace of the phases of the run to this '
+                             'file at exit, in the Chrome trace event format')
+
+    subparsers = parser.add_subparsers(dest='command')
 
     # These arguments apply to the 'run' skt command
     parser_run = subparsers.add_parser("run", add_help=False)
-    parser_run.add_argument('--max-aborted-count', type=int,
-                            help='Ignore <count> aborted jobs to work around '
-                                 'temporary infrastructure issues. Defaults '
-                                 'to 3.')
     parser_run.add_argument("--wait", action="store_true",
                             help="Do not exit until tests are finished")
+    add_watch_arguments(parser_run)
+    parser_run.add_argument('--split-jobs', type=int,
+                            help='Split the recipe sets of the job template '
+                                 'into <count> jobs of similar expected '
+                                 'duration, submitted concurrently and '
+                                 'watched as one run. Defaults to 1.')
+    parser_run.add_argument('--task-durations',
+                            help='JSON file with expected run times of tasks '
+                                 'by their names in seconds, used to balance '
+                                 '--split-jobs for tasks without an '
+                                 'expectedTime hint.')
+    parser_run.add_argument('--daemon-socket',
+                            help='Have the skt daemon listening on this Unix '
+                                 'socket submit and watch the job.')
 
     parser_run.add_argument("-h", "--help", help="Run sub-command help",
                             action="help")
 
+    # These arguments apply to the 'resume' skt command
+    parser_resume = subparsers.add_parser(
+        "resume", help='Continue watching the jobs saved in the rc file by '
+                       'an interrupted run, without submitting them again'
+    )
+    add_watch_arguments(parser_resume)
+
+    # These arguments apply to the 'daemon' skt command
+    parser_daemon = subparsers.add_parser(
+        "daemon", help='Watch the jobs of many "skt run --daemon-socket" '
+                       'clients with a single poller'
+    )
+    parser_daemon.add_argument('--socket', required=True,
+                               help='Path to the Unix socket to listen on.')
+    parser_daemon.add_argument('--poll-workers', type=int,
+                               help='Fetch results of up to <count> recipe '
+                                    'sets in parallel. Defaults to 1.')
+    parser_daemon.add_argument('--beaker-transport', choices=['bkr', 'http'],
+                               help='Talk to Beaker by running the bkr '
+                                    'client (bkr), or directly over HTTP '
+                                    '(http). Defaults to bkr.')
+
     return parser
 
 
+def check_arguments(parser, args):
+    """
+    Reject command line arguments which don't work together, exiting with a
+    usage error.
+
+    Args:
+        parser: The skt command line parser.
+        args:   argparse.Namespace, parsed cmd-line args
+    """
+    if getattr(args, 'daemon_socket', None):
+        # the daemon polls all runs the same way, on its own transport
+        unsupported = [option for option, dest in (
+            ('--adaptive-polling', 'adaptive_polling'),
+            ('--notifications', 'notifications'),
+            ('--async', 'use_asyncio'),
+        ) if getattr(args, dest, None)]
+        if unsupported:
+            parser.error('{} can\'t be used with --daemon-socket'.format(
+                ', '.join(unsupported)
+            ))
+
+    if getattr(args, 'notifications', None):
+        # pylint: disable=import-outside-toplevel
+        from skt.notifications import from_url
+        try:
+            from_url(args.notifications)
+        except ValueError as exc:
+            parser.error('argument --notifications: {}'.format(exc))
+
+
 def post_fixture(skt_data):
     """ Modifies skt configuration to set defaults or modify params."""
     # Get an absolute path for the work directory
@@ -169,6 +488,18 @@ def post_fixture(skt_data):
     if not skt_data.state.max_aborted_count:
         skt_data.state.max_aborted_count = 3
 
+    # Poll recipe sets one after another by default
+    if not skt_data.state.poll_workers:
+        skt_data.state.poll_workers = 1
+
+    # Keep using the bkr client by default
+    if not skt_data.state.beaker_transport:
+        skt_data.state.beaker_transport = 'bkr'
+
+    # Save the watch state every 5 minutes by default
+    if not skt_data.state.checkpoint_interval:
+        skt_data.state.checkpoint_interval = 300
+
     # Get absolute path to blacklist file
     if skt_data.runner.blacklist:
         skt_data.runner.blacklist = full_path(skt_data.runner.blacklist)
@@ -198,6 +529,9 @@ def load_skt_config_data(args):
     Returns:
         skt_data: SKTData, parsed rc config file
     """
+    # pylint: disable=import-outside-toplevel
+    from rcdefinition.rc_data import SKTData
+
     # make sure path to rc-file is absolute
     args.rc = full_path(args.rc)
 
@@ -216,13 +550,22 @@ def main():
     try:
         parser = setup_parser()
         args = parser.parse_args()
+        check_arguments(parser, args)
         skt_data = load_skt_config_data(args)
 
         setup_logging(skt_data.state.verbose)
 
         skt_data = post_fixture(skt_data)
 
-        retcode = cmd_run(skt_data)
+        setup_metrics(skt_data)
+        setup_tracing(skt_data)
+
+        if getattr(args, 'command', None) == 'daemon':
+            retcode = cmd_daemon(skt_data)
+        elif getattr(args, 'command', None) == 'resume':
+            retcode = cmd_run(skt_data, resume=True)
+        else:
+            retcode = cmd_run(skt_data)
 
         sys.exit(retcode)
     except KeyboardInterrupt:
@@ -0,0 +1,95 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Export of the results of recipes as they finish, one JSON object per line,
+like:
+
+    {"recipe": "R:1234", "recipe_set": "RS:567", "job": "J:89",
+     "system": "host.example.com", "status": "Completed", "result": "Fail",
+     "verdict": "fail", "retcode": 1, "message": "recipeid R:1234 -> ...",
+     "tests": ["/distribution/kpkginstall", "Boot test", "/test/a"],
+     "waived_failures": ["/test/b"], "time": "2020-05-04T12:34:56Z"}
+
+The verdict is the one the recipe would get in the result of the whole run,
+before any resubmission of its recipe set.
+"""
+import json
+import threading
+import time
+
+from skt.misc import VERDICTS
+
+# Task results counting as failures
+FAILED_RESULTS = ['Fail', 'Warn', 'Panic']
+
+
+def recipe_record(analysis, recipe_set_id, job_id, retcode, message):
+    """
+    Create the exported record of a finished recipe.
+
+    Args:
+        analysis:      RecipeAnalysis of the recipe.
+        recipe_set_id: ID of the recipe set of the recipe, like RS:567.
+        job_id:        ID of the job of the recipe, like J:89, or None.
+        retcode:       Verdict of the recipe, like SKT_FAIL.
+        message:       Explanation of the verdict.
+
+    Returns:
+        Dictionary with the record.
+    """
+    # pylint: disable=too-many-arguments
+    record = analysis.record
+    return {
+        'recipe': 'R:' + record.id,
+        'recipe_set': recipe_set_id,
+        'job': job_id,
+        'system': record.system,
+        'status': record.status,
+        'result': record.result,
+        'verdict': VERDICTS.get(retcode, 'error'),
+        'retcode': retcode,
+        'message': message,
+        'tests': list(analysis.tests_run),
+        'waived_failures': [task.name for task in record.tasks
+                            if task.waived and
+                            task.result in FAILED_RESULTS],
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+class ResultExporter:
+    """
+    Append records to a JSON Lines file. The file is opened for every record,
+    so readers can follow it and it can be rotated while watching.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Path to the file.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        """
+        Append a record to the file.
+
+        Args:
+            record: Dictionary to append.
+        """
+        line = json.dumps(record, sort_keys=True) + '\n'
+        with self.lock:
+            with open(self.path, 'a') as fileh:
+                fileh.write(line)
@@ -0,0 +1,431 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Prometheus metrics of the Beaker calls and the watch loop.
+
+Metrics are disabled by default and every recording function returns right
+away until enable() is called. Enabled metrics can be exported in the
+Prometheus text format over HTTP, see start_http_server(), or to a file
+read by the node exporter textfile collector, see start_textfile_writer().
+"""
+import atexit
+import bisect
+import functools
+import os
+import tempfile
+import threading
+import time
+
+# Buckets of the Beaker call and sweep durations, seconds
+CALL_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Buckets of the time from the start of a run to its verdict, seconds
+VERDICT_BUCKETS = (600, 1800, 3600, 7200, 14400, 28800, 57600, 86400)
+
+# (name, type, help, buckets) of all metrics
+DEFINITIONS = [
+    ('skt_beaker_calls_total', 'counter',
+     'Beaker calls by command', None),
+    ('skt_beaker_call_duration_seconds', 'histogram',
+     'Duration of Beaker calls by command', CALL_BUCKETS),
+    ('skt_beaker_call_errors_total', 'counter',
+     'Beaker calls which raised an exception, by command', None),
+    ('skt_beaker_retries_total', 'counter',
+     'Beaker calls retried after temporary errors, by command: job-results '
+     'and job-submit of the bkr transport, every hub call of the http '
+     'transport', None),
+    ('skt_sweep_duration_seconds', 'histogram',
+     'Duration of fetching and processing the results of a poll',
+     CALL_BUCKETS),
+    ('skt_watchlist_size', 'gauge',
+     'Number of recipe sets being watched', None),
+    ('skt_recipes', 'gauge',
+     'Number of recipes of the watched jobs by status', None),
+    ('skt_resubmissions_total', 'counter',
+     'Recipe sets resubmitted after infrastructure issues', None),
+    ('skt_resubmissions_dropped_total', 'counter',
+     'Recipe sets queued for resubmission but thrown away before it, like '
+     'when the jobs are cancelled', None),
+    ('skt_aborts_total', 'counter',
+     'Recipe sets counted as aborted, by reason', None),
+    ('skt_time_to_verdict_seconds', 'histogram',
+     'Time from the start of a run to its verdict', VERDICT_BUCKETS),
+]
+
+# Registry of the enabled metrics, None while disabled
+REGISTRY = None
+
+
+def format_labels(labels, extra=()):
+    """
+    Format labels of a sample.
+
+    Args:
+        labels: Tuple of sorted (name, value) tuples.
+        extra:  More (name, value) tuples to add at the end.
+
+    Returns:
+        String like '{command="job-results"}', empty if there are no labels.
+    """
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+
+    return '{' + ','.join('{}="{}"'.format(
+        name, str(value).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    ) for name, value in pairs) + '}'
+
+
+def format_value(value):
+    """Format a sample value or a bucket bound."""
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A metric and the values of all its label combinations."""
+
+    def __init__(self, name, metric_type, help_text, buckets=None):
+        """
+        Args:
+            name:        Name of the metric.
+            metric_type: 'counter', 'gauge' or 'histogram'.
+            help_text:   Description of the metric.
+            buckets:     Upper bounds of the histogram buckets.
+        """
+        self.name = name
+        self.type = metric_type
+        self.help = help_text
+        self.buckets = tuple(buckets or ()) + (float('inf'),)
+        # Values by tuple of sorted (label, value) tuples. Histograms keep
+        # [bucket counts, sum, count] lists.
+        self.values = {}
+
+    def render(self):
+        """
+        Render the metric in the Prometheus text format.
+
+        Returns:
+            List of lines.
+        """
+        lines = ['# HELP {} {}'.format(self.name, self.help),
+                 '# TYPE {} {}'.format(self.name, self.type)]
+        for labels, value in sorted(self.values.items()):
+            if self.type != 'histogram':
+                lines.append('{}{} {}'.format(self.name, format_labels(labels),
+                                              format_value(value)))
+                continue
+
+            bucket_counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append('{}_bucket{} {}'.format(
+                    self.name,
+                    format_labels(labels, [('le', format_value(bound))]),
+                    cumulative
+                ))
+            lines.append('{}_sum{} {}'.format(self.name, format_labels(labels),
+                                              format_value(total)))
+            lines.append('{}_count{} {}'.format(self.name,
+                                                format_labels(labels), count))
+
+        return lines
+
+
+class Registry:
+    """Thread safe collection of metrics."""
+
+    def __init__(self, definitions):
+        """
+        Args:
+            definitions: List of (name, type, help, buckets) tuples.
+        """
+        self.lock = threading.Lock()
+        self.metrics = {definition[0]: Metric(*definition)
+                        for definition in definitions}
+
+    def inc(self, name, amount, labels):
+        """Increase a counter or a gauge."""
+        key = tuple(sorted(labels.items()))
+        metric = self.metrics[name]
+        with self.lock:
+            metric.values[key] = metric.values.get(key, 0) + amount
+
+    def set(self, name, value, labels):
+        """Set a gauge."""
+        with self.lock:
+            self.metrics[name].values[tuple(sorted(labels.items()))] = value
+
+    def replace(self, name, values):
+        """
+        Set all values of a gauge, dropping label combinations which are not
+        given.
+
+        Args:
+            name:   Name of the gauge.
+            values: Dictionary of label dictionaries, as tuples of (label,
+                    value) tuples, to values.
+        """
+        with self.lock:
+            self.metrics[name].values = {tuple(sorted(labels)): value
+                                         for labels, value in values.items()}
+
+    def observe(self, name, value, labels):
+        """Add an observation to a histogram."""
+        key = tuple(sorted(labels.items()))
+        metric = self.metrics[name]
+        index = bisect.bisect_left(metric.buckets, value)
+        with self.lock:
+            if key not in metric.values:
+                metric.values[key] = [[0] * len(metric.buckets), 0, 0]
+            histogram = metric.values[key]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text format.
+
+        Returns:
+            The metrics as a string.
+        """
+        with self.lock:
+            lines = [line for metric in self.metrics.values()
+                     for line in metric.render()]
+
+        return '\n'.join(lines) + '\n'
+
+
+def enable():
+    """
+    Start recording metrics.
+
+    Returns:
+        Registry the metrics are recorded in.
+    """
+    global REGISTRY  # pylint: disable=global-statement
+    if REGISTRY is None:
+        REGISTRY = Registry(DEFINITIONS)
+
+    return REGISTRY
+
+
+def disable():
+    """Stop recording metrics and forget them."""
+    global REGISTRY  # pylint: disable=global-statement
+    REGISTRY = None
+
+
+def enabled():
+    """Check whether metrics are recorded."""
+    return REGISTRY is not None
+
+
+def inc(name, amount=1, **labels):
+    """Increase a counter if metrics are enabled."""
+    if REGISTRY is not None:
+        REGISTRY.inc(name, amount, labels)
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge if metrics are enabled."""
+    if REGISTRY is not None:
+        REGISTRY.set(name, value, labels)
+
+
+def replace_gauge(name, values):
+    """Set all values of a gauge if metrics are enabled, see
+    Registry.replace()."""
+    if REGISTRY is not None:
+        REGISTRY.replace(name, values)
+
+
+def observe(name, value, **labels):
+    """Add an observation to a histogram if metrics are enabled."""
+    if REGISTRY is not None:
+        REGISTRY.observe(name, value, labels)
+
+
+# Beaker commands of the transport methods
+TRANSPORT_COMMANDS = {
+    'job_results': 'job-results',
+    'spool_job_results': 'job-results',
+    'job_submit': 'job-submit',
+    'job_cancel': 'job-cancel',
+    'job_cancel_many': 'job-cancel',
+}
+
+
+class InstrumentedTransport:
+    """
+    Beaker transport wrapper counting and timing the calls of another
+    transport. Everything else is passed through, including the absence of
+    optional methods.
+    """
+
+    def __init__(self, transport):
+        """
+        Args:
+            transport: The wrapped transport.
+        """
+        self.transport = transport
+
+    def __getattr__(self, name):
+        attr = getattr(self.transport, name)
+        is_async = name.startswith('async_')
+        command = TRANSPORT_COMMANDS.get(name[len('async_'):] if is_async
+                                         else name)
+        if command is None:
+            return attr
+
+        if is_async:
+            @functools.wraps(attr)
+            async def async_call(*args, **kwargs):
+                start = time.monotonic()
+                try:
+                    return await attr(*args, **kwargs)
+                except Exception:
+                    inc('skt_beaker_call_errors_total', command=command)
+                    raise
+                finally:
+                    record_call(command, time.monotonic() - start)
+
+            return async_call
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                return attr(*args, **kwargs)
+            except Exception:
+                inc('skt_beaker_call_errors_total', command=command)
+                raise
+            finally:
+                record_call(command, time.monotonic() - start)
+
+        return call
+
+
+def record_call(command, duration):
+    """Record a finished Beaker call."""
+    inc('skt_beaker_calls_total', command=command)
+    observe('skt_beaker_call_duration_seconds', duration, command=command)
+
+
+def instrument(transport):
+    """
+    Wrap a transport to record metrics of its calls, if metrics are enabled.
+
+    Args:
+        transport: Beaker transport.
+
+    Returns:
+        InstrumentedTransport, or the transport itself if metrics are
+        disabled.
+    """
+    if REGISTRY is None or isinstance(transport, InstrumentedTransport):
+        return transport
+
+    return InstrumentedTransport(transport)
+
+
+def start_http_server(port, addr=''):
+    """
+    Serve the metrics over HTTP from a background thread.
+
+    Args:
+        port: Port to listen on.
+        addr: Address to listen on, all addresses by default.
+
+    Returns:
+        The server.
+    """
+    # only load the HTTP server when the metrics are served
+    import http.server  # pylint: disable=import-outside-toplevel
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        """Serve the metrics on /metrics."""
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            """Respond with the metrics."""
+            if self.path.split('?')[0] != '/metrics' or REGISTRY is None:
+                self.send_error(404)
+                return
+
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # pylint: disable=arguments-differ
+            """Don't log every scrape."""
+
+    server = http.server.ThreadingHTTPServer((addr, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    return server
+
+
+def write_textfile(path):
+    """
+    Write the metrics to a file atomically, so the node exporter never reads
+    a partial file.
+
+    Args:
+        path: Path to the file, should end with .prom.
+    """
+    if REGISTRY is None:
+        return
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix='.skt-metrics-')
+    try:
+        with os.fdopen(fd, 'w') as fileh:
+            fileh.write(REGISTRY.render())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
+
+
+def start_textfile_writer(path, interval=15):
+    """
+    Write the metrics to a file every interval seconds from a background
+    thread, and once more at exit.
+
+    Args:
+        path:     Path to the file, should end with .prom.
+        interval: Delay between writes, seconds.
+
+    Returns:
+        Event stopping the writer when set.
+    """
+    stop = threading.Event()
+
+    def writer():
+        while not stop.wait(interval):
+            write_textfile(path)
+
+    threading.Thread(target=writer, daemon=True).start()
+    atexit.register(write_textfile, path)
+
+    return stop
@@ -19,6 +19,13 @@ SKT_FAIL = 1
 SKT_ERROR = 2
 SKT_BOOT = 3
 
+# Results from the least to the most severe, a run gets the most severe
+# result of its recipes
+SEVERITY = (SKT_SUCCESS, SKT_FAIL, SKT_BOOT, SKT_ERROR)
+# Names of the results
+VERDICTS = {SKT_SUCCESS: 'pass', SKT_FAIL: 'fail', SKT_ERROR: 'error',
+            SKT_BOOT: 'boot'}
+
 
 def is_task_waived(task):
     """ Check XML param to see if the test is waived.
@@ -38,3 +45,44 @@ def is_task_waived(task):
             pass
 
     return is_task_waived_val
+
+
+def parse_duration(duration):
+    """ Parse a duration as reported by Beaker, like '1:02:03' or
+        '1 day, 1:02:03'.
+        Args:
+            duration: string with the duration
+
+        Returns: duration in seconds, None if it can't be parsed
+    """
+    days = 0
+    if ',' in duration:
+        days_part, duration = duration.split(',', 1)
+        try:
+            days = int(days_part.split()[0])
+        except (ValueError, IndexError):
+            return None
+
+    try:
+        hours, minutes, seconds = duration.strip().split(':')
+        return (days * 24 + int(hours)) * 3600 + int(minutes) * 60 + \
+            int(float(seconds))
+    except ValueError:
+        return None
+
+
+def get_task_expected_time(task):
+    """ Get the expected run time of a task from the 'avg_time' attribute
+        Beaker adds to the results, or the 'expectedTime' hint in the job.
+        Args:
+            task: xml node
+
+        Returns: expected run time in seconds, None if unknown
+    """
+    for attr in ['avg_time', 'expectedTime']:
+        try:
+            return int(task.attrib[attr])
+        except (KeyError, ValueError):
+            pass
+
+    return None
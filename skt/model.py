@@ -0,0 +1,187 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Compact records of recipe and task results."""
+from skt.decision import get_task_features
+from skt.misc import is_task_waived
+from skt.results import EWD_TEXT
+
+
+class TaskRecord:
+    """Fields of a task result used to decide the verdict of its recipe."""
+    __slots__ = ('name', 'result', 'status', 'waived', 'kpkginstall', 'ewd')
+
+    def __init__(self, name, result, status, waived=False, kpkginstall=False,
+                 ewd=False):
+        """
+        Initialize a task record.
+
+        Args:
+            name:        Name of the task.
+            result:      Result of the task, like 'Pass'.
+            status:      Status of the task, like 'Completed'.
+            waived:      True if the task is waived.
+            kpkginstall: True if the task installs the tested kernel.
+            ewd:         True if the external watchdog expired in the task.
+        """
+        # pylint: disable=too-many-arguments
+        self.name = name
+        self.result = result
+        self.status = status
+        self.waived = waived
+        self.kpkginstall = kpkginstall
+        self.ewd = ewd
+
+    @classmethod
+    def from_element(cls, task):
+        """
+        Create a record out of a task results node.
+
+        Args:
+            task: etree node of the task.
+
+        Returns:
+            TaskRecord.
+        """
+        fetch = task.find('fetch')
+        return cls(task.attrib.get('name'), task.attrib.get('result'),
+                   task.attrib.get('status'), is_task_waived(task),
+                   fetch is not None and
+                   'kpkginstall' in fetch.attrib.get('url', ''),
+                   any(res.text and EWD_TEXT in res.text
+                       for res in task.findall('.//results/')))
+
+
+class RecipeRecord:
+    """Fields of a recipe result used to decide its verdict."""
+    __slots__ = ('id', 'system', 'status', 'result', 'tasks')
+
+    def __init__(self, recipe_id, system, status, result, tasks):
+        """
+        Initialize a recipe record.
+
+        Args:
+            recipe_id: ID of the recipe, without the R: prefix.
+            system:    Hostname of the machine the recipe ran on.
+            status:    Status of the recipe, like 'Completed'.
+            result:    Result of the recipe, like 'Pass'.
+            tasks:     Tuple of TaskRecords, in the order they ran.
+        """
+        # pylint: disable=too-many-arguments
+        self.id = recipe_id
+        self.system = system
+        self.status = status
+        self.result = result
+        self.tasks = tasks
+
+    @classmethod
+    def from_element(cls, recipe):
+        """
+        Create a record out of a recipe results node.
+
+        Args:
+            recipe: etree node of the recipe.
+
+        Returns:
+            RecipeRecord.
+        """
+        return cls(recipe.attrib.get('id'), recipe.attrib.get('system'),
+                   recipe.attrib.get('status'), recipe.attrib.get('result'),
+                   tuple(TaskRecord.from_element(task)
+                         for task in recipe.findall('task')))
+
+
+def summarize_recipe_set(root):
+    """
+    Create records of all recipes in recipe set results.
+
+    Args:
+        root: etree node with the recipe set results.
+
+    Returns:
+        Tuple of RecipeRecords.
+    """
+    return tuple(RecipeRecord.from_element(recipe)
+                 for recipe in root.findall('.//recipe'))
+
+
+class RecipeAnalysis:
+    """
+    Everything the verdict helpers need to know about a recipe, found with a
+    single pass over its tasks.
+    """
+    __slots__ = ('record', 'features', 'kpkginstall_index', 'not_booting',
+                 'tests_run', 'first_non_pass')
+
+    def __init__(self, record):
+        """
+        Analyze a recipe.
+
+        Args:
+            record: RecipeRecord of the recipe.
+        """
+        self.record = record
+        # TaskFeatures of each task, see skt.decision
+        self.features = []
+        # Index of the kpkginstall task, None if there is none
+        self.kpkginstall_index = None
+        # True if the kernel failed to boot, False if the external watchdog
+        # expired elsewhere or the boot test passed without it expiring, None
+        # if the recipe has neither
+        self.not_booting = None
+        # Names of the tests which ran: all tasks after kpkginstall, including
+        # kpkginstall itself, which were not skipped. All tasks are tests if
+        # there is no kpkginstall task.
+        self.tests_run = []
+        # Index of the first task which didn't pass and wasn't skipped, None
+        # if there is no such task
+        self.first_non_pass = None
+
+        is_boot_test = False
+        prev_task = None
+        for index, task in enumerate(record.tasks):
+            self.features.append(get_task_features(task, prev_task))
+            prev_task = task
+
+            if task.kpkginstall and self.kpkginstall_index is None:
+                self.kpkginstall_index = index
+                # tasks before kpkginstall weren't tests after all
+                self.tests_run = []
+            if task.result != 'Skip':
+                self.tests_run.append(task.name)
+
+            if self.first_non_pass is None and \
+                    task.result not in ['Pass', 'Skip']:
+                self.first_non_pass = index
+
+            if self.not_booting is None:
+                if task.name == 'Boot test':
+                    is_boot_test = True
+
+                if task.ewd:
+                    self.not_booting = is_boot_test
+                elif is_boot_test:
+                    # got past the boot without hitting EWD
+                    self.not_booting = False
+
+        self.features = tuple(self.features)
+        self.tests_run = tuple(self.tests_run)
+
+    @property
+    def first_non_pass_task(self):
+        """TaskRecord of the first task which didn't pass and wasn't skipped,
+        or None."""
+        if self.first_non_pass is None:
+            return None
+
+        return self.record.tasks[self.first_non_pass]
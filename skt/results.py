@@ -0,0 +1,52 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Incremental parsing of Beaker results XML."""
+from defusedxml.ElementTree import iterparse
+
+# Result text the runner looks for, see BeakerRunner._not_booting()
+EWD_TEXT = 'External Watchdog Expired'
+
+
+def parse_results_file(fileobj):
+    """
+    Parse Beaker results XML incrementally, dropping the parts the runner
+    doesn't use as soon as they are read. Log listings are removed and the
+    text of task results is only kept if it reports an expired external
+    watchdog. Everything else, including the recipe definitions needed to
+    resubmit recipe sets, is kept.
+
+    Args:
+        fileobj: File object with the results XML, or its path.
+
+    Returns:
+        etree node representing the pruned results.
+    """
+    root = None
+    parents = []
+    for event, element in iterparse(fileobj, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = element
+            parents.append(element)
+            continue
+
+        parents.pop()
+        if element.tag == 'logs' and parents:
+            parents[-1].remove(element)
+        elif element.tag == 'result' and parents and \
+                parents[-1].tag == 'results':
+            if element.text and EWD_TEXT not in element.text:
+                element.text = None
+
+    return root
@@ -12,35 +12,45 @@
 # along with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
 """Class for managing Runner."""
+import collections
 import copy
+import functools
+import hashlib
+import itertools
 import logging
 import os
 import pathlib
 import platform
-import re
-import subprocess
+import queue
 import sys
+import threading
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 from defusedxml.ElementTree import fromstring
 from defusedxml.ElementTree import tostring
 from defusedxml.ElementTree import ParseError
 
-from skt.misc import SKT_SUCCESS, SKT_FAIL, SKT_ERROR, SKT_BOOT
-from skt.misc import is_task_waived
-from cki_lib.misc import safe_popen, retry_safe_popen
-
-
-class ConditionCheck:
-    def __init__(self, retval, **kwargs):
-        self.retval = retval
-        self.kwargs = kwargs
-
-    def __str__(self):
-        values = ' '.join([f'{arg}={self.kwargs[arg]}' for arg in self.kwargs])
-
-        return f'retval={self.retval} {values}'
+from skt import decision
+from skt import metrics
+from skt import tracing
+from skt.misc import SKT_SUCCESS, SKT_ERROR, SKT_BOOT, SEVERITY
+from skt.beaker import BkrTransport
+from skt.decision import DecisionTable
+from skt.decision import result_condition_checks
+from skt.model import RecipeAnalysis, RecipeRecord, summarize_recipe_set
+from skt.results import parse_results_file
+from skt.scheduler import FINAL_STATES, PollScheduler
+from skt.verdict import VerdictAggregator
+
+
+class ConditionCheck(decision.ConditionCheck):
+    """
+    Condition check called with task nodes, as it was before the checks moved
+    to skt.decision. Kept so existing users of skt.runner.ConditionCheck keep
+    working, skt itself uses skt.decision.ConditionCheck.
+    """
 
     def __call__(self, task, is_task_waived_func, prev_task):
         """ Evaluates the condition and return retval if matched, else None.
@@ -52,60 +62,25 @@ class ConditionCheck:
                 prev_task: task that was run before this one, or None if this
                            task is the first task in the recipe
         """
-        task_results = {
-            'result': task.attrib.get('result'),
-            'status': task.attrib.get('status'),
-            'waived': is_task_waived_func(task),
-            'prev_task_panicked_and_waived':
-                True if prev_task is not None and (
-                    is_task_waived_func(prev_task) and
-                    prev_task.attrib.get('result') == 'Panic'
-                ) else False
-        }
-
-        if not self.kwargs:
-            # don't match empty conditions as satisfied
-            return None
-
-        for arg in self.kwargs:
-            if task_results[arg] != self.kwargs[arg]:
-                # the status entry doesn't match all the conditions
-                return None
-
-        # the status entry matches all the conditions
-        return self.retval
+        # pylint: disable=arguments-differ
+        features = decision.TaskFeatures(
+            task.attrib.get('result'), task.attrib.get('status'),
+            is_task_waived_func(task),
+            prev_task is not None and bool(is_task_waived_func(prev_task)) and
+            prev_task.attrib.get('result') == 'Panic'
+        )
+        if self.matches(features):
+            return self.retval
 
-
-result_condition_checks = [
-    # This contains objects that will return <retval> (first parameter), when
-    # all the specified conditions are met. Empty conditions with no keywords
-    # are never met.
-
-    # Previous task was waived and panicked, which causes the next
-    # task to abort. The task is waived for a reason, return
-    # SKT_SUCCESS.
-    ConditionCheck(SKT_SUCCESS, result='Warn', waived=False, status='Aborted',
-                   prev_task_panicked_and_waived=True),
-
-    # A non-waived task panicked, return SKT_FAIL and don't confuse
-    # this with infra-errors.
-    ConditionCheck(SKT_FAIL, result='Panic', waived=False),
-
-    # A non-waived tasked aborted, return SKT_ERROR, possible
-    # infra issue.
-    ConditionCheck(SKT_ERROR, result='Warn',  waived=False, status='Aborted'),
-
-    # The rest of the fall-through conditions.
-    ConditionCheck(SKT_FAIL, result='Warn', waived=False),
-    ConditionCheck(SKT_FAIL, result='Fail', waived=False),
-]
+        return None
 
 
 class BeakerRunner:
     """Beaker test runner"""
     # pylint: disable=too-many-instance-attributes
 
-    def __init__(self, jobtemplate, jobowner=None, blacklist=None):
+    def __init__(self, jobtemplate, jobowner=None, blacklist=None,
+                 transport=None):
         """
         Initialize a runner executing tests on Beaker.
 
@@ -118,6 +93,9 @@ class BeakerRunner:
                             be the current user.
             blacklist:      Path to file containing hostnames to blacklist from
                             running on, one hostname per line.
+            transport:      Object used to talk to Beaker, like
+                            skt.beaker.HTTPTransport. Defaults to running the
+                            bkr command line client.
         """
         # Beaker job template file path
         # FIXME Move expansion up the call stack, as this limits the class
@@ -126,14 +104,55 @@ class BeakerRunner:
         # Name of a Beaker user on whose behalf the job should be submitted,
         # or None, if the owner should be the current user.
         self.jobowner = jobowner
+        self.transport = metrics.instrument(transport or BkrTransport())
+        # Path to the hostname blacklist and its modification time, the
+        # blacklist is reloaded when the file changes
+        self.blacklist_path = blacklist
+        self.blacklist_mtime = self.__get_mtime(blacklist)
+        self.__blacklisted = []
+        self.__blacklist_elements = []
         self.blacklisted = self.__load_blacklist(blacklist)
         # Delay between checks of Beaker job statuses, seconds
         self.watchdelay = 60
+        # Maximum number of recipe set results fetched in parallel, 1 means
+        # the recipe sets are polled one after another
+        self.poll_workers = 1
+        # Adapt the delay between polls of each recipe set to its state
+        # instead of polling everything every self.watchdelay seconds. The
+        # delay is kept between self.poll_floor and self.poll_ceiling seconds.
+        self.adaptive_polling = False
+        self.poll_floor = 15
+        self.poll_ceiling = 600
+        # Rules deciding results of recipes by their tasks
+        self.decision_table = DecisionTable(result_condition_checks)
+        # Spool results to a temporary file and parse them incrementally,
+        # dropping logs, instead of parsing them in memory. Only used with
+        # transports which can spool the results.
+        self.stream_results = False
         # Set of recipe sets that didn't complete yet
         self.watchlist = set()
         self.whiteboard = ''
         self.job_to_recipe_set_map = {}
+        # Beaker group of each job, so it doesn't have to be fetched again
+        self.job_groups = {}
         self.recipe_set_results = {}
+        # Compact records of the recipes of each finished recipe set, its
+        # results tree is released once it's summarized
+        self.recipe_set_summaries = {}
+        # Analyses of finished recipes by (recipe ID, status)
+        self.recipe_analyses = {}
+        # Verdicts of the recipes decided while watching, and the result of
+        # the run they add up to
+        self.verdicts = VerdictAggregator()
+        # Digest of the last results XML fetched for each taskspec and its
+        # parsed tree, so unchanged results aren't parsed again
+        self.result_digests = {}
+        # (status, result) of each recipe per recipe set at the last check,
+        # so only recipes which changed are checked again
+        self.recipe_fingerprints = {}
+        # Counts of unchanged and changed payloads and recipe sets
+        self.change_stats = collections.Counter()
+        self.change_stats_lock = threading.Lock()
         # Keep a set of completed recipes per set so we don't check them again
         self.completed_recipes = {}
         self.aborted_count = 0
@@ -141,6 +160,44 @@ class BeakerRunner:
         self.max_aborted = 3
         # Marks that we've had too many retries on infra-issues.
         self.has_aborted = False
+        # Value of time.monotonic() when the current run started
+        self.run_started = time.monotonic()
+        # Number of jobs to split the recipe sets of the job template into,
+        # and expected run times of tasks by their names used to balance them
+        self.split_jobs = 1
+        self.task_durations = None
+        # Recipe sets waiting to be resubmitted as (time queued, group,
+        # whiteboard, recipe set) tuples, and the number of seconds to wait
+        # for more of them, so they can be submitted together
+        self.resubmit_queue = []
+        self.resubmit_window = 0
+        # Maximum number of parallel calls and time in seconds to spend
+        # fetching results before cancelling the jobs
+        self.cancel_workers = 10
+        self.cancel_deadline = 60
+        # Called without arguments at most every self.checkpoint_interval
+        # seconds while watching, to save the watch state, or None
+        self.checkpoint = None
+        self.checkpoint_interval = 300
+        self.last_checkpoint = None
+        # NotificationSource waking the watch loop up when watched jobs
+        # change, see skt.notifications, or None. Everything is still polled
+        # every self.watchdelay seconds.
+        self.notifications = None
+        # Value of time.monotonic() when all watched recipe sets are polled
+        # next, or None if it isn't set yet. Notifications don't move it.
+        self.next_full_poll = None
+        # ResultExporter getting a record of every recipe reaching a final
+        # state while watching, see skt.export, or None
+        self.result_export = None
+        # Stop watching once a finished recipe set has a recipe with a result
+        # at least this severe, like SKT_BOOT, or None to wait for all recipe
+        # sets. The remaining jobs are cancelled if self.fail_fast_cancel is
+        # True, left running otherwise.
+        self.fail_fast = None
+        self.fail_fast_cancel = False
+        # Result of the run decided by self.fail_fast, or None
+        self.decided_retcode = None
 
         # the actual retcode to return is stored here
         self.retcode = SKT_ERROR
@@ -163,13 +220,66 @@ class BeakerRunner:
         except TypeError:
             logging.info('No hostname blacklist file passed')
 
-        logging.info('Blacklisted hostnames: %s', hostnames)
+        logging.info('Blacklisted hostnames: %d', len(hostnames))
         return hostnames
 
+    @classmethod
+    def __get_mtime(cls, filepath):
+        try:
+            return os.stat(filepath).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    @property
+    def blacklisted(self):
+        """List of blacklisted hostnames, normalized and deduplicated."""
+        return self.__blacklisted
+
+    @blacklisted.setter
+    def blacklisted(self, hostnames):
+        # normalize and deduplicate the hostnames, keeping their order
+        self.__blacklisted = list(dict.fromkeys(
+            hostname.strip().lower() for hostname in hostnames
+            if hostname.strip()
+        ))
+
+        # build the hostRequires entries once, they are added to all recipes
+        self.__blacklist_elements = []
+        invalid_entries_reported = False
+        for disabled in self.__blacklisted:
+            try:
+                self.__blacklist_elements.append(
+                    fromstring(f'<hostname op="!=" value="{disabled}" />')
+                )
+            except ParseError:
+                # do not accept or try to quote any html/xml values; only
+                # plaintext values like "host1" are accepted
+                if not invalid_entries_reported:
+                    logging.info('The blacklist or a part of it is invalid!')
+                    invalid_entries_reported = True
+
+    def __refresh_blacklist(self):
+        """Reload the hostname blacklist if its file changed."""
+        mtime = self.__get_mtime(self.blacklist_path)
+        if mtime is None or mtime == self.blacklist_mtime:
+            # keep using the loaded blacklist if the file disappeared
+            return
+
+        try:
+            self.blacklisted = self.__load_blacklist(self.blacklist_path)
+        except (IOError, OSError):
+            return
+
+        self.blacklist_mtime = mtime
+        logging.info('Reloaded hostname blacklist %s', self.blacklist_path)
+
     def get_recipset_group(self, taskspec):
         for (jid, rset) in self.job_to_recipe_set_map.items():
             if taskspec in rset:
-                return self.getresultstree(jid).attrib['group']
+                if jid not in self.job_groups:
+                    root = self.getresultstree(jid)
+                    self.job_groups[jid] = root.attrib.get('group')
+                return self.job_groups[jid]
 
         return None
 
@@ -183,23 +293,148 @@ class BeakerRunner:
         Returns:
             etree node representing the results.
         """
-        args = ["bkr", "job-results", "--prettyxml", taskspec]
+        spool_job_results = self._get_spooler()
+        with tracing.span('getresultstree', taskspec=taskspec):
+            if spool_job_results is not None:
+                with spool_job_results(taskspec) as fileobj:
+                    return self._parse_results_file(taskspec, fileobj)
+
+            return self._parse_results(taskspec,
+                                       self.transport.job_results(taskspec))
+
+    def _get_spooler(self):
+        """
+        Get the transport method spooling results to a file, if results are
+        streamed, see self.stream_results.
+
+        Returns:
+            spool_job_results() of the transport, or None if results are
+            fetched in memory.
+        """
+        if not self.stream_results:
+            return None
+
+        return getattr(self.transport, 'spool_job_results', None)
+
+    def _parse_results(self, taskspec, xml):
+        """
+        Parse Beaker results for taskspec and remember them.
+
+        Args:
+            taskspec:   ID of the job, recipe or recipe set.
+            xml:        Beaker results XML.
+
+        Returns:
+            etree node representing the results.
+        """
+        if isinstance(xml, str):
+            xml = xml.encode()
+        digest = hashlib.blake2b(xml, digest_size=16).digest()
+
+        return self.__parse_changed(taskspec, digest,
+                                    functools.partial(fromstring, xml))
+
+    def _parse_results_file(self, taskspec, fileobj):
+        """
+        Parse Beaker results for taskspec incrementally from a file and
+        remember them. Parts of the results the runner doesn't use are
+        dropped while parsing, see skt.results.parse_results_file().
+
+        Args:
+            taskspec:   ID of the job, recipe or recipe set.
+            fileobj:    Binary file object with the results XML.
+
+        Returns:
+            etree node representing the results.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for chunk in iter(functools.partial(fileobj.read, 65536), b''):
+            digest.update(chunk)
+        fileobj.seek(0)
+
+        return self.__parse_changed(
+            taskspec, digest.digest(),
+            functools.partial(parse_results_file, fileobj)
+        )
+
+    def __parse_changed(self, taskspec, digest, parse):
+        """
+        Parse results unless they are the same as the last ones fetched for
+        taskspec, and remember them.
 
-        err_strings = ["ProtocolError", "503 Service Unavailable"]
-        stdout, stderr, returncode = retry_safe_popen(err_strings, args,
-                                                      stderr=subprocess.PIPE,
-                                                      stdout=subprocess.PIPE)
+        Args:
+            taskspec:   ID of the job, recipe or recipe set.
+            digest:     Digest of the results XML.
+            parse:      Function without arguments, returning the parsed
+                        results.
 
-        if returncode:
-            logging.warning(stdout)
-            logging.warning(stderr)
-            raise RuntimeError('failed getting Beaker job-results')
+        Returns:
+            etree node representing the results.
+        """
+        last_digest, results = self.result_digests.get(taskspec,
+                                                       (None, None))
+        if digest == last_digest:
+            self.__count_change('payload_unchanged')
+        else:
+            self.__count_change('payload_changed')
+            # return Beaker results parsed xml
+            with tracing.span('parse', taskspec=taskspec):
+                results = parse()
+            self.result_digests[taskspec] = (digest, results)
 
-        # return Beaker results parsed xml
-        results = fromstring(stdout)
         self.recipe_set_results[taskspec] = results
         return results
 
+    def __count_change(self, key):
+        # results are parsed in worker threads when polling in parallel
+        with self.change_stats_lock:
+            self.change_stats[key] += 1
+
+    def get_change_hit_rates(self):
+        """
+        Get the share of fetched results which didn't need to be parsed, and
+        of checked recipe sets which didn't need to be processed, because
+        nothing changed since the last poll.
+
+        Returns:
+            Tuple (payload hit rate, recipe set hit rate), each between 0 and
+            1, or None if nothing was counted yet.
+        """
+        rates = []
+        for kind in ['payload', 'recipe_set']:
+            unchanged = self.change_stats[kind + '_unchanged']
+            total = unchanged + self.change_stats[kind + '_changed']
+            rates.append(unchanged / total if total else None)
+
+        return tuple(rates)
+
+    def __get_changed_recipes(self, recipe_set_id, recipes):
+        """
+        Compare the (status, result) fingerprint of recipes with the one from
+        the last check of the recipe set and remember the new one.
+
+        Args:
+            recipe_set_id: recipe set (RS:xxxxx) ID.
+            recipes:       List of etree nodes of the recipe set's recipes.
+
+        Returns:
+            List of recipes whose fingerprint changed.
+        """
+        fingerprints = {recipe.attrib.get('id'): (recipe.attrib.get('status'),
+                                                  recipe.attrib.get('result'))
+                        for recipe in recipes}
+        last_fingerprints = self.recipe_fingerprints.get(recipe_set_id, {})
+        self.recipe_fingerprints[recipe_set_id] = fingerprints
+
+        changed = [recipe for recipe in recipes
+                   if last_fingerprints.get(recipe.attrib.get('id')) !=
+                   fingerprints[recipe.attrib.get('id')]]
+        for recipe in changed:
+            tracing.recipe_status('R:' + recipe.attrib.get('id'),
+                                  recipe.attrib.get('status'), recipe_set_id)
+
+        return changed
+
     def __forget_taskspec(self, recipe_set_id):
         """
         Remove recipe set from self.job_to_recipe_set_map and self.watchlist
@@ -209,6 +444,7 @@ class BeakerRunner:
             recipe_set_id: recipe set (RS:xxxxx) ID.
         """
         self.watchlist.discard(recipe_set_id)
+        self.verdicts.forget(recipe_set_id)
         deljids = set()
         for (jid, rset) in self.job_to_recipe_set_map.items():
             if recipe_set_id in rset:
@@ -218,70 +454,89 @@ class BeakerRunner:
         for jid in deljids:
             del self.job_to_recipe_set_map[jid]
 
+    def _analyze(self, recipe):
+        """
+        Get the analysis of a recipe, shared by all verdict helpers. Analyses
+        of finished recipes are memoized on the recipe ID and status, as
+        their results don't change anymore.
+
+        Args:
+            recipe: etree node of the recipe, its RecipeRecord or
+                    RecipeAnalysis.
+
+        Returns:
+            RecipeAnalysis.
+        """
+        if isinstance(recipe, RecipeAnalysis):
+            return recipe
+
+        if isinstance(recipe, RecipeRecord):
+            key = (recipe.id, recipe.status)
+        else:
+            key = (recipe.attrib.get('id'), recipe.attrib.get('status'))
+
+        analysis = self.recipe_analyses.get(key)
+        if analysis is None:
+            if not isinstance(recipe, RecipeRecord):
+                recipe = RecipeRecord.from_element(recipe)
+            analysis = RecipeAnalysis(recipe)
+            if key[0] is not None and key[1] in FINAL_STATES:
+                self.recipe_analyses[key] = analysis
+
+        return analysis
+
     def _not_booting(self, recipe):
         """
         Check if the kernel we should test failed to boot. In these cases, the
         Boot test throws EWD. We need to check that EWD wasn't hit sooner (e.g.
         the distro failed to install).
 
+        Args:
+            recipe: etree node of the recipe, its RecipeRecord or
+                    RecipeAnalysis.
+
         Returns:
             True if the issue is caused by a kernel not booting,
             False otherwise.
         """
-        is_boot_test = False
-
-        for task in recipe.findall('task'):
-            if task.attrib['name'] == "Boot test":
-                is_boot_test = True
-
-            for res in task.findall('.//results/'):
-                if res.text and 'External Watchdog Expired' in res.text:
-                    if is_boot_test:
-                        return True
-                    else:
-                        return False
-
-            if is_boot_test:
-                # If we got here it means that we got past the boot without
-                # hitting EWD. Since we want to only check the boot failure and
-                # not test troubles, return here.
-                return False
+        return self._analyze(recipe).not_booting
 
     def decide_run_result_by_task(self, recipe_result, recipe_id):
         """ Return result of a single recipe decided by tasks. The conditions
-            to test are read from result_condition_checks in their natural
-            specified order.
+            to test are read from self.decision_table, compiled from
+            result_condition_checks in their natural specified order.
 
             Args:
-                recipe_result: a defused xml
+                recipe_result: a defused xml, RecipeRecord or RecipeAnalysis
+                               of the recipe
                 recipe_id: id of the recipe from the XML, prefixed with R:
             Returns:
                 retval, msg where retval is a return code like SKT_SUCCESS,
                             SKT_BOOT, ... and msg is an explanation of why
 
         """
-        # If the recipe passed, then there's little to do.
-        if recipe_result.attrib.get('result') == 'Pass':
-            return SKT_SUCCESS, f'recipeid {recipe_id} passed all tests'
+        with tracing.span('decide_run_result_by_task', recipe=recipe_id):
+            analysis = self._analyze(recipe_result)
 
-        if self._not_booting(recipe_result):
-            return SKT_BOOT, f'recipeid {recipe_id} hit EWD in boottest!'
+            # If the recipe passed, then there's little to do.
+            if analysis.record.result == 'Pass':
+                return SKT_SUCCESS, f'recipeid {recipe_id} passed all tests'
 
-        if self.has_aborted:
-            return SKT_ERROR, 'too many aborted recipes!'
+            if analysis.not_booting:
+                return SKT_BOOT, f'recipeid {recipe_id} hit EWD in boottest!'
 
-        prev_task = None
-        for task in recipe_result.findall('task'):
-            for cond_check in result_condition_checks:
-                retval = cond_check(task, is_task_waived, prev_task)
-                if retval is not None:
-                    return retval, f'recipeid {recipe_id} -> {str(cond_check)}'
+            if self.has_aborted:
+                return SKT_ERROR, 'too many aborted recipes!'
 
-            # remember the previous task
-            prev_task = task
+            for features in analysis.features:
+                cond_check = self.decision_table.lookup(features)
+                if cond_check is not None:
+                    return cond_check.retval, \
+                        f'recipeid {recipe_id} -> {str(cond_check)}'
 
-        # It's possible that failing tests were just waived...
-        return SKT_SUCCESS, f'recipeid {recipe_id} passed with waived tests'
+            # It's possible that failing tests were just waived...
+            return SKT_SUCCESS, \
+                f'recipeid {recipe_id} passed with waived tests'
 
     def __getresults(self):
         """
@@ -304,30 +559,55 @@ class BeakerRunner:
             logging.error('All test sets aborted or were cancelled!')
             return SKT_ERROR
 
-        rcpid_and_results = []
-        for _, recipe_sets in self.job_to_recipe_set_map.items():
-            for recipe_set_id in recipe_sets:
-                results = self.recipe_set_results[recipe_set_id]
-                for recipe_result in results.findall('.//recipe'):
-                    rcpid = 'R:' + recipe_result.attrib.get('id')
-                    ret, msg = self.decide_run_result_by_task(recipe_result,
-                                                              rcpid)
-
-                    # log output of decide_run_result_by_task for final rc only
-                    logging.info(msg)
+        # recipe sets still watched when the watch stopped, like when the
+        # jobs were cancelled, are decided by their last results
+        for recipe_set_id in itertools.chain.from_iterable(
+                self.job_to_recipe_set_map.values()
+        ):
+            if recipe_set_id in self.verdicts.finished:
+                continue
+            records = self.recipe_set_summaries.get(recipe_set_id)
+            if records is None:
+                records = summarize_recipe_set(
+                    self.recipe_set_results[recipe_set_id]
+                )
+            self.__record_verdicts(recipe_set_id, records)
 
-                    rcpid_and_results.append((rcpid, ret))
+        if self.has_aborted:
+            # recipes which didn't pass fail with too many aborted recipes
+            self.verdicts.redecide(self.decide_run_result_by_task)
 
-        for ret in [SKT_ERROR, SKT_BOOT, SKT_FAIL]:
-            for rcpid, result in rcpid_and_results:
-                if ret == result:
-                    logging.info(f'Failure ({ret}) in recipeid {rcpid}'
-                                 f' detected!')
-                    return ret
+        retcode = self.verdicts.retcode
+        if retcode != SKT_SUCCESS:
+            logging.info(f'Failure ({retcode}) in recipeid '
+                         f'{self.verdicts.first(retcode)} detected!')
+            return retcode
 
         logging.info('Testing passed!')
         return SKT_SUCCESS
 
+    def __record_verdicts(self, recipe_set_id, recipes):
+        """
+        Decide the verdicts of recipes which weren't recorded yet and add
+        them to self.verdicts.
+
+        Args:
+            recipe_set_id: recipe set (RS:xxxxx) ID.
+            recipes:       Iterable of etree nodes or RecipeRecords of the
+                           recipes.
+        """
+        for recipe in recipes:
+            analysis = self._analyze(recipe)
+            recipe_id = 'R:' + analysis.record.id
+            if self.verdicts.recorded(recipe_set_id, recipe_id):
+                continue
+
+            retcode, msg = self.decide_run_result_by_task(analysis,
+                                                          recipe_id)
+            logging.info(msg)
+            self.verdicts.add(recipe_set_id, recipe_id, analysis, retcode,
+                              msg)
+
     def __blacklist_hreq(self, host_requires):
         """
         Make sure recipe excludes blacklisted hosts.
@@ -349,23 +629,32 @@ class BeakerRunner:
             and_node = fromstring('<and />')
             host_requires.append(and_node)
 
-        invalid_entries_reported = False
-        for disabled in self.blacklisted:
-            try:
-                hostname = fromstring(f'<hostname op="!=" value="{disabled}" '
-                                      f'/>')
-                and_node.append(hostname)
-            except ParseError:
-                # do not accept or try to quote any html/xml values; only
-                # plaintext values like "host1" are accepted
-                if not invalid_entries_reported:
-                    logging.info('The blacklist or a part of it is invalid!')
-                    invalid_entries_reported = True
+        # don't add entries the recipe already has, e.g. when resubmitting
+        present = {hostname.get('value', '').lower()
+                   for hostname in and_node.findall('hostname')
+                   if hostname.get('op') == '!='}
+        # the prebuilt entries are shared by all recipes, they're only
+        # serialized and never modified
+        and_node.extend(element for element in self.__blacklist_elements
+                        if element.get('value') not in present)
 
         return host_requires
 
-    def __recipe_set_to_job(self, recipe_set, samehost=False):
+    def __prepare_recipe_set(self, recipe_set, samehost=False):
+        """
+        Copy a recipe set to submit it again, excluding the blacklisted hosts
+        or requiring the same hosts it ran on.
+
+        Args:
+            recipe_set: etree node with the recipe set results.
+            samehost:   True to run the recipes on the same hosts again.
+
+        Returns:
+            (Beaker group of the recipe set or None, copied recipe set)
+            tuple.
+        """
         tmp = copy.deepcopy(recipe_set)
+        self.__refresh_blacklist()
 
         try:
             group = self.get_recipset_group('RS:{}'.format(recipe_set.
@@ -389,15 +678,34 @@ class BeakerRunner:
                 recipe.remove(hreq)
                 recipe.append(new_hreq)
 
+        return group, tmp
+
+    @classmethod
+    def __build_job(cls, group, whiteboard, recipe_sets):
+        """
+        Build a job out of recipe sets to submit again.
+
+        Args:
+            group:       Beaker group of the job, or None.
+            whiteboard:  Whiteboard of the original job.
+            recipe_sets: List of recipe sets prepared by
+                         __prepare_recipe_set().
+
+        Returns:
+            etree node of the job.
+        """
         newwb = fromstring("<whiteboard/>")
-        newwb.text = "%s [RS:%s]" % (self.whiteboard, tmp.attrib.get("id"))
+        newwb.text = "%s [%s]" % (whiteboard, ' '.join(
+            'RS:%s' % recipe_set.attrib.get("id")
+            for recipe_set in recipe_sets
+        ))
 
         newroot = fromstring("<job/>")
         if group:
             newroot.attrib['group'] = group
 
         newroot.append(newwb)
-        newroot.append(tmp)
+        newroot.extend(recipe_sets)
 
         return newroot
 
@@ -408,22 +716,126 @@ class BeakerRunner:
         So we cancel a job if any of its recipesets is in the watchlist.
         """
         logging.info('Cancelling pending jobs!')
+        self._drop_resubmissions('cancelling the jobs')
+        job_ids = sorted(self.job_to_recipe_set_map)
+        with tracing.span('cancel_pending_jobs', jobs=job_ids):
+            self.__cancel_pending_jobs(job_ids)
+
+    def __cancel_pending_jobs(self, job_ids):
 
-        # Update all recipe_set_ids before canceling, so we don't gey KeyError
-        # later on (nitpick).
-        for recipe_set_id in self.watchlist.copy():
-            self.getresultstree(recipe_set_id)
+        # Fetch the watched recipe sets the verdict has no results of yet, so
+        # we don't get KeyError later on (nitpick).
+        self._refresh_unfetched()
+        self._forget_unfetched()
 
-        for job_id in set(self.job_to_recipe_set_map):
-            _, _, ret = safe_popen(['bkr', 'job-cancel', job_id])
-            if ret:
-                logging.info('Failed to cancel the remaining recipe sets!')
+        if not self._cancel_jobs(job_ids):
+            logging.info('Failed to cancel the remaining recipe sets!')
+
+    def _refresh_unfetched(self):
+        """
+        Fetch the results of the watched recipe sets the verdict has no
+        results of yet, with up to self.cancel_workers calls in parallel,
+        for at most self.cancel_deadline seconds. The calls run in daemon
+        threads, so the ones missing the deadline don't keep the process
+        alive, and their results are thrown away.
+        """
+        batches = self._group_watchlist(self._get_unfetched())
+        if not batches:
+            return
+
+        spool_job_results = self._get_spooler()
+        pending = queue.Queue()
+        for batch in batches:
+            pending.put(batch)
+        payloads = {}
+        lock = threading.Lock()
+
+        def fetch():
+            while True:
+                try:
+                    batch = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    if spool_job_results is not None:
+                        payload = spool_job_results(batch[0])
+                    else:
+                        payload = self.transport.job_results(batch[0])
+                except Exception:  # pylint: disable=broad-except
+                    logging.exception('Unable to fetch %s', batch[0])
+                    continue
+                with lock:
+                    if payloads is not None:
+                        payloads[batch[0]] = (batch, payload)
+                        continue
+                if spool_job_results is not None:
+                    payload.close()
+
+        deadline = time.monotonic() + self.cancel_deadline
+        threads = [threading.Thread(target=fetch, daemon=True)
+                   for _ in range(min(self.cancel_workers, len(batches)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+
+        # don't wait for fetches which missed the deadline
+        with lock:
+            fetched, payloads = payloads, None
+        for taskspec, (batch, payload) in fetched.items():
+            if spool_job_results is None:
+                root = self._parse_results(taskspec, payload)
+            else:
+                with payload:
+                    root = self._parse_results_file(taskspec, payload)
+            self._split_results(batch, root)
+
+    def _get_unfetched(self):
+        """
+        Get the watched recipe sets without any results to decide the verdict
+        by.
+
+        Returns:
+            List of recipe set IDs.
+        """
+        return [recipe_set_id for recipe_set_id in self.watchlist
+                if recipe_set_id not in self.recipe_set_results and
+                recipe_set_id not in self.recipe_set_summaries]
+
+    def _forget_unfetched(self):
+        """Leave recipe sets without any results out of the verdict."""
+        for recipe_set_id in self._get_unfetched():
+            logging.warning('No results of %s before the cancel deadline, '
+                            'leaving it out', recipe_set_id)
+            self.__forget_taskspec(recipe_set_id)
+
+    def _cancel_jobs(self, job_ids):
+        """
+        Cancel jobs with a single call if the transport can do that, or with
+        up to self.cancel_workers calls in parallel otherwise.
+
+        Args:
+            job_ids: List of IDs of the jobs to cancel.
+
+        Returns:
+            True if all jobs were cancelled, False otherwise.
+        """
+        job_cancel_many = getattr(self.transport, 'job_cancel_many', None)
+        if job_cancel_many is not None:
+            return job_cancel_many(job_ids)
+        if not job_ids:
+            return True
+
+        workers = min(self.cancel_workers, len(job_ids))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return all(executor.map(self.transport.job_cancel, job_ids))
 
     def __handle_test_abort(self, recipe, recipe_id, recipe_set_id, root):
-        if self._not_booting(recipe):
+        analysis = self._analyze(recipe)
+        if analysis.not_booting:
             return
 
-        retval, _ = self.decide_run_result_by_task(recipe, recipe_id)
+        retval, _ = self.decide_run_result_by_task(analysis, recipe_id)
         if retval == SKT_SUCCESS:
             # A task that is waived aborted or panicked. Waived tasks are
             # appended to the end of the recipe, so we should be able to
@@ -434,29 +846,139 @@ class BeakerRunner:
                         recipe_id,
                         recipe_set_id)
         self.aborted_count += 1
+        metrics.inc('skt_aborts_total', reason='aborted')
 
         if self.aborted_count < self.max_aborted:
             logging.warning('Resubmitting aborted %s',
                             recipe_set_id)
-            newjob = self.__recipe_set_to_job(root)
-            newjobid = self.__jobsubmit(tostring(newjob))
-            self.__add_to_watchlist(newjobid)
+            self._resubmit(root)
 
         self.watchlist.discard(recipe_set_id)
 
+    def _resubmit(self, recipe_set):
+        """
+        Queue a recipe set to be resubmitted as a new job and watched, see
+        _flush_resubmissions().
+
+        Args:
+            recipe_set: etree node with the recipe set results.
+        """
+        group, tmp = self.__prepare_recipe_set(recipe_set)
+        self.resubmit_queue.append((time.monotonic(), group, self.whiteboard,
+                                    tmp))
+
+    def _flush_resubmissions(self, force=False):
+        """
+        Submit the queued recipe sets once the oldest of them waited for
+        self.resubmit_window seconds. Recipe sets with the same group and
+        whiteboard are merged into a single job.
+
+        Args:
+            force: True to submit the queued recipe sets right away.
+        """
+        if not self.resubmit_queue:
+            return
+        if not force and time.monotonic() - self.resubmit_queue[0][0] < \
+                self.resubmit_window:
+            return
+
+        merged = collections.defaultdict(list)
+        for _, group, whiteboard, recipe_set in self.resubmit_queue:
+            merged[(group, whiteboard)].append(recipe_set)
+        metrics.inc('skt_resubmissions_total', len(self.resubmit_queue))
+        self.resubmit_queue = []
+
+        for (group, whiteboard), recipe_sets in merged.items():
+            # keep the original order of the recipe sets
+            recipe_sets.sort(key=lambda recipe_set: int(
+                recipe_set.attrib.get('id') or 0
+            ))
+            logging.info('Resubmitting %d recipe set(s) as one job',
+                         len(recipe_sets))
+            with tracing.span('resubmit', recipe_sets=[
+                    'RS:' + str(recipe_set.attrib.get('id'))
+                    for recipe_set in recipe_sets
+            ]):
+                self._submit_and_watch(
+                    tostring(self.__build_job(group, whiteboard, recipe_sets))
+                )
+
+    def queued_resubmissions(self):
+        """
+        Get the recipe sets waiting to be resubmitted, see _resubmit().
+
+        Returns:
+            List of recipe set IDs, in the order they were queued.
+        """
+        return ['RS:' + str(recipe_set.attrib.get('id'))
+                for _, _, _, recipe_set in self.resubmit_queue]
+
+    def _drop_resubmissions(self, reason):
+        """
+        Throw the queued resubmissions away, logging and counting the recipe
+        sets which won't be resubmitted.
+
+        Args:
+            reason: Why they won't be resubmitted, for the log.
+        """
+        dropped = self.queued_resubmissions()
+        if dropped:
+            logging.warning('Not resubmitting %s, %s', ' '.join(dropped),
+                            reason)
+            metrics.inc('skt_resubmissions_dropped_total', len(dropped))
+        self.resubmit_queue = []
+
+    def _submit_and_watch(self, xml):
+        """
+        Submit a job and add its recipe sets to the watchlist.
+
+        Args:
+            xml: Job XML to submit.
+        """
+        newjobid = self.__jobsubmit(xml)
+        self.__add_to_watchlist(newjobid)
+
+    def _export_recipe(self, recipe_id, recipe_set_id):
+        """
+        Export the record of a finished recipe with its recorded verdict,
+        see skt.export.
+
+        Args:
+            recipe_id:     recipe (R:xxxxx) ID.
+            recipe_set_id: recipe set (RS:xxxxx) ID.
+        """
+        verdict = self.verdicts.lookup(recipe_set_id, recipe_id)
+        if verdict is None:
+            # the recipe set doesn't count for the result anymore
+            return
+
+        analysis, retcode, message = verdict
+        job_id = next((jid for jid, recipe_sets
+                       in self.job_to_recipe_set_map.items()
+                       if recipe_set_id in recipe_sets), None)
+        # pylint: disable=import-outside-toplevel
+        from skt.export import recipe_record
+        try:
+            self.result_export.write(recipe_record(
+                analysis, recipe_set_id, job_id, retcode, message
+            ))
+        except OSError as exc:
+            logging.warning('Exporting %s failed: %s', recipe_id, exc)
+
     def __handle_test_fail(self, recipe, recipe_id):
         # Something in the recipe set really reported failure
         test_failure = False
         # set to True when test failed, but is waived
         waiving_skip = False
+        analysis = self._analyze(recipe)
 
-        if self.get_kpkginstall_task(recipe) is None:
+        if analysis.kpkginstall_index is None:
             # we don't waive the kernel-install task :-)
             # Assume the kernel was installed by default and
             # everything is a test
             test_failure = True
 
-        elif self.decide_run_result_by_task(recipe, recipe_id)[0]\
+        elif self.decide_run_result_by_task(analysis, recipe_id)[0]\
                 == SKT_SUCCESS:
             # A task that is waived failed. Waived tasks are
             # appended to the end of the recipe, so we should be able to
@@ -465,95 +987,551 @@ class BeakerRunner:
             # set this just fyi - we will continue anyway
             test_failure = True
         else:
-            test_list = self.get_recipe_test_list(recipe)
+            task = analysis.first_non_pass_task
+            if task is not None and task.name in analysis.tests_run:
+                test_failure = True
 
-            for task in recipe.findall('task'):
-                result = task.attrib.get('result')
+        return test_failure, waiving_skip
 
-                if result != 'Pass' and result != 'Skip':
-                    if task.attrib.get('name') in test_list:
-                        test_failure = True
+    def pending_batches(self, recipe_set_ids=None):
+        """
+        Get the result fetches needed to poll watched recipe sets, see
+        fetch_batch().
 
-                    break
+        Args:
+            recipe_set_ids: IDs of the recipe sets to poll, or None to poll
+                            all of self.watchlist.
 
-        return test_failure, waiving_skip
+        Returns:
+            List of (taskspec, list of recipe set IDs) tuples.
+        """
+        if recipe_set_ids is None:
+            recipe_set_ids = list(self.watchlist)
 
-    def __watchloop(self):
-        while self.watchlist:
-            time.sleep(self.watchdelay)
-            if self.max_aborted <= self.aborted_count:
-                self.has_aborted = True
-                # Remove / cancel all the remaining recipe set IDs and abort
+        return self._group_watchlist(recipe_set_ids)
+
+    def _group_watchlist(self, recipe_set_ids):
+        """
+        Group recipe sets into as few result fetches as possible. Recipe sets
+        of the same job are fetched together with the whole job.
+
+        Args:
+            recipe_set_ids: IDs of the recipe sets to fetch.
+
+        Returns:
+            List of (taskspec, list of recipe set IDs) tuples, where taskspec
+            is the job or recipe set to fetch the recipe sets' results with.
+        """
+        batches = []
+        remaining = set(recipe_set_ids)
+        for jid, recipe_sets in self.job_to_recipe_set_map.items():
+            watched = [rsid for rsid in recipe_sets if rsid in remaining]
+            if len(watched) > 1:
+                batches.append((jid, watched))
+                remaining.difference_update(watched)
+
+        batches.extend((rsid, [rsid]) for rsid in remaining)
+
+        return batches
+
+    def fetch_batch(self, batch):
+        """
+        Fetch results of recipe sets with a single call and split them into
+        per-recipe set trees, which are stored in self.recipe_set_results.
+
+        Args:
+            batch: (taskspec, list of recipe set IDs) tuple, see
+                   pending_batches().
+
+        Returns:
+            List of (recipe set ID, etree node) tuples, see apply().
+        """
+        results = self._split_results(batch, self.getresultstree(batch[0]))
+
+        # ask directly for recipe sets missing in the job results
+        return [(recipe_set_id, recipe_set if recipe_set is not None
+                 else self.getresultstree(recipe_set_id))
+                for recipe_set_id, recipe_set in results]
+
+    def _split_results(self, batch, root):
+        """
+        Split results fetched for a batch into per-recipe set trees, which
+        are stored in self.recipe_set_results.
+
+        Args:
+            batch: (taskspec, list of recipe set IDs) tuple, see
+                   _group_watchlist().
+            root:  etree node with the results of the batch taskspec.
+
+        Returns:
+            List of (recipe set ID, etree node) tuples. The node is None if
+            the recipe set is missing in the results.
+        """
+        taskspec, recipe_set_ids = batch
+        if taskspec in recipe_set_ids:
+            return [(taskspec, root)]
+
+        self.job_groups[taskspec] = root.attrib.get('group')
+        recipe_sets = {'RS:' + recipe_set.attrib.get('id'): recipe_set
+                       for recipe_set in root.findall('recipeSet')}
+
+        results = []
+        for recipe_set_id in recipe_set_ids:
+            recipe_set = recipe_sets.get(recipe_set_id)
+            if recipe_set is not None:
+                self.recipe_set_results[recipe_set_id] = recipe_set
+            results.append((recipe_set_id, recipe_set))
+
+        return results
+
+    def __fetch_watchlist(self, recipe_set_ids):
+        """
+        Retrieve results of watched recipe sets, using one call per job. Up
+        to self.poll_workers calls run in parallel. Only the fetching runs in
+        the worker threads, so the caller can process the results and update
+        the runner state serially.
+
+        Args:
+            recipe_set_ids: IDs of the recipe sets to fetch.
+
+        Returns:
+            Iterable of (recipe set ID, etree node) tuples. In serial mode the
+            results are fetched lazily, one call at a time.
+        """
+        batches = self.pending_batches(recipe_set_ids)
+        if self.poll_workers <= 1 or len(batches) <= 1:
+            return itertools.chain.from_iterable(
+                self.fetch_batch(batch) for batch in batches
+            )
+
+        workers = min(self.poll_workers, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(self.fetch_batch, batches))
+
+        return itertools.chain.from_iterable(results)
+
+    def _process_recipe_set(self, recipe_set_id, root):
+        """
+        Check the results of a watched recipe set, handle its finished
+        recipes and resubmit it if needed.
+
+        Args:
+            recipe_set_id: recipe set (RS:xxxxx) ID.
+            root:          etree node with the recipe set results.
+
+        Returns:
+            False if watching should stop (the jobs were cancelled),
+            True otherwise.
+        """
+        recipes = root.findall('.//recipe')
+        changed_recipes = self.__get_changed_recipes(recipe_set_id, recipes)
+        if not changed_recipes:
+            # nothing happened since the last check
+            self.__count_change('recipe_set_unchanged')
+            return True
+
+        self.__count_change('recipe_set_changed')
+        for recipe in changed_recipes:
+            result = recipe.attrib.get('result')
+            status = recipe.attrib.get('status')
+            recipe_id = 'R:' + recipe.attrib.get('id')
+            if status not in ['Completed', 'Aborted', 'Cancelled'] or \
+                    recipe_id in self.completed_recipes[recipe_set_id]:
+                # continue watching unfinished recipes
+                continue
+
+            logging.info("%s status changed to %s", recipe_id, status)
+            self.completed_recipes[recipe_set_id].add(recipe_id)
+            self.__record_verdicts(recipe_set_id, [recipe])
+            if self.result_export is not None:
+                self._export_recipe(recipe_id, recipe_set_id)
+            if len(self.completed_recipes[recipe_set_id]) == len(recipes):
+                try:
+                    self.watchlist.remove(recipe_set_id)
+                except KeyError:
+                    pass
+                self.recipe_set_results[recipe_set_id] = root
+
+            if result == 'Pass':
+                # some recipe passed, nothing to do here
+                continue
+
+            if status == 'Cancelled':
+                # job got cancelled for some reason, there's probably
+                # an external reason
+                logging.error('Cancelled run detected! Cancelling the '
+                              'rest of runs and aborting!')
                 self.cancel_pending_jobs()
+                return False
+
+            if result == 'Warn' and status == 'Aborted':
+                self.__handle_test_abort(recipe, recipe_id,
+                                         recipe_set_id, root)
+                continue
+
+            # check for test failure
+            test_failure, waive_skip = \
+                self.__handle_test_fail(recipe, recipe_id)
+            if waive_skip:
+                logging.info("recipe %s waived task(s) failed",
+                             recipe_id)
+                continue
+
+            if not test_failure:
+                # Recipe failed before the tested kernel was installed
+                self.__forget_taskspec(recipe_set_id)
+                self.aborted_count += 1
+                metrics.inc('skt_aborts_total', reason='infrastructure')
+
+                if self.aborted_count < self.max_aborted:
+                    logging.warning('Infrastructure-related problem '
+                                    'found, resubmitting %s',
+                                    recipe_set_id)
+                    self._resubmit(root)
+
+        if recipe_set_id not in self.watchlist:
+            self.__release_results(recipe_set_id, root)
+
+        return True
+
+    def __release_results(self, recipe_set_id, root):
+        """
+        Summarize the results of a recipe set which isn't watched anymore and
+        release its results tree, and the trees of jobs without watched
+        recipe sets.
+
+        Args:
+            recipe_set_id: recipe set (RS:xxxxx) ID.
+            root:          etree node with the recipe set results.
+        """
+        if any(recipe_set_id in recipe_sets
+               for recipe_sets in self.job_to_recipe_set_map.values()):
+            # forgotten recipe sets don't count for the results
+            records = summarize_recipe_set(root)
+            self.recipe_set_summaries[recipe_set_id] = records
+            self.__record_verdicts(recipe_set_id, records)
+            self.verdicts.finish(recipe_set_id)
+            if self.fail_fast is not None:
+                self.__check_fail_fast(recipe_set_id)
+
+        self.recipe_set_results.pop(recipe_set_id, None)
+        self.result_digests.pop(recipe_set_id, None)
+
+        for taskspec in set(self.recipe_set_results) | \
+                set(self.result_digests):
+            if taskspec.startswith('J:') and not \
+                    self.job_to_recipe_set_map.get(taskspec, set()) & \
+                    self.watchlist:
+                self.recipe_set_results.pop(taskspec, None)
+                self.result_digests.pop(taskspec, None)
+
+    def __check_fail_fast(self, recipe_set_id):
+        """
+        Decide the result of the run early if a recipe of a finished recipe
+        set got a result at least as severe as self.fail_fast. Results of
+        finished recipe sets don't change anymore.
+
+        Args:
+            recipe_set_id: recipe set (RS:xxxxx) ID of the finished recipe
+                           set.
+        """
+        for retcode, msg in self.verdicts.get(recipe_set_id).values():
+            if SEVERITY.index(retcode) < SEVERITY.index(self.fail_fast):
+                continue
+            if self.decided_retcode is None or \
+                    SEVERITY.index(retcode) > \
+                    SEVERITY.index(self.decided_retcode):
+                logging.warning('%s, failing fast', msg)
+                self.decided_retcode = retcode
+
+    def _verdict_decided(self):
+        """
+        Check if the result of the run was decided before all recipe sets
+        finished, see self.fail_fast. Queued resubmissions are dropped then,
+        the caller stops watching and cancels the jobs if
+        self.fail_fast_cancel is True.
+
+        Returns:
+            True if watching should stop, False otherwise.
+        """
+        if self.decided_retcode is None:
+            return False
+
+        logging.warning('Result decided with %d recipe set(s) left, %s them',
+                        len(self.watchlist),
+                        'cancelling' if self.fail_fast_cancel else
+                        'not waiting for')
+        self._drop_resubmissions('the result is decided')
+        return True
+
+    def _get_notified(self, taskspecs):
+        """
+        Get the watched recipe sets notifications are about.
+
+        Args:
+            taskspecs: Iterable of IDs of jobs, recipe sets or recipes.
+
+        Returns:
+            Set of recipe set IDs.
+        """
+        recipe_sets = set()
+        for taskspec in taskspecs:
+            if taskspec.startswith('RS:'):
+                recipe_sets.add(taskspec)
+            elif taskspec.startswith('J:'):
+                recipe_sets.update(self.job_to_recipe_set_map.get(taskspec,
+                                                                  ()))
+            elif taskspec.startswith('R:'):
+                found = {recipe_set_id for recipe_set_id, fingerprints
+                         in self.recipe_fingerprints.items()
+                         if taskspec[2:] in fingerprints}
+                # recipes of recipe sets not checked yet aren't known
+                recipe_sets.update(found or (self.watchlist -
+                                             set(self.recipe_fingerprints)))
+
+        return recipe_sets & self.watchlist
+
+    def _sleep_until_notified(self, delay):
+        """
+        Sleep for delay seconds, or until a notification about the watched
+        recipe sets arrives.
+
+        Args:
+            delay: Maximum time to sleep, seconds.
+
+        Returns:
+            Set of IDs of the notified recipe sets, empty if none were.
+        """
+        if self.notifications is None:
+            time.sleep(delay)
+            return set()
+
+        deadline = time.monotonic() + delay
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return set()
+
+            notified = self._get_notified(self.notifications.wait(remaining))
+            if notified:
+                logging.debug('notified about %s', ' '.join(sorted(notified)))
+                return notified
+
+    def _full_poll_delay(self):
+        """
+        Get the time left until all watched recipe sets are polled, starting
+        the wait for it if it isn't running yet.
+
+        Returns:
+            Number of seconds, zero or less if the poll is due.
+        """
+        now = time.monotonic()
+        if self.next_full_poll is None:
+            self.next_full_poll = now + self.watchdelay
+
+        return self.next_full_poll - now
+
+    def _recipe_sets_to_poll(self, notified):
+        """
+        Get the recipe sets to poll after waiting for the full poll.
+
+        Args:
+            notified: Set of IDs of the recipe sets notified while waiting.
+
+        Returns:
+            List of IDs of all watched recipe sets if the full poll is due,
+            of the notified ones otherwise.
+        """
+        if time.monotonic() < self.next_full_poll:
+            return sorted(notified)
+
+        self.next_full_poll = None
+        return list(self.watchlist)
+
+    def __wait_for_poll(self, scheduler):
+        """
+        Sleep until it's time to poll some of the watched recipe sets, or
+        until a notification about them arrives.
+
+        Args:
+            scheduler: PollScheduler deciding when each recipe set is due, or
+                       None to poll all of them every self.watchdelay seconds.
+
+        Returns:
+            List of IDs of the recipe sets to poll.
+        """
+        if scheduler is None:
+            delay = self._full_poll_delay()
+            notified = set()
+            if delay > 0:
+                notified = self._sleep_until_notified(delay)
+            return self._recipe_sets_to_poll(notified)
+
+        scheduler.sync(self.watchlist)
+        delay = scheduler.next_due() - time.monotonic()
+        notified = set()
+        if delay > 0:
+            notified = self._sleep_until_notified(delay)
+
+        return sorted(set(scheduler.pop_due()) | notified)
+
+    def __watchloop(self):
+        scheduler = None
+        if self.adaptive_polling:
+            scheduler = PollScheduler(self.watchdelay, self.poll_floor,
+                                      self.poll_ceiling)
+
+        self.next_full_poll = None
+        while not self.finished():
+            recipe_set_ids = self.__wait_for_poll(scheduler)
+            started = time.monotonic()
+            if self.check_max_aborted():
                 return
 
-            for recipe_set_id in self.watchlist.copy():
-                root = self.getresultstree(recipe_set_id)
-                recipes = root.findall('.//recipe')
-
-                for recipe in recipes:
-                    result = recipe.attrib.get('result')
-                    status = recipe.attrib.get('status')
-                    recipe_id = 'R:' + recipe.attrib.get('id')
-                    if status not in ['Completed', 'Aborted', 'Cancelled'] or \
-                            recipe_id in self.completed_recipes[recipe_set_id]:
-                        # continue watching unfinished recipes
-                        continue
+            with tracing.span('sweep', recipe_sets=len(recipe_set_ids)):
+                if not self.apply(self.__fetch_watchlist(recipe_set_ids),
+                                  scheduler):
+                    return
 
-                    logging.info("%s status changed to %s", recipe_id, status)
-                    self.completed_recipes[recipe_set_id].add(recipe_id)
-                    if len(self.completed_recipes[recipe_set_id]) == \
-                            len(recipes):
-                        try:
-                            self.watchlist.remove(recipe_set_id)
-                        except KeyError:
-                            pass
-                        self.recipe_set_results[recipe_set_id] = root
-
-                    if result == 'Pass':
-                        # some recipe passed, nothing to do here
-                        continue
+            self._record_sweep(started)
 
-                    if status == 'Cancelled':
-                        # job got cancelled for some reason, there's probably
-                        # an external reason
-                        logging.error('Cancelled run detected! Cancelling the '
-                                      'rest of runs and aborting!')
-                        self.cancel_pending_jobs()
-                        return
-
-                    if result == 'Warn' and status == 'Aborted':
-                        self.__handle_test_abort(recipe, recipe_id,
-                                                 recipe_set_id, root)
-                        continue
+            self._checkpoint()
 
-                    # check for test failure
-                    test_failure, waive_skip = \
-                        self.__handle_test_fail(recipe, recipe_id)
-                    if waive_skip:
-                        logging.info("recipe %s waived task(s) failed",
-                                     recipe_id)
-                        continue
+    def apply(self, results, scheduler=None):
+        """
+        Process fetched results of watched recipe sets: handle their finished
+        recipes, resubmit aborted ones, stop early if the result of the run
+        is decided and submit the queued resubmissions when they're due.
+
+        Args:
+            results:   Iterable of (recipe set ID, etree node) tuples, as
+                       returned by fetch_batch().
+            scheduler: PollScheduler deciding when each recipe set is due, or
+                       None.
+
+        Returns:
+            False if watching should stop (the jobs were cancelled or the
+            result was decided early), True otherwise.
+        """
+        for recipe_set_id, root in results:
+            if not self._process_recipe_set(recipe_set_id, root):
+                return False
+
+            if scheduler and recipe_set_id in self.watchlist:
+                scheduler.reschedule(recipe_set_id, root)
+
+        if self._verdict_decided():
+            if self.fail_fast_cancel:
+                self.cancel_pending_jobs()
+            return False
+
+        # don't wait for more aborted recipe sets with nothing to watch
+        self._flush_resubmissions(force=not self.watchlist)
+
+        return True
+
+    def finished(self):
+        """
+        Check if all watched recipe sets finished.
+
+        Returns:
+            True if nothing is left to watch, False otherwise.
+        """
+        return not self.watchlist
+
+    def _record_sweep(self, started):
+        """
+        Record metrics of a sweep over the watched recipe sets.
+
+        Args:
+            started: Value of time.monotonic() when the sweep started.
+        """
+        if not metrics.enabled():
+            return
+
+        metrics.observe('skt_sweep_duration_seconds',
+                        time.monotonic() - started)
+        metrics.set_gauge('skt_watchlist_size', len(self.watchlist))
+        metrics.replace_gauge('skt_recipes', {
+            (('status', status),): count
+            for status, count in self.count_recipe_statuses().items()
+        })
+
+    def count_recipe_statuses(self):
+        """
+        Count the recipes of the watched jobs by their status at the last
+        check.
+
+        Returns:
+            collections.Counter of recipe statuses.
+        """
+        return collections.Counter(
+            status
+            for recipe_sets in self.job_to_recipe_set_map.values()
+            for recipe_set_id in recipe_sets
+            for status, _ in self.recipe_fingerprints.get(recipe_set_id,
+                                                          {}).values()
+        )
+
+    def _checkpoint(self):
+        """Call self.checkpoint if it's set and wasn't called recently."""
+        if self.checkpoint is None:
+            return
+
+        now = time.monotonic()
+        if self.last_checkpoint is not None and \
+                now - self.last_checkpoint < self.checkpoint_interval:
+            return
+
+        self.last_checkpoint = now
+        try:
+            self.checkpoint()
+        except Exception as exc:
+            # losing a checkpoint is no reason to stop watching
+            logging.warning('Failed to save the watch state: %s', exc)
 
-                    if not test_failure:
-                        # Recipe failed before the tested kernel was installed
-                        self.__forget_taskspec(recipe_set_id)
-                        self.aborted_count += 1
+    def check_max_aborted(self):
+        """
+        Cancel all remaining recipe sets if too many of them aborted.
+
+        Returns:
+            True if watching should stop, False otherwise.
+        """
+        if self.max_aborted <= self.aborted_count:
+            self.has_aborted = True
+            # Remove / cancel all the remaining recipe set IDs and abort
+            self.cancel_pending_jobs()
+            return True
 
-                        if self.aborted_count < self.max_aborted:
-                            logging.warning('Infrastructure-related problem '
-                                            'found, resubmitting %s',
-                                            recipe_set_id)
-                            newjob = self.__recipe_set_to_job(root)
-                            newjobid = self.__jobsubmit(tostring(newjob))
-                            self.__add_to_watchlist(newjobid)
+        return False
 
     def __add_to_watchlist(self, jobid):
-        root = self.getresultstree(jobid)
+        self._watch_job(jobid, self.getresultstree(jobid))
+
+    def watch_jobs(self, *jobids):
+        """
+        Add all recipe sets of submitted jobs to the watchlist, without
+        waiting for them. Poll them with pending_batches(), fetch_batch() and
+        apply() until finished().
+
+        Args:
+            jobids: ids of Beaker jobs like J:1234
+        """
+        for jobid in jobids:
+            self.__add_to_watchlist(jobid)
+
+    def _watch_job(self, jobid, root):
+        """
+        Add all recipe sets of a job to the watchlist.
 
+        Args:
+            jobid: id of a Beaker job like J:1234
+            root:  etree node with the job results.
+        """
         if not self.whiteboard:
             self.whiteboard = root.find("whiteboard").text
 
+        self.job_groups[jobid] = root.attrib.get('group')
         self.job_to_recipe_set_map[jobid] = set()
         for recipe_set in root.findall("recipeSet"):
             set_id = "RS:%s" % recipe_set.attrib.get("id")
@@ -562,16 +1540,43 @@ class BeakerRunner:
             self.completed_recipes[set_id] = set()
             logging.info("added %s to watchlist", set_id)
 
-    def wait(self, jobid):
+    def wait(self, *jobids):
         """
-        Add jobid to watchlist, enter watchloop and wait for jobid to finish.
+        Add jobids to watchlist, enter watchloop and wait for the jobs to
+        finish.
 
         Args:
-            jobid: id of a Beaker job like 1234
+            jobids: ids of Beaker jobs like 1234
 
         """
-        self.__add_to_watchlist(jobid)
+        self.watch_jobs(*jobids)
+        self._watch()
+
+    def _watch(self):
+        """Enter watchloop and wait for all watched recipe sets to finish."""
         self.__watchloop()
+        self._log_change_stats()
+
+    def finish(self, decide=True):
+        """
+        Stop watching the run, logging how much work change detection saved,
+        and decide its result.
+
+        Args:
+            decide: True to set self.retcode based on the results, False if
+                    the run failed and the result stays SKT_ERROR.
+        """
+        self._log_change_stats()
+        if decide:
+            self._decide_retcode()
+
+    def _log_change_stats(self):
+        """Log how much work change detection saved."""
+        payload_rate, recipe_set_rate = self.get_change_hit_rates()
+        if payload_rate is not None and recipe_set_rate is not None:
+            logging.info('unchanged results: %.0f%% of payloads, %.0f%% of '
+                         'recipe sets', payload_rate * 100,
+                         recipe_set_rate * 100)
 
     def get_recipe_test_list(self, recipe_node):
         """
@@ -588,20 +1593,7 @@ class BeakerRunner:
         Returns:
             List of test names that ran.
         """
-        test_list = []
-        after_kpkg = True if self.get_kpkginstall_task(recipe_node) is None \
-            else False
-
-        for test_task in recipe_node.findall('task'):
-            fetch = test_task.find('fetch')
-            if fetch is not None and \
-                    'kpkginstall' in fetch.attrib.get('url', ''):
-                after_kpkg = True
-
-            if after_kpkg and test_task.attrib.get('result') != 'Skip':
-                test_list.append(test_task.attrib.get('name'))
-
-        return test_list
+        return list(self._analyze(recipe_node).tests_run)
 
     @classmethod
     def get_kpkginstall_task(cls, recipe_node):
@@ -621,31 +1613,11 @@ class BeakerRunner:
         return None
 
     def __jobsubmit(self, xml):
-        # pylint: disable=no-self-use
-        jobid = None
-        args = ["bkr", "job-submit"]
-
-        if self.jobowner is not None:
-            args += ["--job-owner=%s" % self.jobowner]
-
-        args += ["-"]
-        err_strings = ["connection to beaker.engineering.redhat.com failed",
-                       "Can't connect to MySQL server on"]
-        stdout, stderr, retcode = retry_safe_popen(err_strings, args,
-                                                   stdin_data=xml,
-                                                   stdin=subprocess.PIPE,
-                                                   stderr=subprocess.PIPE,
-                                                   stdout=subprocess.PIPE)
-
-        for line in stdout.split("\n"):
-            match = re.match(r"^Submitted: \['([^']+)'\]$", line)
-            if match:
-                jobid = match.group(1)
-                break
+        with tracing.span('jobsubmit') as span:
+            jobid = self.transport.job_submit(xml, self.jobowner)
+            span.set(job=jobid)
 
         if not jobid:
-            logging.info(f'retcode={retcode}, stderr={stderr}')
-            logging.info(stdout)
             raise Exception('Unable to submit the job!')
 
         logging.info("submitted jobid: %s", jobid)
@@ -659,12 +1631,208 @@ class BeakerRunner:
                job_xml_tree: ElementTree.Element with all recipeSets/recipes
 
         """
+        self.__refresh_blacklist()
         for recipe in job_xml_tree.findall('recipeSet/recipe'):
             hreq = recipe.find('hostRequires')
             new_hreq = self.__blacklist_hreq(hreq)
             recipe.remove(hreq)
             recipe.append(new_hreq)
 
+    def _reset(self, max_aborted):
+        """
+        Forget everything about previous runs.
+
+        Args:
+            max_aborted: Maximum number of allowed aborted jobs.
+        """
+        self.watchlist = set()
+        self.job_to_recipe_set_map = {}
+        self.job_groups = {}
+        self.recipe_set_results = {}
+        self.recipe_set_summaries = {}
+        self.recipe_analyses = {}
+        self.verdicts = VerdictAggregator()
+        self.result_digests = {}
+        self.recipe_fingerprints = {}
+        self.change_stats = collections.Counter()
+        self.completed_recipes = {}
+        self.aborted_count = 0
+        self.max_aborted = max_aborted
+        self._drop_resubmissions('starting a new run')
+        self.decided_retcode = None
+        self.run_started = time.monotonic()
+        self.last_checkpoint = None
+
+    def submit(self, max_aborted):
+        """
+        Start a new run, forgetting everything about previous runs, and
+        submit the job template. Watch the jobs with watch_jobs().
+
+        Args:
+            max_aborted: Maximum number of allowed aborted jobs.
+
+        Returns:
+            List of IDs of the submitted jobs.
+        """
+        self._reset(max_aborted)
+        return self._submit_template()
+
+    def _submit_template(self):
+        """
+        Submit the job template, excluding the blacklisted hosts. If
+        self.split_jobs is more than 1, the recipe sets are split into that
+        many jobs of similar expected duration, submitted concurrently.
+
+        Returns:
+            List of IDs of the submitted jobs.
+        """
+        text = pathlib.Path(self.template).read_text()
+        job_xml_tree = fromstring(text)
+        # add blacklist to all recipes
+        self.add_blacklist2recipes(job_xml_tree)
+
+        jobs = [job_xml_tree]
+        if self.split_jobs > 1:
+            # pylint: disable=import-outside-toplevel
+            from skt.splitting import split_job
+            jobs = split_job(job_xml_tree, self.split_jobs,
+                             self.task_durations)
+        if len(jobs) == 1:
+            # convert etree to xml and submit the job to Beaker
+            return [self.__jobsubmit(tostring(job_xml_tree))]
+
+        with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            futures = [executor.submit(self.__jobsubmit, tostring(job))
+                       for job in jobs]
+        jobids = [future.result() for future in futures
+                  if not future.exception()]
+        if len(jobids) < len(jobs):
+            # don't leave a part of the run behind unwatched
+            self._cancel_jobs(jobids)
+            raise Exception('Unable to submit the jobs!')
+
+        logging.info('split the job template into %s', ' '.join(jobids))
+        return jobids
+
+    def _decide_retcode(self):
+        """Set self.retcode based on the results of all watched jobs."""
+        with tracing.span('getresults') as span:
+            if self.decided_retcode is not None:
+                # the recipe sets left can't change the result anymore
+                self.retcode = self.decided_retcode
+            else:
+                self.retcode = self.__getresults()
+            span.set(retcode=self.retcode)
+        logging.debug(
+            "Got return code when gathering results: %s", self.retcode
+        )
+        metrics.observe('skt_time_to_verdict_seconds',
+                        time.monotonic() - self.run_started)
+
+    def _restore_job(self, jobid, root, recipe_sets, completed_recipes):
+        """
+        Restore the watch state of a job submitted by a previous run. Recipe
+        sets whose recipes all finished before are not watched again, only
+        their results are kept.
+
+        Args:
+            jobid:             id of a Beaker job like J:1234
+            root:              etree node with the job results.
+            recipe_sets:       Set of the recipe set IDs the previous run
+                               kept, others were forgotten.
+            completed_recipes: Set of the IDs of the recipes which the
+                               previous run saw finish, like R:1234.
+        """
+        if not self.whiteboard:
+            self.whiteboard = root.find("whiteboard").text
+
+        self.job_groups[jobid] = root.attrib.get('group')
+        self.job_to_recipe_set_map[jobid] = set()
+        for recipe_set in root.findall("recipeSet"):
+            set_id = "RS:%s" % recipe_set.attrib.get("id")
+            if set_id not in recipe_sets:
+                continue
+
+            self.job_to_recipe_set_map[jobid].add(set_id)
+            recipe_ids = {'R:' + recipe.attrib.get('id')
+                          for recipe in recipe_set.findall('recipe')}
+            self.completed_recipes[set_id] = recipe_ids & completed_recipes
+            if self.completed_recipes[set_id] == recipe_ids:
+                self.recipe_set_summaries[set_id] = \
+                    summarize_recipe_set(recipe_set)
+                self.__record_verdicts(set_id,
+                                       self.recipe_set_summaries[set_id])
+                self.verdicts.finish(set_id)
+            else:
+                self.__record_verdicts(set_id, [
+                    recipe for recipe in recipe_set.findall('recipe')
+                    if 'R:' + recipe.attrib.get('id') in completed_recipes
+                ])
+                self.watchlist.add(set_id)
+                logging.info("added %s to watchlist", set_id)
+
+        if not self.job_to_recipe_set_map[jobid]:
+            del self.job_to_recipe_set_map[jobid]
+
+    def __call_logged(self, func):
+        """
+        Call func, logging any exception except for SystemExit, which is
+        raised again.
+        """
+        try:
+            func()
+        except (Exception, BaseException) as e:
+            if isinstance(e, SystemExit):
+                sys.stderr.write('SystemExit exception caught\n')
+                raise
+            else:
+                exc = sys.exc_info()
+                logging.error('\n'.join(traceback.format_exception(*exc)))
+
+    def resume(self, jobs, recipe_sets, completed_recipes, aborted_count,
+               max_aborted, resubmissions=()):
+        """
+        Continue watching the jobs of a previous run which was interrupted,
+        without submitting anything again, and wait for them to finish.
+
+        Args:
+            jobs:              List of IDs of the jobs of the previous run.
+            recipe_sets:       Set of the recipe set IDs the previous run
+                               kept.
+            completed_recipes: Set of the IDs of the recipes which the
+                               previous run saw finish.
+            aborted_count:     Number of aborted recipe sets the previous run
+                               counted.
+            max_aborted:       Maximum number of allowed aborted jobs. Abort
+                               the whole stage if the number is reached.
+            resubmissions:     IDs of the recipe sets the previous run queued
+                               to be resubmitted, see queued_resubmissions().
+
+        Returns:
+            Return code, see run().
+        """
+        # pylint: disable=too-many-arguments
+        self._reset(max_aborted)
+        self.aborted_count = aborted_count
+
+        def resume_watch():
+            for jobid in jobs:
+                self._restore_job(jobid, self.getresultstree(jobid),
+                                  recipe_sets, completed_recipes)
+            for recipe_set_id in resubmissions:
+                # the aborted recipe set isn't watched, only resubmitted
+                self.watchlist.discard(recipe_set_id)
+                self._resubmit(self.getresultstree(recipe_set_id))
+            # don't wait for the window with nothing else to watch
+            self._flush_resubmissions(force=not self.watchlist)
+            self._watch()
+            self._decide_retcode()
+
+        with tracing.span('resume', jobs=list(jobs)):
+            self.__call_logged(resume_watch)
+
+        return self.retcode
+
     def run(self, url, max_aborted, release, wait=False,
             arch=platform.machine()):
         """
@@ -691,40 +1859,21 @@ class BeakerRunner:
                    SKT_BOOT if the boot test failed
         """
         # pylint: disable=too-many-arguments
-        self.watchlist = set()
-        self.job_to_recipe_set_map = {}
-        self.recipe_set_results = {}
-        self.completed_recipes = {}
-        self.aborted_count = 0
-        self.max_aborted = max_aborted
-
-        try:
-            text = pathlib.Path(self.template).read_text()
-            job_xml_tree = fromstring(text)
-            # add blacklist to all recipes
-            self.add_blacklist2recipes(job_xml_tree)
+        self._reset(max_aborted)
 
-            # convert etree to xml and submit the job to Beaker
-            jobid = self.__jobsubmit(tostring(job_xml_tree))
+        def submit_and_wait():
+            jobids = self._submit_template()
 
             if wait:
                 # wait for completion, resubmit jobs as needed
-                self.wait(jobid)
+                self.wait(*jobids)
                 # get return code and report it
-                self.retcode = self.__getresults()
-                logging.debug(
-                    "Got return code when gathering results: %s", self.retcode
-                )
+                self._decide_retcode()
             else:
                 # not waiting -> change retcode to success
                 self.retcode = SKT_SUCCESS
 
-        except (Exception, BaseException) as e:
-            if isinstance(e, SystemExit):
-                sys.stderr.write('SystemExit exception caught\n')
-                raise
-            else:
-                exc = sys.exc_info()
-                logging.error('\n'.join(traceback.format_exception(*exc)))
+        with tracing.span('run', template=self.template, wait=wait):
+            self.__call_logged(submit_and_wait)
 
         return self.retcode
@@ -0,0 +1,209 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Adaptive scheduling of recipe set polls."""
+import heapq
+import itertools
+import random
+import time
+
+from skt.misc import get_task_expected_time, parse_duration
+
+# Recipe states which are final
+FINAL_STATES = ['Completed', 'Aborted', 'Cancelled']
+
+# How much longer than the base interval to wait for recipes which aren't
+# running yet. Recipes waiting for a machine (New, Processed, Queued) rarely
+# change state soon, provisioning and installing the distro (Scheduled,
+# Waiting) takes some time, too.
+STATUS_FACTORS = {
+    'New': 4,
+    'Processed': 4,
+    'Queued': 4,
+    'Scheduled': 2,
+    'Waiting': 2,
+    'Installing': 2,
+}
+
+
+class PollScheduler:
+    """
+    Keep watched recipe sets in a priority queue ordered by the time they
+    should be polled next. The poll interval of each recipe set adapts to
+    the state of its recipes, the expected run time of their tasks, and backs
+    off while nothing changes.
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, interval, floor, ceiling, jitter=0.1, backoff=1.5):
+        """
+        Initialize the scheduler.
+
+        Args:
+            interval: Base delay between polls of a recipe set, seconds.
+            floor:    Minimal delay between polls of a recipe set, seconds.
+            ceiling:  Maximal delay between polls of a recipe set, seconds.
+            jitter:   Relative amount of randomness added to each delay, so
+                      the polls of recipe sets don't cluster.
+            backoff:  Factor to multiply the delay with for every poll which
+                      didn't find any change.
+        """
+        # pylint: disable=too-many-arguments
+        self.interval = interval
+        self.floor = min(floor, ceiling)
+        self.ceiling = ceiling
+        self.jitter = jitter
+        self.backoff = backoff
+
+        # heap of (due time, sequence number, recipe set ID), may contain
+        # stale entries which don't match self.due
+        self.heap = []
+        # recipe set ID -> due time of its next poll
+        self.due = {}
+        # recipe set ID -> (state of the recipes at the last poll, number of
+        # polls without change)
+        self.history = {}
+        self.counter = itertools.count()
+
+    def __push(self, recipe_set_id, due):
+        self.due[recipe_set_id] = due
+        heapq.heappush(self.heap, (due, next(self.counter), recipe_set_id))
+
+    def sync(self, recipe_set_ids, now=None):
+        """
+        Start scheduling new recipe sets and forget about the ones which are
+        not watched anymore. New recipe sets are due after the base interval.
+
+        Args:
+            recipe_set_ids: Set of recipe set IDs which should be scheduled.
+            now:            Current time, time.monotonic() by default.
+        """
+        now = time.monotonic() if now is None else now
+        for recipe_set_id in set(self.due) - set(recipe_set_ids):
+            del self.due[recipe_set_id]
+            self.history.pop(recipe_set_id, None)
+
+        for recipe_set_id in set(recipe_set_ids) - set(self.due):
+            self.__push(recipe_set_id, now + self.interval)
+
+    def next_due(self):
+        """
+        Returns:
+            Time the next recipe set is due, None if nothing is scheduled.
+        """
+        while self.heap:
+            due, _, recipe_set_id = self.heap[0]
+            if self.due.get(recipe_set_id) == due:
+                return due
+            # stale entry
+            heapq.heappop(self.heap)
+
+        return None
+
+    def pop_due(self, now=None):
+        """
+        Take all recipe sets which are due off the queue. They are scheduled
+        again by reschedule(), or by sync() with the base interval.
+
+        Args:
+            now: Current time, time.monotonic() by default.
+
+        Returns:
+            List of due recipe set IDs, the most overdue first.
+        """
+        now = time.monotonic() if now is None else now
+        due_ids = []
+        while self.next_due() is not None and self.heap[0][0] <= now:
+            _, _, recipe_set_id = heapq.heappop(self.heap)
+            del self.due[recipe_set_id]
+            due_ids.append(recipe_set_id)
+
+        return due_ids
+
+    def reschedule(self, recipe_set_id, root, now=None):
+        """
+        Schedule the next poll of a recipe set based on its latest results.
+
+        Args:
+            recipe_set_id: Recipe set (RS:xxxxx) ID.
+            root:          etree node with the recipe set results.
+            now:           Current time, time.monotonic() by default.
+
+        Returns:
+            Delay until the next poll, seconds.
+        """
+        now = time.monotonic() if now is None else now
+        state = tuple((recipe.attrib.get('status'),
+                       tuple(task.attrib.get('status')
+                             for task in recipe.findall('task')))
+                      for recipe in root.findall('.//recipe'))
+
+        last_state, unchanged = self.history.get(recipe_set_id, (None, 0))
+        unchanged = unchanged + 1 if state == last_state else 0
+        self.history[recipe_set_id] = (state, unchanged)
+
+        delay = self.get_interval(root) * self.backoff ** unchanged
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        delay = max(self.floor, min(self.ceiling, delay))
+
+        self.__push(recipe_set_id, now + delay)
+        return delay
+
+    def get_interval(self, root):
+        """
+        Get the delay before the next poll of a recipe set, without backoff
+        and jitter. The most urgent unfinished recipe decides.
+
+        Args:
+            root: etree node with the recipe set results.
+
+        Returns:
+            Delay in seconds.
+        """
+        intervals = [self.get_recipe_interval(recipe)
+                     for recipe in root.findall('.//recipe')
+                     if recipe.attrib.get('status') not in FINAL_STATES]
+
+        return min(intervals, default=self.interval)
+
+    def get_recipe_interval(self, recipe):
+        """
+        Get the delay before the next poll of a single unfinished recipe.
+        Recipes which didn't start running yet are polled less often. For
+        running recipes, the delay is half the expected remaining run time
+        of their tasks, so recipes that are nearly done are polled often.
+
+        Args:
+            recipe: etree node of the recipe.
+
+        Returns:
+            Delay in seconds.
+        """
+        status = recipe.attrib.get('status')
+        if status in STATUS_FACTORS:
+            return self.interval * STATUS_FACTORS[status]
+
+        remaining = 0
+        for task in recipe.findall('task'):
+            if task.attrib.get('status') in FINAL_STATES:
+                continue
+
+            expected = get_task_expected_time(task)
+            if expected is None:
+                # no hint, use the base interval
+                return self.interval
+
+            elapsed = parse_duration(task.attrib.get('duration') or '') or 0
+            remaining += max(expected - elapsed, 0)
+
+        return min(self.interval, remaining / 2)
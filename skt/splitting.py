@@ -0,0 +1,124 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Splitting of a job into several jobs of similar expected duration."""
+import copy
+import heapq
+import json
+
+from skt.misc import get_task_expected_time
+
+# Expected run time of a task nothing is known about, seconds
+DEFAULT_TASK_TIME = 600
+
+
+def load_task_durations(path):
+    """
+    Load expected run times of tasks recorded by earlier runs from a JSON
+    file, holding an object mapping task names to seconds, like:
+
+        {"/distribution/install": 1200, "/test/misc/machineinfo": 60}
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        Dictionary of task names to their expected run time in seconds.
+
+    Raises:
+        ValueError if the file is invalid.
+    """
+    with open(path) as fileh:
+        durations = json.load(fileh)
+
+    if not isinstance(durations, dict) or \
+            not all(isinstance(value, (int, float))
+                    for value in durations.values()):
+        raise ValueError(f'{path} must map task names to seconds')
+
+    return durations
+
+
+def get_recipe_set_duration(recipe_set, task_durations=None):
+    """
+    Estimate how long a recipe set runs. Its recipes run in parallel, so this
+    is the longest sum of expected task run times of its recipes.
+
+    Args:
+        recipe_set:     etree node of the recipe set.
+        task_durations: Dictionary of task names to their expected run time
+                        in seconds, used for tasks without an expectedTime
+                        hint, or None.
+
+    Returns:
+        Expected duration in seconds.
+    """
+    task_durations = task_durations or {}
+    duration = 0
+    for recipe in recipe_set.findall('recipe'):
+        recipe_duration = 0
+        for task in recipe.findall('task'):
+            expected = get_task_expected_time(task)
+            if expected is None:
+                expected = task_durations.get(task.attrib.get('name'),
+                                              DEFAULT_TASK_TIME)
+            recipe_duration += expected
+        duration = max(duration, recipe_duration)
+
+    return duration
+
+
+def split_job(job, parts, task_durations=None):
+    """
+    Split the recipe sets of a job into several jobs with similar expected
+    durations, packing the longest recipe sets first into the job expected
+    to finish first. The jobs keep the attributes and everything but the
+    recipe sets of the original job, and the order of the recipe sets.
+
+    Args:
+        job:            etree node of the job.
+        parts:          Number of jobs to create. Less jobs are created if
+                        the job has less recipe sets.
+        task_durations: Dictionary of task names to their expected run time
+                        in seconds, see get_recipe_set_duration(), or None.
+
+    Returns:
+        List of etree nodes of the jobs.
+    """
+    recipe_sets = job.findall('recipeSet')
+    parts = max(min(parts, len(recipe_sets)), 1)
+    if parts == 1:
+        return [job]
+
+    durations = [get_recipe_set_duration(recipe_set, task_durations)
+                 for recipe_set in recipe_sets]
+    # (expected duration, job index) of each job
+    loads = [(0, index) for index in range(parts)]
+    assigned = [[] for _ in range(parts)]
+    for position in sorted(range(len(recipe_sets)),
+                           key=lambda position: -durations[position]):
+        load, index = heapq.heappop(loads)
+        assigned[index].append(position)
+        heapq.heappush(loads, (load + durations[position], index))
+
+    skeleton = copy.deepcopy(job)
+    for recipe_set in skeleton.findall('recipeSet'):
+        skeleton.remove(recipe_set)
+
+    jobs = []
+    for positions in assigned:
+        part = copy.deepcopy(skeleton)
+        part.extend(recipe_sets[position] for position in sorted(positions))
+        jobs.append(part)
+
+    return jobs
@@ -0,0 +1,245 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""
+Tracing of the phases of a run, written in the Chrome trace event format.
+
+Tracing is disabled by default and span() returns a no-op span until
+enable() is called. The trace file can be loaded in chrome://tracing or
+https://ui.perfetto.dev. Besides the spans of skt itself, the trace shows
+how long each recipe was seen in each Beaker status, like Queued or
+Installing, on a separate "Beaker" track.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Thread ID of the track with the Beaker recipe statuses
+BEAKER_TID = 0
+
+# Tracer recording the spans, None while disabled
+TRACER = None
+
+
+class NullSpan:
+    """Span doing nothing, used while tracing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attrs):
+        """Ignore attributes."""
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    """A traced phase, recorded when it ends."""
+
+    def __init__(self, tracer, name, attrs):
+        """
+        Args:
+            tracer: Tracer to record the span in.
+            name:   Name of the phase.
+            attrs:  Dictionary of attributes, like the recipe set ID.
+        """
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.tracer.add(self.name, self.start, time.perf_counter(),
+                        threading.get_ident(), self.attrs)
+        return False
+
+    def set(self, **attrs):
+        """Add attributes known only once the phase runs."""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """Thread safe recorder of trace events."""
+
+    def __init__(self, max_events=1000000):
+        """
+        Args:
+            max_events: Maximum number of events to keep, later events are
+                        dropped.
+        """
+        self.lock = threading.Lock()
+        self.max_events = max_events
+        self.events = []
+        self.dropped = 0
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        # Last seen status of each recipe and when it was first seen
+        self.recipe_statuses = {}
+
+    def add(self, name, start, end, tid, attrs):
+        """
+        Record a complete event.
+
+        Args:
+            name:  Name of the event.
+            start: Value of time.perf_counter() when the event started.
+            end:   Value of time.perf_counter() when the event ended.
+            tid:   ID of the thread the event ran in.
+            attrs: Dictionary of attributes of the event.
+        """
+        event = {
+            'name': name, 'cat': 'skt', 'ph': 'X', 'pid': self.pid,
+            'tid': tid, 'ts': round((start - self.origin) * 1e6, 1),
+            'dur': round((end - start) * 1e6, 1), 'args': attrs
+        }
+        with self.lock:
+            if len(self.events) >= self.max_events:
+                self.dropped += 1
+                return
+            self.events.append(event)
+
+    def recipe_status(self, recipe_id, status, recipe_set_id):
+        """
+        Record the status of a recipe seen in a poll. The time spent in the
+        previous status ends when a new one is seen.
+
+        Args:
+            recipe_id:     ID of the recipe, like R:1234.
+            status:        Status of the recipe, like 'Queued'.
+            recipe_set_id: ID of the recipe set of the recipe.
+        """
+        now = time.perf_counter()
+        with self.lock:
+            last = self.recipe_statuses.get(recipe_id)
+            if last is not None and last[0] == status:
+                return
+            self.recipe_statuses[recipe_id] = (status, now, recipe_set_id)
+
+        if last is not None:
+            status, start, last_recipe_set_id = last
+            self.add(status, start, now, BEAKER_TID,
+                     {'recipe': recipe_id, 'recipe_set': last_recipe_set_id})
+
+    def to_json(self):
+        """
+        Get the trace in the Chrome trace event format. Recipes are shown in
+        their last seen status until now.
+
+        Returns:
+            Dictionary which can be serialized to JSON.
+        """
+        now = time.perf_counter()
+        with self.lock:
+            events = list(self.events)
+            statuses = dict(self.recipe_statuses)
+            dropped = self.dropped
+
+        for recipe_id, (status, start, recipe_set_id) in statuses.items():
+            events.append({
+                'name': status, 'cat': 'skt', 'ph': 'X', 'pid': self.pid,
+                'tid': BEAKER_TID,
+                'ts': round((start - self.origin) * 1e6, 1),
+                'dur': round((now - start) * 1e6, 1),
+                'args': {'recipe': recipe_id, 'recipe_set': recipe_set_id}
+            })
+
+        metadata = [
+            {'name': 'process_name', 'ph': 'M', 'pid': self.pid,
+             'args': {'name': 'skt'}},
+            {'name': 'thread_name', 'ph': 'M', 'pid': self.pid,
+             'tid': BEAKER_TID, 'args': {'name': 'Beaker'}},
+        ]
+        return {'traceEvents': metadata + events,
+                'displayTimeUnit': 'ms',
+                'otherData': {'dropped_events': dropped}}
+
+
+def enable(max_events=1000000):
+    """
+    Start recording spans.
+
+    Returns:
+        Tracer the spans are recorded in.
+    """
+    global TRACER  # pylint: disable=global-statement
+    if TRACER is None:
+        TRACER = Tracer(max_events)
+
+    return TRACER
+
+
+def disable():
+    """Stop recording spans and forget them."""
+    global TRACER  # pylint: disable=global-statement
+    TRACER = None
+
+
+def span(name, **attrs):
+    """
+    Trace a phase of the run, to be used as a context manager:
+
+        with tracing.span('getresultstree', taskspec=taskspec):
+            ...
+
+    Args:
+        name:  Name of the phase.
+        attrs: Attributes of the phase, like the recipe set ID.
+
+    Returns:
+        Span, or NULL_SPAN if tracing is disabled.
+    """
+    if TRACER is None:
+        return NULL_SPAN
+
+    return Span(TRACER, name, attrs)
+
+
+def recipe_status(recipe_id, status, recipe_set_id):
+    """Record the status of a recipe seen in a poll if tracing is enabled,
+    see Tracer.recipe_status()."""
+    if TRACER is not None:
+        TRACER.recipe_status(recipe_id, status, recipe_set_id)
+
+
+def write_trace(path):
+    """
+    Write the trace to a file atomically.
+
+    Args:
+        path: Path to the file.
+    """
+    if TRACER is None:
+        return
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix='.skt-trace-')
+    try:
+        with os.fdopen(fd, 'w') as fileh:
+            json.dump(TRACER.to_json(), fileh)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
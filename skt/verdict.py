@@ -0,0 +1,171 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Running result of a run, updated as its recipes finish."""
+from skt.misc import SKT_SUCCESS, SEVERITY
+
+
+class VerdictAggregator:
+    """
+    Verdicts of the recipes of a run, each recorded once when it's decided.
+    The result of the run, the most severe verdict, is known at any time.
+    Verdicts of forgotten recipe sets, which don't count for the result, are
+    dropped.
+    """
+
+    def __init__(self):
+        # (RecipeAnalysis, retcode, message) of each recipe by recipe set ID
+        # and recipe ID
+        self.recipe_sets = {}
+        # Recipe set ID of the recipes with each verdict, by retcode and
+        # recipe ID, in the order they were recorded
+        self.recipes = {retcode: {} for retcode in SEVERITY}
+        # Recipe sets with the verdicts of all their recipes recorded
+        self.finished = set()
+        # Recipe sets whose verdicts are not recorded anymore
+        self.forgotten = set()
+
+    def recorded(self, recipe_set_id, recipe_id):
+        """
+        Check if the verdict of a recipe doesn't need to be decided anymore.
+
+        Args:
+            recipe_set_id: recipe set (RS:xxxxx) ID.
+            recipe_id:     recipe (R:xxxxx) ID.
+
+        Returns:
+            True if the verdict was recorded or the recipe set was forgotten,
+            False otherwise.
+        """
+        return recipe_set_id in self.forgotten or \
+            recipe_id in self.recipe_sets.get(recipe_set_id, {})
+
+    def add(self, recipe_set_id, recipe_id, analysis, retcode, message):
+        """
+        Record the verdict of a recipe, unless it was recorded before or its
+        recipe set was forgotten.
+
+        Args:
+            recipe_set_id: recipe set (RS:xxxxx) ID.
+            recipe_id:     recipe (R:xxxxx) ID.
+            analysis:      RecipeAnalysis of the recipe.
+            retcode:       Verdict of the recipe, like SKT_FAIL.
+            message:       Explanation of the verdict.
+        """
+        # pylint: disable=too-many-arguments
+        if self.recorded(recipe_set_id, recipe_id):
+            return
+
+        self.recipe_sets.setdefault(recipe_set_id, {})[recipe_id] = \
+            (analysis, retcode, message)
+        self.recipes.setdefault(retcode, {})[recipe_id] = recipe_set_id
+
+    def get(self, recipe_set_id):
+        """
+        Get the recorded verdicts of the recipes of a recipe set.
+
+        Args:
+            recipe_set_id: recipe set (RS:xxxxx) ID.
+
+        Returns:
+            Dictionary of (retcode, message) tuples by recipe ID.
+        """
+        return {recipe_id: (retcode, message)
+                for recipe_id, (_, retcode, message)
+                in self.recipe_sets.get(recipe_set_id, {}).items()}
+
+    def lookup(self, recipe_set_id, recipe_id):
+        """
+        Get the recorded verdict of a recipe and the analysis it was decided
+        by.
+
+        Args:
+            recipe_set_id: recipe set (RS:xxxxx) ID.
+            recipe_id:     recipe (R:xxxxx) ID.
+
+        Returns:
+            (RecipeAnalysis, retcode, message) tuple, or None if the verdict
+            wasn't recorded.
+        """
+        return self.recipe_sets.get(recipe_set_id, {}).get(recipe_id)
+
+    def finish(self, recipe_set_id):
+        """
+        Mark that the verdicts of all recipes of a recipe set were recorded.
+
+        Args:
+            recipe_set_id: recipe set (RS:xxxxx) ID.
+        """
+        self.finished.add(recipe_set_id)
+
+    def forget(self, recipe_set_id):
+        """
+        Drop the verdicts of a recipe set and don't record any more of them.
+
+        Args:
+            recipe_set_id: recipe set (RS:xxxxx) ID.
+        """
+        self.forgotten.add(recipe_set_id)
+        for recipe_id, (_, retcode, _) in \
+                self.recipe_sets.pop(recipe_set_id, {}).items():
+            del self.recipes[retcode][recipe_id]
+
+    def redecide(self, decide):
+        """
+        Decide the recorded verdicts again, after something they depend on
+        changed.
+
+        Args:
+            decide: Function taking a RecipeAnalysis and a recipe ID and
+                    returning a (retcode, message) tuple.
+        """
+        self.recipes = {retcode: {} for retcode in SEVERITY}
+        for recipe_set_id, verdicts in self.recipe_sets.items():
+            for recipe_id, (analysis, _, _) in verdicts.items():
+                retcode, message = decide(analysis, recipe_id)
+                verdicts[recipe_id] = (analysis, retcode, message)
+                self.recipes.setdefault(retcode, {})[recipe_id] = \
+                    recipe_set_id
+
+    def count(self, retcode):
+        """
+        Count the recipes with a verdict.
+
+        Args:
+            retcode: The verdict, like SKT_FAIL.
+
+        Returns:
+            Number of recipes.
+        """
+        return len(self.recipes.get(retcode, {}))
+
+    def first(self, retcode):
+        """
+        Get the first recipe recorded with a verdict.
+
+        Args:
+            retcode: The verdict, like SKT_FAIL.
+
+        Returns:
+            The recipe (R:xxxxx) ID, or None if no recipe has the verdict.
+        """
+        return next(iter(self.recipes.get(retcode, {})), None)
+
+    @property
+    def retcode(self):
+        """The most severe verdict recorded, SKT_SUCCESS if there is none."""
+        for retcode in reversed(SEVERITY):
+            if self.recipes.get(retcode):
+                return retcode
+
+        return SKT_SUCCESS
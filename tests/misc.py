@@ -13,10 +13,13 @@
 # Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
 """Miscellaneous for tests."""
 import os
+import tempfile
 
 import mock
 from defusedxml.ElementTree import fromstring
 
+from benchmarks.fakes import FakeTransport
+
 ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
 SCRIPT_PATH = os.path.dirname(__file__)
 DEFAULT_ARGS = {
@@ -132,3 +135,47 @@ def exec_on(myrunner, mock_jobsubmit, xml_asset_file, max_aborted,
     mock1.stop()
     mock2.stop()
     return result
+
+
+def build_job(*asset_files):
+    """Build Beaker job results out of recipe set assets. Every recipe set
+    and recipe gets a unique ID.
+
+    Args:
+        asset_files: filenames of assets with <recipeSet> root nodes
+    Returns:
+        xml root of the job
+    """
+    job = fromstring('<job id="0001"><whiteboard>skt</whiteboard></job>')
+    recipe_id = 1
+    for set_id, asset_file in enumerate(asset_files, 1):
+        recipe_set = fromstring(get_asset_content(asset_file))
+        recipe_set.attrib['id'] = str(set_id)
+        for recipe in recipe_set.findall('recipe'):
+            recipe.attrib['id'] = str(recipe_id)
+            recipe_id += 1
+
+        job.append(recipe_set)
+
+    return job
+
+
+class SpoolingTransport(FakeTransport):
+    """FakeTransport which can also spool results to temporary files."""
+
+    def __init__(self, *jobs):
+        """
+        Args:
+            jobs: xml roots of job results, returned for the first
+                  submissions
+        """
+        super().__init__(*jobs)
+        self.spooled = []
+
+    def spool_job_results(self, taskspec):
+        """Return a temporary file with the results XML."""
+        self.spooled.append(taskspec)
+        fileobj = tempfile.TemporaryFile()
+        fileobj.write(self.job_results(taskspec))
+        fileobj.seek(0)
+        return fileobj
@@ -0,0 +1,98 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Local stand-in for a STOMP message broker."""
+import socket
+import socketserver
+import threading
+
+from skt.notifications import format_frame, read_frames
+
+
+class StompHandler(socketserver.BaseRequestHandler):
+    """Handle a STOMP connection: log in and subscribe."""
+
+    def handle(self):
+        for command, headers, _ in read_frames(self.request):
+            if command == 'CONNECT':
+                if self.server.passcode is not None and \
+                        headers.get('passcode') != self.server.passcode:
+                    self.request.sendall(format_frame(
+                        'ERROR', {'message': 'login failed'}
+                    ))
+                    return
+                self.request.sendall(format_frame('CONNECTED',
+                                                  {'version': '1.2'}))
+            elif command == 'SUBSCRIBE':
+                with self.server.lock:
+                    self.server.subscribers.append(
+                        (headers['destination'], self.request)
+                    )
+                    self.server.subscribed.notify_all()
+
+
+class StompBroker(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """Broker stand-in sending published messages to the subscribers."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, passcode=None):
+        """
+        Args:
+            passcode: Password the clients have to log in with, or None.
+        """
+        super().__init__(('127.0.0.1', 0), StompHandler)
+        self.passcode = passcode
+        self.lock = threading.Lock()
+        self.subscribed = threading.Condition(self.lock)
+        self.subscribers = []
+        self.thread = None
+
+    def start(self):
+        """Serve connections in a background thread."""
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       kwargs={'poll_interval': 0.05},
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def stop_serving(self):
+        """Stop the background thread and close the socket."""
+        self.shutdown()
+        self.server_close()
+
+    def wait_for_subscribers(self, count=1, timeout=5):
+        """Wait until count clients subscribed."""
+        with self.lock:
+            return self.subscribed.wait_for(
+                lambda: len(self.subscribers) >= count, timeout
+            )
+
+    def publish(self, destination, body):
+        """Send a message to the subscribers of a destination."""
+        with self.lock:
+            for subscription, sock in self.subscribers:
+                if subscription == destination:
+                    sock.sendall(format_frame('MESSAGE', {
+                        'destination': destination, 'subscription': '0',
+                        'message-id': '1'
+                    }, body))
+
+    def disconnect(self):
+        """Close the connections of all clients."""
+        with self.lock:
+            for _, sock in self.subscribers:
+                # closing alone doesn't wake the handler blocked reading it
+                sock.shutdown(socket.SHUT_RDWR)
+                sock.close()
+            self.subscribers = []
@@ -0,0 +1,195 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for async_runner module."""
+import os
+import signal
+import sys
+import threading
+import time
+import unittest
+
+import mock
+from defusedxml.ElementTree import fromstring
+
+from benchmarks.fakes import FakeTransport
+from skt.async_runner import AsyncBeakerRunner
+from skt.misc import SKT_ERROR, SKT_FAIL, SKT_SUCCESS
+from skt.runner import BeakerRunner
+from tests import misc
+
+
+class TestAsyncBeakerRunner(unittest.TestCase):
+    """Test cases for AsyncBeakerRunner."""
+
+    def run_both(self, job, max_aborted=3):
+        """Run the job with BeakerRunner and AsyncBeakerRunner.
+
+        Args:
+            job:         xml root of the job results
+            max_aborted: maximum number of allowed aborted recipe sets
+        Returns:
+            list of (retcode, transport) tuples
+        """
+        results = []
+        for runner_class in [BeakerRunner, AsyncBeakerRunner]:
+            transport = FakeTransport(job)
+            myrunner = runner_class(transport=transport, **misc.DEFAULT_ARGS)
+            myrunner.watchdelay = 0.01
+            myrunner.poll_workers = 4
+            retcode = myrunner.run('http://example.com/kernel.tar.gz',
+                                   max_aborted, '4.17.0-rc1', True)
+            results.append((retcode, transport))
+
+        return results
+
+    def test_run_wait(self):
+        """Ensure AsyncBeakerRunner gives the same results as BeakerRunner."""
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_fail_results.xml',
+                             'beaker_recipe_set_panic_results.xml')
+
+        results = self.run_both(job)
+        sync_ret = results[0][0]
+        async_ret = results[1][0]
+        self.assertEqual(sync_ret, SKT_FAIL)
+        self.assertEqual(async_ret, sync_ret)
+
+    def test_resubmit(self):
+        """Ensure recipe sets with infrastructure issues are resubmitted."""
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_infra_results.xml',
+                             'beaker_recipe_set_infra_results.xml')
+
+        results = self.run_both(job)
+        for retcode, transport in results:
+            self.assertEqual(retcode, SKT_SUCCESS)
+            # the initial job and one job with both resubmitted recipe sets
+            self.assertEqual(len(transport.submitted), 2)
+            self.assertEqual(
+                len(fromstring(transport.submitted[1]).findall('recipeSet')),
+                2
+            )
+
+    def test_max_aborted(self):
+        """Ensure the jobs are cancelled when too many recipe sets abort."""
+        job = misc.build_job('beaker_recipe_set_infra_results.xml',
+                             'beaker_recipe_set_infra_results.xml',
+                             'beaker_recipe_set_infra_results.xml')
+
+        results = self.run_both(job, max_aborted=1)
+        for retcode, transport in results:
+            self.assertEqual(retcode, SKT_ERROR)
+            self.assertEqual(len(transport.submitted), 1)
+
+    def test_stream_results(self):
+        """Ensure results are spooled and parsed incrementally when
+        streaming."""
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_fail_results.xml')
+        transport = misc.SpoolingTransport(job)
+        myrunner = AsyncBeakerRunner(transport=transport,
+                                     **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+        myrunner.stream_results = True
+
+        retcode = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                               '4.17.0-rc1', True)
+
+        self.assertEqual(retcode, SKT_FAIL)
+        self.assertTrue(transport.spooled)
+        self.assertEqual(transport.spooled, transport.calls)
+
+    def test_fail_fast_cancel(self):
+        """Ensure the run stops and cancels the jobs once the result is
+        decided."""
+        job = misc.build_job('beaker_recipe_set_panic_results.xml',
+                             'beaker_recipe_set_results.xml')
+        job.find('recipeSet[@id="2"]/recipe').attrib.update(
+            {'status': 'Running', 'result': 'New'}
+        )
+        transport = FakeTransport(job)
+        myrunner = AsyncBeakerRunner(transport=transport,
+                                     **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+        myrunner.fail_fast = SKT_FAIL
+        myrunner.fail_fast_cancel = True
+
+        retcode = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                               '4.17.0-rc1', True)
+
+        self.assertEqual(retcode, SKT_FAIL)
+        self.assertEqual(transport.cancelled, ['J:1'])
+
+    def test_cancel_deadline_sync_transport(self):
+        """Ensure late fetches of transports without asynchronous calls don't
+        outlive the cancel deadline."""
+        fake = FakeTransport()
+
+        class SyncTransport:
+            """Transport without asynchronous calls and slow results."""
+            # pylint: disable=too-few-public-methods
+            calls = fake.calls
+            cancelled = fake.cancelled
+            job_submit = fake.job_submit
+            job_cancel = fake.job_cancel
+
+            @staticmethod
+            def job_results(taskspec):
+                """Take longer than the deadline for RS:20."""
+                if taskspec == 'RS:20':
+                    time.sleep(1)
+                return fake.job_results(taskspec)
+
+        transport = SyncTransport()
+        myrunner = AsyncBeakerRunner(transport=transport,
+                                     **misc.DEFAULT_ARGS)
+        myrunner.cancel_deadline = 0.05
+        myrunner.watch_jobs(*[
+            fake.job_submit(misc.get_asset_content('test.xml'))
+            for _ in range(2)
+        ])
+
+        start = time.monotonic()
+        myrunner.cancel_pending_jobs()
+
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(myrunner.job_to_recipe_set_map, {'J:1': {'RS:10'}})
+        self.assertEqual(sorted(fake.cancelled), ['J:1', 'J:2'])
+
+    def test_sigterm(self):
+        """Ensure a SIGTERM handler runs while waiting and its SystemExit
+        stops the runner."""
+        job = misc.build_job('beaker_recipe_set_results.xml')
+        myrunner = AsyncBeakerRunner(transport=FakeTransport(job),
+                                     **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 10
+        handler = mock.Mock(side_effect=lambda *args: sys.exit(SKT_ERROR))
+
+        # signal the runner while it waits for the next poll
+        timer = threading.Timer(0.2, os.kill, (os.getpid(), signal.SIGTERM))
+
+        previous = signal.signal(signal.SIGTERM, handler)
+        try:
+            timer.start()
+            start = time.monotonic()
+            with self.assertRaises(SystemExit):
+                myrunner.run('http://example.com/kernel.tar.gz', 3,
+                             '4.17.0-rc1', True)
+        finally:
+            timer.join()
+            signal.signal(signal.SIGTERM, previous)
+
+        handler.assert_called_once()
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(myrunner.job_to_recipe_set_map, {'J:1': {'RS:1'}})
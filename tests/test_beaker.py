@@ -0,0 +1,180 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for beaker module."""
+import os
+import tempfile
+import unittest
+
+import mock
+from defusedxml.ElementTree import fromstring
+from defusedxml.ElementTree import tostring
+
+from benchmarks.fakes import BeakerServer
+from skt import beaker
+from skt import metrics
+from skt.runner import BeakerRunner
+from tests import misc
+
+
+class TestHTTPTransport(unittest.TestCase):
+    """Test cases for HTTPTransport."""
+
+    def setUp(self):
+        job = misc.build_job('beaker_recipe_set_results.xml')
+        self.server = BeakerServer({
+            'J:1': tostring(job).decode(),
+            'RS:1': tostring(job.find('recipeSet')).decode()
+        }).start()
+        self.transport = beaker.HTTPTransport(self.server.url, 'user',
+                                              'secret')
+
+    def tearDown(self):
+        self.server.stop_serving()
+
+    def test_job_results(self):
+        """Ensure job_results() returns the results XML."""
+        result = fromstring(self.transport.job_results('J:1'))
+        self.assertEqual(result.tag, 'job')
+
+    def test_job_results_fail(self):
+        """Ensure job_results() raises RuntimeError on failure."""
+        with self.assertRaises(RuntimeError):
+            self.transport.job_results('J:2')
+
+    def test_session_reused(self):
+        """Ensure all calls share one login and one connection."""
+        for _ in range(5):
+            self.transport.job_results('J:1')
+        self.transport.job_cancel('J:1')
+
+        self.assertEqual(self.server.logins, [('user', 'secret', None)])
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.cancelled[0][:2], ('J:1', 'cancel'))
+
+    def test_job_cancel_many(self):
+        """Ensure job_cancel_many() cancels all jobs."""
+        self.assertTrue(self.transport.job_cancel_many(['J:1', 'J:2']))
+
+        self.assertEqual(sorted(call[0] for call in self.server.cancelled),
+                         ['J:1', 'J:2'])
+
+    def test_job_submit_owner(self):
+        """Ensure job_submit() sets the job owner like bkr does."""
+        jobid = self.transport.job_submit(b'<job><whiteboard/></job>',
+                                          'owner')
+
+        self.assertEqual(jobid, 'J:1')
+        submitted = fromstring(self.server.submitted[0])
+        self.assertEqual(submitted.attrib['user'], 'owner')
+
+    def test_runner_run(self):
+        """Ensure BeakerRunner submits and watches jobs over HTTP."""
+        myrunner = BeakerRunner(transport=self.transport, **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+
+        with mock.patch('skt.runner.BeakerRunner.get_recipset_group',
+                        lambda sself, taskspec: 'cki'):
+            result = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                                  '4.17.0-rc1', True)
+
+        self.assertEqual(result, 0)
+        self.assertEqual(len(self.server.submitted), 1)
+
+    def test_from_client_config(self):
+        """Ensure the transport is configured from the bkr client config."""
+        with tempfile.NamedTemporaryFile('w') as config:
+            config.write('HUB_URL = "{}"\n# comment\nAUTH_METHOD = "password"'
+                         '\nUSERNAME = "user"\nPASSWORD = "pass"\n'
+                         .format(self.server.url))
+            config.flush()
+
+            with mock.patch.dict(os.environ,
+                                 {'BEAKER_CLIENT_CONF': config.name}):
+                transport = beaker.get_transport('http')
+
+        self.assertEqual(transport.hub_url, self.server.url)
+        self.assertEqual(transport.username, 'user')
+        self.assertEqual(transport.password, 'pass')
+
+
+class TestBkrTransport(unittest.TestCase):
+    """Test cases for BkrTransport."""
+
+    @mock.patch('subprocess.Popen')
+    def test_job_cancel_fail(self, mock_popen):
+        """Ensure job_cancel() reports failures."""
+        mock_popen.return_value.returncode = 1
+        mock_popen.return_value.communicate.return_value = ('', 'error')
+
+        self.assertFalse(beaker.BkrTransport().job_cancel('J:1'))
+        mock_popen.assert_called_with(['bkr', 'job-cancel', 'J:1'])
+
+    @mock.patch('subprocess.Popen')
+    def test_job_cancel_many(self, mock_popen):
+        """Ensure job_cancel_many() cancels all jobs with one bkr call."""
+        mock_popen.return_value.returncode = 0
+        mock_popen.return_value.communicate.return_value = ('', '')
+
+        self.assertTrue(beaker.BkrTransport().job_cancel_many(['J:1',
+                                                               'J:2']))
+        mock_popen.assert_called_once_with(['bkr', 'job-cancel', 'J:1',
+                                            'J:2'])
+
+    @mock.patch('time.sleep')
+    @mock.patch('subprocess.Popen')
+    def test_spool_job_results(self, mock_popen, mock_sleep):
+        """Ensure spool_job_results() writes the results to a file and
+        retries on known errors."""
+        stderrs = [b'503 Service Unavailable', b'']
+
+        def fake_popen(args, stdout, stderr):
+            # pylint: disable=unused-argument
+            stdout.write(b'<job/>')
+            mock_popen.return_value.returncode = 0
+            mock_popen.return_value.communicate.return_value = \
+                (None, stderrs.pop(0))
+            return mock_popen.return_value
+
+        mock_popen.side_effect = fake_popen
+
+        with beaker.BkrTransport.spool_job_results('J:1') as spool:
+            self.assertEqual(spool.read(), b'<job/>')
+
+        self.assertEqual(mock_popen.call_count, 2)
+        mock_sleep.assert_called_once()
+
+    @mock.patch('time.sleep')
+    @mock.patch('subprocess.Popen')
+    def test_retries_counted(self, mock_popen, mock_sleep):
+        """Ensure job_results() and job_submit() retry on known errors and
+        count the retries."""
+        mock_popen.return_value.returncode = 0
+        mock_popen.return_value.communicate.side_effect = [
+            ('', '503 Service Unavailable'), ('<job/>', ''),
+            ('', "Can't connect to MySQL server on db"),
+            ("Submitted: ['J:1']", ''),
+        ]
+        registry = metrics.enable()
+        try:
+            self.assertEqual(beaker.BkrTransport.job_results('J:1'),
+                             '<job/>')
+            self.assertEqual(beaker.BkrTransport.job_submit('<job/>'), 'J:1')
+        finally:
+            metrics.disable()
+
+        self.assertEqual(mock_popen.call_count, 4)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(registry.metrics['skt_beaker_retries_total'].values,
+                         {(('command', 'job-results'),): 1,
+                          (('command', 'job-submit'),): 1})
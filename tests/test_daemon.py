@@ -0,0 +1,224 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for daemon module."""
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+import unittest
+
+from benchmarks.fakes import FakeTransport
+from skt.daemon import DaemonClient, DaemonServer, WatchDaemon
+from skt.misc import SKT_ERROR, SKT_FAIL, SKT_SUCCESS
+from skt.runner import BeakerRunner
+from tests import misc
+
+
+class TestWatchDaemon(unittest.TestCase):
+    """Test cases for WatchDaemon."""
+
+    def setUp(self):
+        self.request = {'jobtemplate': misc.DEFAULT_ARGS['jobtemplate'],
+                        'max_aborted': 3, 'wait': True}
+
+    @staticmethod
+    def run_alone(job):
+        """Run the job with BeakerRunner, return the result."""
+        myrunner = BeakerRunner(transport=FakeTransport(job),
+                                **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+        return myrunner.run('http://example.com/kernel.tar.gz', 3,
+                            '4.17.0-rc1', True)
+
+    @staticmethod
+    def poll_until_done(daemon, watches):
+        """Poll until all runs are done, return the last message of each."""
+        for _ in range(20):
+            if not daemon.watches:
+                break
+            daemon.poll()
+
+        messages = []
+        for watch in watches:
+            message = watch.updates.get_nowait()
+            while not message['done']:
+                message = watch.updates.get_nowait()
+            messages.append(message)
+
+        return messages
+
+    def test_shared_poll(self):
+        """Ensure runs watched together get the results of separate runs."""
+        fail_job = misc.build_job('beaker_recipe_set_results.xml',
+                                  'beaker_recipe_set_fail_results.xml')
+        transport = FakeTransport(fail_job)
+        daemon = WatchDaemon(transport, poll_workers=4)
+        watches = [daemon.start_run(self.request),
+                   daemon.start_run(self.request)]
+        self.assertEqual(len(daemon.watches), 2)
+
+        transport.calls.clear()
+        daemon.poll()
+        # a single poll fetched the recipe sets of both jobs
+        self.assertIn('RS:20', transport.calls)
+        self.assertTrue(set(transport.calls) & {'J:1', 'RS:1', 'RS:2'})
+
+        messages = self.poll_until_done(daemon, watches)
+        fail_message = messages[0]
+        pass_message = messages[1]
+        self.assertEqual(fail_message['retcode'], self.run_alone(fail_job))
+        self.assertEqual(fail_message['retcode'], SKT_FAIL)
+        self.assertEqual(pass_message['retcode'], SKT_SUCCESS)
+        self.assertEqual(fail_message['jobs'], {'J:1': ['RS:1', 'RS:2']})
+        self.assertEqual(pass_message['jobs'], {'J:2': ['RS:20']})
+
+    def test_resubmit(self):
+        """Ensure recipe sets with infrastructure issues are resubmitted."""
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_infra_results.xml')
+        transport = FakeTransport(job)
+        daemon = WatchDaemon(transport)
+        watch = daemon.start_run(self.request)
+
+        message = self.poll_until_done(daemon, [watch])[0]
+        self.assertEqual(message['retcode'], SKT_SUCCESS)
+        self.assertEqual(len(transport.submitted), 2)
+        self.assertEqual(sorted(message['jobs']), ['J:1', 'J:2'])
+        self.assertEqual(message['aborted_count'], 1)
+
+    def test_stream_results(self):
+        """Ensure runs streaming results have them spooled."""
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_fail_results.xml')
+        transport = misc.SpoolingTransport(job)
+        daemon = WatchDaemon(transport)
+        watch = daemon.start_run(dict(self.request, stream_results=True))
+
+        message = self.poll_until_done(daemon, [watch])[0]
+        self.assertEqual(message['retcode'], SKT_FAIL)
+        self.assertTrue(transport.spooled)
+        self.assertEqual(transport.spooled, transport.calls)
+
+    def test_fail_fast(self):
+        """Ensure runs failing fast are done once the result is decided."""
+        job = misc.build_job('beaker_recipe_set_fail_results.xml',
+                             'beaker_recipe_set_results.xml')
+        job.find('recipeSet[@id="2"]/recipe').attrib.update(
+            {'status': 'Running', 'result': 'New'}
+        )
+        transport = FakeTransport(job)
+        daemon = WatchDaemon(transport)
+        watch = daemon.start_run(dict(self.request, fail_fast=SKT_FAIL,
+                                      fail_fast_cancel=True))
+
+        message = self.poll_until_done(daemon, [watch])[0]
+        self.assertEqual(message['retcode'], SKT_FAIL)
+        self.assertEqual(transport.cancelled, ['J:1'])
+
+    def test_no_wait(self):
+        """Ensure runs not waiting are done once the job is submitted."""
+        daemon = WatchDaemon(FakeTransport())
+        watch = daemon.start_run(dict(self.request, wait=False))
+
+        self.assertEqual(daemon.watches, [])
+        # like BeakerRunner, the job isn't recorded when not waiting
+        self.assertEqual(watch.updates.get_nowait(),
+                         {'jobs': {}, 'completed_recipes': [],
+                          'aborted_count': 0, 'resubmit_queue': [],
+                          'done': True, 'retcode': SKT_SUCCESS})
+
+    def test_fetch_error(self):
+        """Ensure a run fails if its results can't be fetched."""
+        transport = FakeTransport()
+        daemon = WatchDaemon(transport)
+        watch = daemon.start_run(self.request)
+        transport.jobs.clear()
+
+        message = self.poll_until_done(daemon, [watch])[0]
+        self.assertEqual(message['retcode'], SKT_ERROR)
+        self.assertEqual(daemon.watches, [])
+
+
+class TestDaemonServer(unittest.TestCase):
+    """Test cases for DaemonServer and DaemonClient."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmpdir, 'skt.sock')
+        self.daemon = WatchDaemon(FakeTransport(
+            misc.build_job('beaker_recipe_set_fail_results.xml')
+        ), watchdelay=0.01)
+        self.server = DaemonServer(self.socket_path, self.daemon)
+        self.threads = [
+            threading.Thread(target=self.server.serve_forever),
+            threading.Thread(target=self.daemon.serve_polls)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def tearDown(self):
+        self.daemon.stop()
+        self.server.shutdown()
+        for thread in self.threads:
+            thread.join()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def run_client(self, results):
+        """Run a client, add it to results."""
+        client = DaemonClient(self.socket_path,
+                              misc.DEFAULT_ARGS['jobtemplate'])
+        client.run('http://example.com/kernel.tar.gz', 3, '4.17.0-rc1', True)
+        results.append(client)
+
+    def test_concurrent_clients(self):
+        """Ensure concurrent clients get the results of their own jobs."""
+        results = []
+        clients = [threading.Thread(target=self.run_client, args=(results,))
+                   for _ in range(2)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+
+        self.assertEqual(
+            sorted((client.retcode, sorted(client.job_to_recipe_set_map))
+                   for client in results),
+            [(SKT_SUCCESS, ['J:2']), (SKT_FAIL, ['J:1'])]
+        )
+        for client in results:
+            self.assertTrue(client.completed_recipes[None])
+
+    def test_socket_permissions(self):
+        """Ensure only the user running the daemon can use the socket."""
+        mode = stat.S_IMODE(os.stat(self.socket_path).st_mode)
+        self.assertEqual(mode & 0o077, 0)
+
+    def test_invalid_request(self):
+        """Ensure invalid requests are refused."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.socket_path)
+            sock.sendall(b'{"wait": true}\n')
+            with sock.makefile('rb') as messages:
+                self.assertIn(b'"retcode": 2', messages.readline())
+
+    def test_no_daemon(self):
+        """Ensure the run fails if the daemon can't be reached."""
+        client = DaemonClient(os.path.join(self.tmpdir, 'missing.sock'),
+                              misc.DEFAULT_ARGS['jobtemplate'])
+        retcode = client.run('http://example.com/kernel.tar.gz', 3,
+                             '4.17.0-rc1', True)
+        self.assertEqual(retcode, SKT_ERROR)
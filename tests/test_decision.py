@@ -0,0 +1,95 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for decision module."""
+import itertools
+import json
+import tempfile
+import unittest
+
+from defusedxml.ElementTree import fromstring
+
+from skt.decision import DecisionTable, TaskFeatures, load_condition_checks
+from skt.decision import result_condition_checks
+from skt.misc import SKT_FAIL, SKT_SUCCESS, is_task_waived
+from skt.model import RecipeRecord, TaskRecord
+from skt.runner import BeakerRunner, ConditionCheck
+from tests import misc
+
+
+class TestDecisionTable(unittest.TestCase):
+    """Test cases for DecisionTable."""
+
+    def test_lookup(self):
+        """Ensure the table finds the same check as trying all of them."""
+        table = DecisionTable(result_condition_checks)
+        for features in itertools.product(
+                ['Pass', 'Warn', 'Fail', 'Panic', 'Skip', None],
+                ['Completed', 'Aborted', 'Cancelled', 'Running'],
+                [False, True], [False, True]):
+            features = TaskFeatures(*features)
+            expected = next((check for check in result_condition_checks
+                             if check.matches(features)), None)
+            self.assertIs(table.lookup(features), expected)
+
+    def test_runner_condition_check(self):
+        """Ensure skt.runner.ConditionCheck still takes task nodes."""
+        check = ConditionCheck(SKT_SUCCESS, result='Warn', status='Aborted',
+                               prev_task_panicked_and_waived=True)
+        prev_task = fromstring(
+            '<task result="Panic" status="Completed"><params>'
+            '<param name="CKI_WAIVED" value="true"/></params></task>'
+        )
+        task = fromstring('<task result="Warn" status="Aborted"/>')
+
+        self.assertEqual(check(task, is_task_waived, prev_task), SKT_SUCCESS)
+        self.assertIsNone(check(task, is_task_waived, None))
+        self.assertIsNone(check(prev_task, is_task_waived, task))
+
+    def test_load_condition_checks(self):
+        """Ensure rules are loaded from a file and change the verdicts."""
+        rules = [{'retval': 'SKT_SUCCESS', 'result': 'Fail',
+                  'status': 'Completed', 'waived': False}]
+        with tempfile.NamedTemporaryFile('w') as rules_file:
+            json.dump(rules, rules_file)
+            rules_file.flush()
+            checks = load_condition_checks(rules_file.name)
+
+        self.assertEqual(checks[0].retval, SKT_SUCCESS)
+        self.assertEqual(checks[0].kwargs, {'result': 'Fail',
+                                            'status': 'Completed',
+                                            'waived': False})
+
+        recipe = RecipeRecord('1', 'host', 'Completed', 'Fail', (
+            TaskRecord('/test', 'Fail', 'Completed'),
+        ))
+        runner = BeakerRunner(**misc.DEFAULT_ARGS)
+        self.assertEqual(runner.decide_run_result_by_task(recipe, 'R:1')[0],
+                         SKT_FAIL)
+
+        runner.decision_table = DecisionTable(checks +
+                                              result_condition_checks)
+        self.assertEqual(runner.decide_run_result_by_task(recipe, 'R:1')[0],
+                         SKT_SUCCESS)
+
+    def test_load_condition_checks_invalid(self):
+        """Ensure invalid rules are rejected."""
+        for rule in [{'retval': 'SKT_NOPE', 'result': 'Fail'},
+                     {'retval': 'SKT_FAIL', 'color': 'red'},
+                     {'retval': 'SKT_FAIL', 'waived': 'yes'},
+                     {'retval': 'SKT_FAIL', 'result': ['Fail']}]:
+            with tempfile.NamedTemporaryFile('w') as rules_file:
+                json.dump([rule], rules_file)
+                rules_file.flush()
+                with self.assertRaises(ValueError):
+                    load_condition_checks(rules_file.name)
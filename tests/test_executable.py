@@ -14,7 +14,10 @@
 """Test cases for runner module."""
 import logging
 import os
+import shutil
 import signal
+import stat
+import tempfile
 import threading
 import time
 import unittest
@@ -42,6 +45,10 @@ class TestExecutable(unittest.TestCase):
 
     def setUp(self) -> None:
         self.myrunner = BeakerRunner(**misc.DEFAULT_ARGS)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmpdir)
 
     def test_full_path_relative(self):
         """Verify that full_path() expands a relative path."""
@@ -57,6 +64,74 @@ class TestExecutable(unittest.TestCase):
         expected_path = "{}/{}".format(os.path.expanduser('~'), filename)
         self.assertEqual(expected_path, result)
 
+    def test_save_state_replace(self):
+        """Ensure save_state() replaces the rc-file at once, keeping its
+        mode, and leaves it untouched if that fails."""
+        rc_path = os.path.join(self.tmpdir, 'rc')
+        with open(rc_path, 'w') as fhandle:
+            fhandle.write(RC_EXAMPLE)
+        os.chmod(rc_path, 0o640)
+        skt_data = SKTData.deserialize(RC_EXAMPLE)
+        skt_data.state.rc = rc_path
+        self.myrunner.job_to_recipe_set_map = {'J:1': {'RS:1'}}
+
+        with mock.patch('os.replace', side_effect=OSError):
+            with self.assertRaises(OSError):
+                executable.save_state(skt_data, self.myrunner)
+        with open(rc_path) as fhandle:
+            self.assertEqual(fhandle.read(), RC_EXAMPLE)
+        self.assertEqual(os.listdir(self.tmpdir), ['rc'])
+
+        executable.save_state(skt_data, self.myrunner)
+        with open(rc_path) as fhandle:
+            self.assertEqual(fhandle.read(), skt_data.serialize())
+        self.assertEqual(stat.S_IMODE(os.stat(rc_path).st_mode), 0o640)
+        self.assertEqual(os.listdir(self.tmpdir), ['rc'])
+
+    def test_save_state_resubmit_queue(self):
+        """Ensure save_state() saves the recipe sets queued for
+        resubmission, so resuming doesn't lose them."""
+        skt_data = SKTData.deserialize(RC_EXAMPLE)
+        skt_data.state.rc = os.path.join(self.tmpdir, 'rc')
+        self.myrunner.job_to_recipe_set_map = {'J:1': {'RS:1'}}
+
+        with mock.patch.object(self.myrunner, 'queued_resubmissions',
+                               return_value=['RS:2', 'RS:3']):
+            executable.save_state(skt_data, self.myrunner)
+
+        self.assertEqual(skt_data.state.resubmit_queue, 'RS:2 RS:3')
+
+    def test_check_arguments_daemon_socket(self):
+        """Ensure options the daemon doesn't support are rejected with
+        --daemon-socket."""
+        parser = executable.setup_parser()
+        args = parser.parse_args(['--rc', 'rc', 'run', '--daemon-socket',
+                                  'sock', '--wait'])
+        executable.check_arguments(parser, args)
+
+        for option in (['--adaptive-polling'], ['--async'],
+                       ['--notifications', 'file:///events.jsonl']):
+            args = parser.parse_args(['--rc', 'rc', 'run', '--daemon-socket',
+                                      'sock'] + option)
+            with mock.patch('sys.stderr'):
+                with self.assertRaises(SystemExit):
+                    executable.check_arguments(parser, args)
+
+    def test_check_arguments_notifications(self):
+        """Ensure unsupported notification URLs are rejected."""
+        parser = executable.setup_parser()
+        args = parser.parse_args(['--rc', 'rc', 'run', '--notifications',
+                                  'file:///events.jsonl'])
+        executable.check_arguments(parser, args)
+
+        for url in ['http://example.com/events', 'stomp://broker',
+                    'stomp://broker:port/topic/beaker']:
+            args = parser.parse_args(['--rc', 'rc', 'resume',
+                                      '--notifications', url])
+            with mock.patch('sys.stderr'):
+                with self.assertRaises(SystemExit):
+                    executable.check_arguments(parser, args)
+
     def test_setup_logging(self):
         """Ensure that setup_logging works and sets-up to what we expect."""
         verbose = False
@@ -75,7 +150,7 @@ class TestExecutable(unittest.TestCase):
         self.assertEqual(current_logger.getEffectiveLevel(), logging.WARNING -
                          (verbose * 10))
 
-    @mock.patch('skt.executable.BeakerRunner')
+    @mock.patch('skt.runner.BeakerRunner')
     @mock.patch('builtins.open', create=True)
     @mock.patch('subprocess.Popen')
     @mock.patch('logging.error')
@@ -98,6 +173,7 @@ class TestExecutable(unittest.TestCase):
             thread.start()
             # it's fine to call this directly, no need to mock
             skt_data = SKTData.deserialize(RC_EXAMPLE)
+            skt_data.state.rc = os.path.join(self.tmpdir, 'rc')
 
             executable.cmd_run(skt_data)
             thread.join()
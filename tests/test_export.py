@@ -0,0 +1,103 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for export module."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.fakes import FakeTransport
+from skt.async_runner import AsyncBeakerRunner
+from skt.export import ResultExporter
+from skt.misc import SKT_FAIL
+from skt.runner import BeakerRunner
+from tests import misc
+
+
+class TestExport(unittest.TestCase):
+    """Test cases for the export of recipe results."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'results.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read_records(self):
+        """Read the exported records."""
+        with open(self.path) as fileh:
+            return [json.loads(line) for line in fileh]
+
+    def check_run_exported(self, runner_class):
+        """Ensure every finished recipe of a run is exported once."""
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_fail_results.xml')
+        myrunner = runner_class(transport=FakeTransport(job),
+                                **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+        myrunner.result_export = ResultExporter(self.path)
+
+        retcode = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                               '4.17.0-rc1', True)
+
+        self.assertEqual(retcode, SKT_FAIL)
+        records = {record['recipe']: record
+                   for record in self.read_records()}
+        self.assertEqual(sorted(records), ['R:1', 'R:2'])
+        # the exported verdicts are the ones the result was decided by
+        for record in records.values():
+            _, retcode, message = myrunner.verdicts.lookup(
+                record['recipe_set'], record['recipe']
+            )
+            self.assertEqual((record['retcode'], record['message']),
+                             (retcode, message))
+
+        self.assertEqual(records['R:1']['verdict'], 'pass')
+        self.assertEqual(records['R:1']['recipe_set'], 'RS:1')
+        self.assertEqual(records['R:1']['job'], 'J:1')
+
+        failed = records['R:2']
+        self.assertEqual(failed['recipe_set'], 'RS:2')
+        self.assertEqual(failed['system'], 'machine.beaker.org')
+        self.assertEqual((failed['status'], failed['result']),
+                         ('Completed', 'Fail'))
+        self.assertEqual((failed['verdict'], failed['retcode']),
+                         ('fail', SKT_FAIL))
+        self.assertIn('recipeid R:2', failed['message'])
+        self.assertEqual(failed['tests'], [
+            '/distribution/kpkginstall', '/a/failed/waived/test',
+            '/a/passed/waived/test', '/a/test/with/no/waive'
+        ])
+        self.assertEqual(failed['waived_failures'],
+                         ['/a/failed/waived/test'])
+
+    def test_run_exported(self):
+        """Ensure recipes are exported as they finish."""
+        self.check_run_exported(BeakerRunner)
+
+    def test_async_run_exported(self):
+        """Ensure recipes of asynchronous runs are exported."""
+        self.check_run_exported(AsyncBeakerRunner)
+
+    def test_append(self):
+        """Ensure records are appended to existing files."""
+        with open(self.path, 'w') as fileh:
+            fileh.write('{"recipe": "R:0"}\n')
+
+        ResultExporter(self.path).write({'recipe': 'R:1'})
+
+        self.assertEqual(self.read_records(),
+                         [{'recipe': 'R:0'}, {'recipe': 'R:1'}])
@@ -0,0 +1,150 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for stopping a run early and cancelling its jobs."""
+import time
+import unittest
+
+import mock
+
+from benchmarks.fakes import FakeTransport
+from skt.misc import SKT_ERROR, SKT_FAIL
+from skt.runner import BeakerRunner
+from tests import misc
+
+
+class TestFailFast(unittest.TestCase):
+    """Test cases for failing fast and cancelling the remaining jobs."""
+
+    def fail_fast_job(self):
+        """Build a job with a failed recipe set, a passed one and one still
+        running."""
+        job = misc.build_job('beaker_recipe_set_fail_results.xml',
+                             'beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_results.xml')
+        job.find('recipeSet[@id="3"]/recipe').attrib.update(
+            {'status': 'Running', 'result': 'New'}
+        )
+        return job
+
+    def test_fail_fast(self):
+        """Ensure the run stops once the result is decided, leaving the
+        remaining jobs running."""
+        transport = FakeTransport(self.fail_fast_job())
+        myrunner = BeakerRunner(transport=transport, **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+        myrunner.fail_fast = SKT_FAIL
+
+        result = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                              '4.17.0-rc1', True)
+
+        self.assertEqual(result, SKT_FAIL)
+        self.assertEqual(myrunner.watchlist, {'RS:3'})
+        self.assertEqual(transport.cancelled, [])
+
+    def test_fail_fast_cancel(self):
+        """Ensure the remaining jobs are cancelled when failing fast if
+        requested."""
+        transport = FakeTransport(self.fail_fast_job())
+        myrunner = BeakerRunner(transport=transport, **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+        myrunner.fail_fast = SKT_FAIL
+        myrunner.fail_fast_cancel = True
+
+        result = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                              '4.17.0-rc1', True)
+
+        self.assertEqual(result, SKT_FAIL)
+        self.assertEqual(transport.cancelled, ['J:1'])
+
+    def test_fail_fast_severity(self):
+        """Ensure less severe results don't stop the run."""
+        transport = FakeTransport(misc.build_job(
+            'beaker_recipe_set_fail_results.xml',
+            'beaker_recipe_set_results.xml'
+        ))
+        myrunner = BeakerRunner(transport=transport, **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+        myrunner.fail_fast = SKT_ERROR
+
+        result = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                              '4.17.0-rc1', True)
+
+        self.assertEqual(result, SKT_FAIL)
+        self.assertIsNone(myrunner.decided_retcode)
+
+    def test_cancel_pending_jobs_stream(self):
+        """Ensure results refreshed before cancelling are spooled when
+        streaming."""
+        transport = misc.SpoolingTransport()
+        myrunner = BeakerRunner(transport=transport, **misc.DEFAULT_ARGS)
+        myrunner.stream_results = True
+        myrunner.watch_jobs(*[
+            transport.job_submit(misc.get_asset_content('test.xml'))
+            for _ in range(2)
+        ])
+        transport.calls.clear()
+        transport.spooled.clear()
+
+        myrunner.cancel_pending_jobs()
+
+        # fetched in parallel, in any order
+        self.assertCountEqual(transport.spooled, ['RS:10', 'RS:20'])
+        self.assertCountEqual(transport.calls, ['RS:10', 'RS:20'])
+        self.assertEqual(myrunner.job_to_recipe_set_map,
+                         {'J:1': {'RS:10'}, 'J:2': {'RS:20'}})
+        self.assertEqual(sorted(transport.cancelled), ['J:1', 'J:2'])
+
+    def test_cancel_pending_jobs_deadline(self):
+        """Ensure only unfetched recipe sets are refreshed before cancelling,
+        and only until the deadline."""
+        transport = FakeTransport()
+        myrunner = BeakerRunner(transport=transport, **misc.DEFAULT_ARGS)
+        myrunner.cancel_deadline = 0.05
+        myrunner.watch_jobs(*[
+            transport.job_submit(misc.get_asset_content('test.xml'))
+            for _ in range(3)
+        ])
+        myrunner.getresultstree('RS:10')
+        transport.calls.clear()
+
+        job_results = transport.job_results
+
+        def slow_job_results(taskspec):
+            if taskspec == 'RS:30':
+                time.sleep(0.5)
+            return job_results(taskspec)
+
+        job_cancel = transport.job_cancel
+
+        def check_job_cancel(job_id):
+            # the verdict is decided by results fetched before cancelling
+            self.assertIn('RS:20', transport.calls)
+            return job_cancel(job_id)
+
+        with mock.patch.object(transport, 'job_results', slow_job_results), \
+                mock.patch.object(transport, 'job_cancel', check_job_cancel):
+            start = time.monotonic()
+            myrunner.cancel_pending_jobs()
+            self.assertLess(time.monotonic() - start, 0.4)
+            # let the late fetch finish
+            time.sleep(0.6)
+
+        self.assertNotIn('RS:10', transport.calls)
+        self.assertIn('RS:20', transport.calls)
+        # RS:30 had no results by the deadline, and they are dropped
+        self.assertEqual(myrunner.job_to_recipe_set_map,
+                         {'J:1': {'RS:10'}, 'J:2': {'RS:20'}})
+        self.assertNotIn('RS:30', myrunner.recipe_set_results)
+        self.assertNotIn('RS:30', myrunner.result_digests)
+        self.assertEqual(sorted(transport.cancelled), ['J:1', 'J:2', 'J:3'])
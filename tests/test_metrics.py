@@ -0,0 +1,155 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for metrics module."""
+import asyncio
+import os
+import tempfile
+import unittest
+import urllib.request
+
+from benchmarks.fakes import FakeTransport
+from skt import metrics
+from skt.misc import SKT_FAIL, SKT_SUCCESS
+from skt.runner import BeakerRunner
+from tests import misc
+
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for the metrics registry and exporters."""
+
+    def setUp(self):
+        metrics.disable()
+
+    def tearDown(self):
+        metrics.disable()
+
+    def test_disabled(self):
+        """Ensure nothing is recorded or wrapped while disabled."""
+        transport = FakeTransport()
+        metrics.inc('skt_resubmissions_total')
+        metrics.observe('skt_sweep_duration_seconds', 1)
+
+        self.assertIsNone(metrics.REGISTRY)
+        self.assertIs(metrics.instrument(transport), transport)
+
+    def test_render(self):
+        """Ensure metrics are rendered in the Prometheus text format."""
+        registry = metrics.enable()
+        metrics.inc('skt_aborts_total', reason='infrastructure')
+        metrics.inc('skt_aborts_total', reason='infrastructure')
+        metrics.set_gauge('skt_watchlist_size', 3)
+        metrics.observe('skt_sweep_duration_seconds', 0.3)
+        metrics.observe('skt_sweep_duration_seconds', 1000)
+
+        lines = registry.render().splitlines()
+
+        self.assertIn('# TYPE skt_aborts_total counter', lines)
+        self.assertIn('skt_aborts_total{reason="infrastructure"} 2', lines)
+        self.assertIn('skt_watchlist_size 3', lines)
+        self.assertIn('skt_sweep_duration_seconds_bucket{le="0.25"} 0',
+                      lines)
+        self.assertIn('skt_sweep_duration_seconds_bucket{le="0.5"} 1', lines)
+        self.assertIn('skt_sweep_duration_seconds_bucket{le="+Inf"} 2',
+                      lines)
+        self.assertIn('skt_sweep_duration_seconds_sum 1000.3', lines)
+        self.assertIn('skt_sweep_duration_seconds_count 2', lines)
+
+    def test_instrumented_transport(self):
+        """Ensure Beaker calls are counted and timed by command."""
+        registry = metrics.enable()
+        transport = metrics.instrument(FakeTransport())
+        jobid = transport.job_submit('<job/>')
+        transport.job_results(jobid)
+        asyncio.run(transport.async_job_results(jobid))
+        with self.assertRaises(KeyError):
+            transport.job_results('J:404')
+
+        # optional methods stay missing
+        self.assertIsNone(getattr(transport, 'spool_job_results', None))
+        calls = registry.metrics['skt_beaker_calls_total'].values
+        self.assertEqual(calls, {(('command', 'job-results'),): 3,
+                                 (('command', 'job-submit'),): 1})
+        errors = registry.metrics['skt_beaker_call_errors_total'].values
+        self.assertEqual(errors, {(('command', 'job-results'),): 1})
+
+    def test_runner_metrics(self):
+        """Ensure the watch loop records its metrics."""
+        registry = metrics.enable()
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_infra_results.xml')
+        myrunner = BeakerRunner(transport=FakeTransport(job),
+                                **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+
+        result = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                              '4.17.0-rc1', True)
+
+        self.assertEqual(result, SKT_SUCCESS)
+        values = {name: metric.values
+                  for name, metric in registry.metrics.items()}
+        self.assertEqual(values['skt_resubmissions_total'], {(): 1})
+        self.assertEqual(values['skt_aborts_total'],
+                         {(('reason', 'infrastructure'),): 1})
+        self.assertEqual(values['skt_watchlist_size'], {(): 0})
+        self.assertEqual(values['skt_recipes'],
+                         {(('status', 'Completed'),): 2})
+        self.assertEqual(values['skt_sweep_duration_seconds'][()][2], 2)
+        self.assertEqual(values['skt_time_to_verdict_seconds'][()][2], 1)
+
+    def test_dropped_resubmissions(self):
+        """Ensure queued resubmissions thrown away are logged and counted."""
+        registry = metrics.enable()
+        transport = FakeTransport(misc.build_job(
+            'beaker_recipe_set_fail_results.xml',
+            'beaker_recipe_set_infra_results.xml'
+        ))
+        myrunner = BeakerRunner(transport=transport, **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+        myrunner.resubmit_window = 3600
+        myrunner.fail_fast = SKT_FAIL
+
+        with self.assertLogs(level='WARNING') as logs:
+            result = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                                  '4.17.0-rc1', True)
+
+        self.assertEqual(result, SKT_FAIL)
+        self.assertEqual(len(transport.submitted), 1)
+        self.assertIn('Not resubmitting RS:2', '\n'.join(logs.output))
+        self.assertEqual(
+            registry.metrics['skt_resubmissions_dropped_total'].values,
+            {(): 1}
+        )
+        self.assertEqual(myrunner.queued_resubmissions(), [])
+
+    def test_exporters(self):
+        """Ensure metrics are served over HTTP and written to a file."""
+        metrics.enable()
+        metrics.inc('skt_resubmissions_total')
+
+        server = metrics.start_http_server(0, '127.0.0.1')
+        try:
+            url = 'http://127.0.0.1:{}/metrics'.format(server.server_port)
+            with urllib.request.urlopen(url) as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn('skt_resubmissions_total 1\n', body)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'skt.prom')
+            metrics.write_textfile(path)
+            with open(path) as fileh:
+                self.assertEqual(fileh.read(), body)
+            self.assertEqual(os.listdir(tmpdir), ['skt.prom'])
@@ -0,0 +1,114 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for model module."""
+import unittest
+
+from defusedxml.ElementTree import fromstring
+
+from skt.model import RecipeAnalysis, RecipeRecord, TaskRecord
+from skt.model import summarize_recipe_set
+from tests import misc
+
+
+class TestModel(unittest.TestCase):
+    """Test cases for the recipe and task records."""
+
+    def test_recipe_record(self):
+        """Ensure the records hold the fields the verdicts are decided on."""
+        recipe = fromstring(misc.get_asset_content(
+            'beaker_recipe_set_results.xml'
+        )).find('recipe')
+        record = RecipeRecord.from_element(recipe)
+
+        self.assertEqual((record.id, record.system, record.status,
+                          record.result),
+                         ('5678', 'machine.beaker.org', 'Completed', 'Pass'))
+        self.assertEqual([task.name for task in record.tasks],
+                         ['/test/misc/machineinfo',
+                          '/distribution/kpkginstall', '/test/we/ran'])
+        self.assertEqual([task.kpkginstall for task in record.tasks],
+                         [False, True, False])
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_task_record(self):
+        """Ensure waived tasks and expired watchdogs are recorded."""
+        task = fromstring(
+            '<task name="Boot test" result="Warn" status="Aborted">'
+            '<params><param name="CKI_WAIVED" value="True"/></params>'
+            '<results><result>External Watchdog Expired</result></results>'
+            '</task>'
+        )
+        record = TaskRecord.from_element(task)
+
+        self.assertEqual((record.name, record.result, record.status),
+                         ('Boot test', 'Warn', 'Aborted'))
+        self.assertTrue(record.waived)
+        self.assertTrue(record.ewd)
+        self.assertFalse(record.kpkginstall)
+
+    def test_summarize_recipe_set(self):
+        """Ensure all recipes of a recipe set are summarized."""
+        root = fromstring(misc.get_asset_content('beaker_results.xml'))
+        records = summarize_recipe_set(root)
+
+        self.assertEqual([record.id for record in records],
+                         [recipe.attrib['id']
+                          for recipe in root.findall('.//recipe')])
+
+
+class TestRecipeAnalysis(unittest.TestCase):
+    """Test cases for RecipeAnalysis."""
+
+    @staticmethod
+    def analyze(*tasks):
+        """Analyze a recipe with tasks given as (name, result, options)."""
+        return RecipeAnalysis(RecipeRecord('1', 'host', 'Completed', 'Fail',
+                                           tuple(TaskRecord(name, result,
+                                                            'Completed',
+                                                            **options)
+                                                 for name, result, options
+                                                 in tasks)))
+
+    def test_analysis(self):
+        """Ensure the analysis finds everything in one pass."""
+        analysis = self.analyze(('/distribution/install', 'Pass', {}),
+                                ('/kpkginstall', 'Pass',
+                                 {'kpkginstall': True}),
+                                ('/test/skipped', 'Skip', {}),
+                                ('/test/failed', 'Fail', {'waived': True}),
+                                ('/test/panicked', 'Panic', {}))
+
+        self.assertEqual(analysis.kpkginstall_index, 1)
+        self.assertEqual(analysis.tests_run, ('/kpkginstall', '/test/failed',
+                                              '/test/panicked'))
+        self.assertEqual(analysis.first_non_pass, 3)
+        self.assertEqual(analysis.first_non_pass_task.name, '/test/failed')
+        self.assertEqual([features.waived for features in analysis.features],
+                         [False, False, False, True, False])
+        self.assertIsNone(analysis.not_booting)
+
+    def test_not_booting(self):
+        """Ensure expired watchdogs are only blamed on the boot test."""
+        self.assertTrue(self.analyze(
+            ('/distribution/install', 'Pass', {}),
+            ('Boot test', 'Warn', {'ewd': True})
+        ).not_booting)
+        self.assertFalse(self.analyze(
+            ('/distribution/install', 'Warn', {'ewd': True}),
+            ('Boot test', 'Warn', {'ewd': True})
+        ).not_booting)
+        self.assertFalse(self.analyze(
+            ('Boot test', 'Pass', {}),
+            ('/test', 'Warn', {'ewd': True})
+        ).not_booting)
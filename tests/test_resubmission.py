@@ -0,0 +1,95 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for resubmitting aborted recipe sets."""
+import itertools
+import unittest
+
+from defusedxml.ElementTree import fromstring
+
+from benchmarks.fakes import FakeTransport
+from skt.misc import SKT_SUCCESS
+from skt.runner import BeakerRunner
+from tests import misc
+
+
+class TestResubmission(unittest.TestCase):
+    """Test cases for resubmitting aborted recipe sets as new jobs."""
+
+    def test_resubmit_merged(self):
+        """Ensure recipe sets aborted in one sweep are resubmitted as one
+        job and watched."""
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_infra_results.xml',
+                             'beaker_recipe_set_infra_results.xml')
+        transport = FakeTransport(job)
+        myrunner = BeakerRunner(transport=transport, **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+
+        result = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                              '4.17.0-rc1', True)
+
+        self.assertEqual(result, SKT_SUCCESS)
+        self.assertEqual(len(transport.submitted), 2)
+        resubmitted = fromstring(transport.submitted[1])
+        self.assertEqual(resubmitted.find('whiteboard').text,
+                         'skt [RS:2 RS:3]')
+        self.assertEqual(myrunner.job_to_recipe_set_map,
+                         {'J:1': {'RS:1'}, 'J:2': {'RS:20', 'RS:21'}})
+
+    def test_resubmit_window(self):
+        """Ensure queued recipe sets wait for the window and are merged by
+        group."""
+        first = misc.build_job('beaker_recipe_set_fail_results.xml',
+                               'beaker_recipe_set_fail_results.xml',
+                               'beaker_recipe_set_fail_results.xml',
+                               'beaker_recipe_set_results.xml')
+        first.attrib['group'] = 'cki'
+        for recipe in first.findall('recipeSet/recipe')[:3]:
+            recipe.attrib.update({'status': 'Aborted', 'result': 'Warn'})
+        # move RS:3 and RS:4 into a second job without a group
+        second = fromstring('<job><whiteboard>skt</whiteboard></job>')
+        for recipe_set in first.findall('recipeSet')[2:]:
+            first.remove(recipe_set)
+            second.append(recipe_set)
+        running = second.find('recipeSet[@id="4"]/recipe')
+        running.attrib.update({'status': 'Running', 'result': 'New'})
+        transport = FakeTransport(first, second)
+        myrunner = BeakerRunner(transport=transport, **misc.DEFAULT_ARGS)
+        myrunner.resubmit_window = 3600
+        myrunner.max_aborted = 10
+        myrunner.watch_jobs(transport.job_submit('<job/>'),
+                            transport.job_submit('<job/>'))
+
+        def poll():
+            return myrunner.apply(itertools.chain.from_iterable(
+                myrunner.fetch_batch(batch)
+                for batch in myrunner.pending_batches()
+            ))
+
+        self.assertTrue(poll())
+        # RS:4 is still running, so the queued recipe sets wait
+        self.assertEqual(sorted(myrunner.queued_resubmissions()),
+                         ['RS:1', 'RS:2', 'RS:3'])
+        self.assertEqual(len(transport.submitted), 2)
+
+        running.attrib.update({'status': 'Completed', 'result': 'Pass'})
+        self.assertTrue(poll())
+        # with nothing else to watch they are submitted right away
+        jobs = sorted((len(fromstring(xml).findall('recipeSet')),
+                       fromstring(xml).attrib.get('group'))
+                      for xml in transport.submitted[2:])
+        self.assertEqual(jobs, [(1, None), (2, 'cki')])
+        self.assertEqual(myrunner.queued_resubmissions(), [])
+        self.assertEqual(len(myrunner.watchlist), 3)
+        self.assertFalse(myrunner.finished())
@@ -0,0 +1,71 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for results module."""
+import io
+import unittest
+
+from skt.misc import is_task_waived
+from skt.results import parse_results_file
+from skt.runner import BeakerRunner
+from tests import misc
+
+RESULTS_XML = b"""<recipeSet id="1">
+  <recipe id="1" result="Warn" status="Aborted">
+    <hostRequires><and><arch op="=" value="x86_64"/></and></hostRequires>
+    <logs><log name="console.log" href="http://example.com/"/></logs>
+    <task name="/distribution/install" result="Pass" status="Completed">
+      <logs><log name="taskout.log" href="http://example.com/"/></logs>
+      <results>
+        <result path="/" result="Pass">Install finished<logs/></result>
+      </results>
+    </task>
+    <task name="Boot test" result="Warn" status="Aborted">
+      <fetch url="https://example.com/archive.zip#distribution/kpkginstall"/>
+      <params><param name="CKI_WAIVED" value="false"/></params>
+      <results>
+        <result path="/" result="Warn">External Watchdog Expired</result>
+      </results>
+    </task>
+  </recipe>
+</recipeSet>"""
+
+
+class TestParseResultsFile(unittest.TestCase):
+    """Test cases for parse_results_file()."""
+
+    def setUp(self):
+        self.root = parse_results_file(io.BytesIO(RESULTS_XML))
+
+    def test_logs_dropped(self):
+        """Ensure logs are dropped."""
+        self.assertEqual(self.root.findall('.//logs'), [])
+
+    def test_result_text(self):
+        """Ensure only the result text the runner looks for is kept."""
+        texts = [result.text for result in self.root.iter('result')]
+        self.assertEqual(texts, [None, 'External Watchdog Expired'])
+
+    def test_used_data_kept(self):
+        """Ensure the data used to decide results and resubmit are kept."""
+        # pylint: disable=protected-access
+        recipe = self.root.find('recipe')
+        self.assertEqual(recipe.attrib['status'], 'Aborted')
+        self.assertIsNotNone(recipe.find('hostRequires/and/arch'))
+
+        tasks = recipe.findall('task')
+        self.assertFalse(is_task_waived(tasks[1]))
+        self.assertIs(BeakerRunner.get_kpkginstall_task(recipe), tasks[1])
+
+        runner = BeakerRunner(**misc.DEFAULT_ARGS)
+        self.assertTrue(runner._not_booting(recipe))
@@ -0,0 +1,112 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for resuming interrupted runs."""
+import unittest
+
+import mock
+from defusedxml.ElementTree import fromstring
+
+from benchmarks.fakes import FakeTransport
+from skt.async_runner import AsyncBeakerRunner
+from skt.misc import SKT_ERROR, SKT_FAIL, SKT_SUCCESS
+from skt.runner import BeakerRunner
+from tests import misc
+
+
+class TestResume(unittest.TestCase):
+    """Test cases for resume() and checkpointing the watch state."""
+
+    def test_resume(self):
+        """Ensure resume() watches the saved jobs without resubmitting."""
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_fail_results.xml',
+                             'beaker_recipe_set_infra_results.xml')
+        transport = FakeTransport(job)
+        transport.job_submit('<job/>')
+        myrunner = BeakerRunner(transport=transport, **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+        # RS:1 finished before the interruption, RS:3 was forgotten
+        completed = {'R:' + recipe.attrib['id']
+                     for recipe in job.findall('recipeSet[@id="1"]/recipe')}
+
+        result = myrunner.resume(['J:1'], {'RS:1', 'RS:2'}, completed, 1, 3)
+
+        self.assertEqual(result, SKT_FAIL)
+        self.assertEqual(len(transport.submitted), 1)
+        self.assertEqual(myrunner.job_to_recipe_set_map,
+                         {'J:1': {'RS:1', 'RS:2'}})
+        self.assertNotIn('RS:1', transport.calls)
+        self.assertNotIn('RS:3', transport.calls)
+        self.assertEqual(myrunner.aborted_count, 1)
+
+    def test_resume_resubmit_queue(self):
+        """Ensure recipe sets queued for resubmission by the previous run are
+        resubmitted, not watched again."""
+        for runner_class in [BeakerRunner, AsyncBeakerRunner]:
+            job = misc.build_job('beaker_recipe_set_results.xml',
+                                 'beaker_recipe_set_infra_results.xml')
+            transport = FakeTransport(job)
+            transport.job_submit('<job/>')
+            myrunner = runner_class(transport=transport, **misc.DEFAULT_ARGS)
+            myrunner.watchdelay = 0.01
+            myrunner.resubmit_window = 3600
+            completed = {
+                'R:' + recipe.attrib['id']
+                for recipe in job.findall('recipeSet[@id="1"]/recipe')
+            }
+
+            # RS:2 hit an infrastructure issue and was forgotten
+            result = myrunner.resume(['J:1'], {'RS:1'}, completed, 1, 3,
+                                     ['RS:2'])
+
+            self.assertEqual(result, SKT_SUCCESS)
+            # only the queued recipe set was submitted again
+            self.assertEqual(len(transport.submitted), 2)
+            self.assertEqual(
+                len(fromstring(transport.submitted[1]).findall('recipeSet')),
+                1
+            )
+            self.assertEqual(myrunner.aborted_count, 1)
+            self.assertEqual(myrunner.queued_resubmissions(), [])
+
+    def test_resume_aborted(self):
+        """Ensure the saved aborted count still limits resubmissions."""
+        job = misc.build_job('beaker_recipe_set_infra_results.xml')
+        transport = FakeTransport(job)
+        transport.job_submit('<job/>')
+        myrunner = BeakerRunner(transport=transport, **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+
+        result = myrunner.resume(['J:1'], {'RS:1'}, set(), 2, 3)
+
+        self.assertEqual(result, SKT_ERROR)
+        self.assertEqual(len(transport.submitted), 1)
+
+    def test_checkpoint(self):
+        """Ensure the watch state is checkpointed while waiting."""
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_infra_results.xml')
+        for interval, calls in [(0, 2), (3600, 1)]:
+            myrunner = BeakerRunner(transport=FakeTransport(job),
+                                    **misc.DEFAULT_ARGS)
+            myrunner.watchdelay = 0.01
+            myrunner.checkpoint = mock.Mock(side_effect=[OSError, None])
+            myrunner.checkpoint_interval = interval
+
+            result = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                                  '4.17.0-rc1', True)
+
+            # a failing checkpoint doesn't stop the run
+            self.assertEqual(result, SKT_SUCCESS)
+            self.assertEqual(myrunner.checkpoint.call_count, calls)
@@ -21,6 +21,7 @@ import mock
 from defusedxml.ElementTree import fromstring
 from defusedxml.ElementTree import tostring
 
+from benchmarks.fakes import FakeTransport, get_taskspec_results
 from skt import runner
 from skt.misc import SKT_FAIL, SKT_SUCCESS, SKT_ERROR
 from tests import misc
@@ -249,6 +250,55 @@ class TestRunner(unittest.TestCase):
         self.assertEqual(re.sub(r'[\s]+', '', exp_result),
                          re.sub(r'[\s]+', '', result))
 
+    def test_blacklist_hreq_dedup(self):
+        """ Ensure blacklist_hreq doesn't add hostnames twice."""
+        # pylint: disable=W0212,E1101
+        initial = """<hostRequires><and>
+        <hostname op="!=" value="host1"/></and></hostRequires>"""
+
+        exp_result = """<hostRequires><and>
+        <hostname op="!=" value="host1"/>
+        <hostname op="!=" value="host2"/></and></hostRequires>"""
+
+        self.myrunner.blacklisted = ['host1', 'HOST2 ', 'host1', 'host2']
+        self.assertEqual(self.myrunner.blacklisted, ['host1', 'host2'])
+
+        hreq_node = fromstring(initial)
+        for _ in range(2):
+            etree_result = self.myrunner._BeakerRunner__blacklist_hreq(
+                hreq_node
+            )
+        result = tostring(etree_result).decode('utf-8')
+        self.assertEqual(re.sub(r'[\s]+', '', exp_result),
+                         re.sub(r'[\s]+', '', result))
+
+    def test_blacklist_reload(self):
+        """ Ensure the blacklist is reloaded when its file changes."""
+        # pylint: disable=W0212,E1101
+        with tempfile.NamedTemporaryFile('w') as temp:
+            temp.write('host1\n')
+            temp.flush()
+            myrunner = runner.BeakerRunner(blacklist=temp.name,
+                                           **misc.DEFAULT_ARGS)
+            self.assertEqual(myrunner.blacklisted, ['host1'])
+
+            temp.write('host2\n')
+            temp.flush()
+            myrunner.blacklist_mtime -= 1
+            job = fromstring('<job><recipeSet><recipe><hostRequires/>'
+                             '</recipe></recipeSet></job>')
+            myrunner.add_blacklist2recipes(job)
+
+        self.assertEqual(myrunner.blacklisted, ['host1', 'host2'])
+        self.assertEqual([hostname.get('value')
+                          for hostname in job.iter('hostname')],
+                         ['host1', 'host2'])
+
+        # keep the last blacklist when the file is gone
+        myrunner.blacklist_mtime -= 1
+        myrunner.add_blacklist2recipes(job)
+        self.assertEqual(myrunner.blacklisted, ['host1', 'host2'])
+
     @mock.patch('builtins.open', create=True)
     @mock.patch('subprocess.Popen')
     def test_add_to_watchlist(self, mock_popen, mock_open):
@@ -295,6 +345,100 @@ class TestRunner(unittest.TestCase):
         result = self.myrunner.getresultstree('RS:123')
         self.assertEqual(next(x.text for x in result.iter('test')), 'TEST')
 
+    def test_getresultstree_unchanged(self):
+        """Ensure unchanged results are not parsed again."""
+        job = misc.build_job('beaker_recipe_set_results.xml')
+        transport = FakeTransport(job)
+        transport.job_submit('<job/>')
+        myrunner = runner.BeakerRunner(transport=transport,
+                                       **misc.DEFAULT_ARGS)
+
+        with mock.patch('skt.runner.fromstring',
+                        side_effect=fromstring) as mock_fromstring:
+            first = myrunner.getresultstree('RS:1')
+            second = myrunner.getresultstree('RS:1')
+
+        self.assertIs(first, second)
+        mock_fromstring.assert_called_once()
+        self.assertEqual(myrunner.get_change_hit_rates(), (0.5, None))
+
+    def test_getresultstree_stream(self):
+        """Ensure results are parsed from a spool file when streaming."""
+        xml = misc.get_asset_content('beaker_results.xml').encode()
+        transport = mock.Mock()
+        myrunner = runner.BeakerRunner(transport=transport,
+                                       **misc.DEFAULT_ARGS)
+        myrunner.stream_results = True
+
+        def spool(taskspec):
+            # pylint: disable=unused-argument
+            fileobj = tempfile.TemporaryFile()
+            fileobj.write(xml)
+            fileobj.seek(0)
+            return fileobj
+
+        transport.spool_job_results.side_effect = spool
+        first = myrunner.getresultstree('J:1')
+        second = myrunner.getresultstree('J:1')
+
+        self.assertIs(first, second)
+        self.assertEqual(first.findall('.//logs'), [])
+        self.assertEqual(len(first.findall('.//task')), 2)
+        transport.job_results.assert_not_called()
+
+    def test_process_recipe_set_unchanged(self):
+        """Ensure only recipe sets with changed recipes are processed."""
+        root = fromstring(misc.get_asset_content(
+            'beaker_recipe_set_results.xml'
+        ))
+        recipe = root.find('recipe')
+        recipe.attrib['id'] = '1'
+        recipe.attrib['result'] = 'Fail'
+        self.myrunner.completed_recipes['RS:1'] = set()
+        self.myrunner.watchlist.add('RS:1')
+
+        with mock.patch.object(self.myrunner,
+                               '_BeakerRunner__handle_test_fail',
+                               return_value=(True, False)) as mock_fail:
+            for status in ['Running', 'Running', 'Completed', 'Completed']:
+                recipe.attrib['status'] = status
+                self.assertTrue(self.myrunner.apply([('RS:1', root)]))
+
+        self.assertEqual(self.myrunner.completed_recipes['RS:1'], {'R:1'})
+        self.assertNotIn('RS:1', self.myrunner.watchlist)
+        self.assertEqual(self.myrunner.change_stats['recipe_set_changed'], 2)
+        self.assertEqual(self.myrunner.change_stats['recipe_set_unchanged'], 2)
+        mock_fail.assert_called_once()
+
+    @mock.patch('skt.runner.BeakerRunner._BeakerRunner__jobsubmit')
+    def test_run_wait_analysis(self, mock_jobsubmit):
+        """ Ensure every finished recipe is analyzed only once."""
+        job = misc.build_job('beaker_recipe_set_fail_results.xml',
+                             'beaker_recipe_set_panic_results.xml')
+        mock_jobsubmit.return_value = 'J:0001'
+        self.myrunner.watchdelay = 0.01
+
+        def fake_getresultstree(sself, taskspec):
+            result = fromstring(tostring(get_taskspec_results(job,
+                                                              taskspec)))
+            sself.recipe_set_results[taskspec] = result
+            return result
+
+        with mock.patch('skt.runner.BeakerRunner.getresultstree',
+                        fake_getresultstree):
+            analysis_init = runner.RecipeAnalysis.__init__
+            with mock.patch.object(runner.RecipeAnalysis, '__init__',
+                                   autospec=True,
+                                   side_effect=analysis_init) as mock_analysis:
+                retcode = self.myrunner.run('http://example.com/kernel.tar.gz',
+                                            self.max_aborted, '4.17.0-rc1',
+                                            True)
+
+        self.assertEqual(retcode, SKT_FAIL)
+        self.assertEqual(mock_analysis.call_count, 2)
+        self.assertEqual(set(self.myrunner.recipe_analyses),
+                         {('1', 'Completed'), ('2', 'Completed')})
+
     def test_forget_taskspec_withr(self):
         """Ensure __forget_taskspec() works with recipe sets."""
         # pylint: disable=protected-access,E1101
@@ -337,27 +481,36 @@ class TestRunner(unittest.TestCase):
         self.assertEqual(result, 1)
         mock_logging.assert_called()
 
-    def test_recipe_set_to_job(self):
-        """Ensure __recipe_set_to_job() works."""
+    def resubmitted_job(self, recipe_set, samehost=False):
+        """Build the job resubmitting a recipe set, like
+        _flush_resubmissions()."""
         # pylint: disable=W0212,E1101
+        group, tmp = self.myrunner._BeakerRunner__prepare_recipe_set(
+            recipe_set, samehost
+        )
+        return self.myrunner._BeakerRunner__build_job(
+            group, self.myrunner.whiteboard, [tmp]
+        )
+
+    def test_recipe_set_to_job(self):
+        """Ensure a recipe set is turned into a job to resubmit."""
         beaker_xml = misc.get_asset_content('beaker_recipe_set_results.xml')
         xml_parsed = fromstring(beaker_xml)
 
-        result = self.myrunner._BeakerRunner__recipe_set_to_job(xml_parsed)
+        result = self.resubmitted_job(xml_parsed)
         self.assertEqual(result.tag, 'job')
 
-        result = self.myrunner._BeakerRunner__recipe_set_to_job(xml_parsed,
-                                                                samehost=True)
+        result = self.resubmitted_job(xml_parsed, samehost=True)
         self.assertEqual(result.tag, 'job')
 
     def test_recipe_set_to_job_whst(self):
-        """Ensure __recipe_set_to_job() works with hostname."""
-        # pylint: disable=W0212,E1101
+        """Ensure a recipe set is turned into a job to resubmit with
+        hostname."""
         beaker_xml = """<recipeSet><recipe><hostRequires>
         <hostname op="!=" value="hst1"/></hostRequires></recipe></recipeSet>"""
         xml_parsed = fromstring(beaker_xml)
 
-        result = self.myrunner._BeakerRunner__recipe_set_to_job(xml_parsed)
+        result = self.resubmitted_job(xml_parsed)
 
         # check that <hostname op="!=" value="hst1"/> wasn't removed
         self.assertEqual(len(result.findall('.//hostname')), 1)
@@ -565,3 +718,84 @@ class TestRunner(unittest.TestCase):
 
         # see method description for details why SKT_FAIL
         self.assertEqual(SKT_FAIL, result)
+
+    @mock.patch('skt.runner.BeakerRunner._BeakerRunner__jobsubmit')
+    def test_run_wait_parallel(self, mock_jobsubmit):
+        """ Ensure polling recipe sets in parallel gives the same results as
+            polling them serially."""
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_fail_results.xml',
+                             'beaker_recipe_set_panic_results.xml')
+
+        def fake_getresultstree(sself, taskspec):
+            result = get_taskspec_results(job, taskspec)
+            sself.recipe_set_results[taskspec] = result
+            return result
+
+        mock_jobsubmit.return_value = "J:0001"
+        url = "http://machine1.example.com/builds/1234567890.tar.gz"
+        release = "4.17.0-rc1"
+
+        results = []
+        with mock.patch('skt.runner.BeakerRunner.getresultstree',
+                        fake_getresultstree):
+            for poll_workers in [1, 4]:
+                myrunner = runner.BeakerRunner(**misc.DEFAULT_ARGS)
+                myrunner.watchdelay = 0.01
+                myrunner.poll_workers = poll_workers
+                retcode = myrunner.run(url, self.max_aborted, release, True)
+                results.append((retcode, myrunner.completed_recipes,
+                                myrunner.job_to_recipe_set_map))
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[1][0], SKT_FAIL)
+        self.assertEqual(results[1][1], {'RS:1': {'R:1'}, 'RS:2': {'R:2'},
+                                         'RS:3': {'R:3'}})
+
+    @mock.patch('skt.runner.BeakerRunner._BeakerRunner__jobsubmit')
+    def test_run_wait_batched(self, mock_jobsubmit):
+        """ Ensure recipe sets of the same job are fetched with one call and
+            split back into per-recipe set results."""
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_fail_results.xml',
+                             'beaker_recipe_set_results.xml')
+        taskspecs = []
+
+        def fake_getresultstree(sself, taskspec):
+            taskspecs.append(taskspec)
+            result = get_taskspec_results(job, taskspec)
+            sself.recipe_set_results[taskspec] = result
+            return result
+
+        mock_jobsubmit.return_value = "J:0001"
+        self.myrunner.watchdelay = 0.01
+
+        with mock.patch('skt.runner.BeakerRunner.getresultstree',
+                        fake_getresultstree):
+            self.myrunner.run('http://example.com/kernel.tar.gz',
+                              self.max_aborted, '4.17.0-rc1', True)
+
+        # one call to add the job to the watchlist, one for the only sweep
+        self.assertEqual(taskspecs, ['J:0001', 'J:0001'])
+        # the finished recipe sets are summarized and their trees released
+        self.assertEqual(self.myrunner.recipe_set_results, {})
+        for recipe_id, recipe_set_id in enumerate(['RS:1', 'RS:2', 'RS:3'],
+                                                  1):
+            records = self.myrunner.recipe_set_summaries[recipe_set_id]
+            self.assertEqual([record.id for record in records],
+                             [str(recipe_id)])
+
+    @mock.patch('logging.warning')
+    @mock.patch('logging.error')
+    @mock.patch('skt.runner.BeakerRunner._BeakerRunner__jobsubmit')
+    def test_run_wait_adaptive(self, mock_logging, mock_logging_err,
+                               mock_jobsubmit):
+        """Ensure BeakerRunner.run works with adaptive polling."""
+        # pylint: disable=W0613
+        self.myrunner.adaptive_polling = True
+        self.myrunner.poll_floor = 0.001
+        self.myrunner.poll_ceiling = 0.05
+
+        result = misc.exec_on(self.myrunner, mock_jobsubmit,
+                              'beaker_results2.xml', 1, 'Completed')
+        self.assertEqual(SKT_FAIL, result)
@@ -0,0 +1,104 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for scheduler module."""
+import unittest
+
+from defusedxml.ElementTree import fromstring
+
+from skt.scheduler import PollScheduler
+
+
+def recipe_set(*recipes):
+    """Build recipe set results with recipes of given status and tasks.
+
+    Args:
+        recipes: (recipe status, task attribute strings) tuples
+    Returns:
+        xml root
+    """
+    xml = '<recipeSet id="1">'
+    for status, tasks in recipes:
+        xml += '<recipe status="{}">'.format(status)
+        xml += ''.join('<task {}/>'.format(task) for task in tasks)
+        xml += '</recipe>'
+
+    return fromstring(xml + '</recipeSet>')
+
+
+class TestPollScheduler(unittest.TestCase):
+    """Test cases for PollScheduler."""
+
+    def setUp(self):
+        self.scheduler = PollScheduler(60, 10, 600, jitter=0)
+
+    def test_queued_slower(self):
+        """Ensure recipes waiting for a machine are polled less often."""
+        root = recipe_set(('Queued', []))
+        self.assertEqual(self.scheduler.get_interval(root), 240)
+
+    def test_nearly_done(self):
+        """Ensure nearly finished recipes are polled often."""
+        root = recipe_set(('Running', [
+            'status="Completed" avg_time="3600"',
+            'status="Running" avg_time="600" duration="0:09:00"',
+        ]))
+        self.assertEqual(self.scheduler.get_interval(root), 30)
+        self.assertEqual(self.scheduler.reschedule('RS:1', root, now=0), 30)
+
+    def test_no_hints(self):
+        """Ensure the base interval is used without expected times."""
+        root = recipe_set(('Running', ['status="Running"']))
+        self.assertEqual(self.scheduler.get_interval(root), 60)
+
+    def test_most_urgent_recipe(self):
+        """Ensure the most urgent unfinished recipe decides."""
+        root = recipe_set(('Queued', []), ('Completed', []),
+                          ('Running', ['status="Running" avg_time="100"']))
+        self.assertEqual(self.scheduler.get_interval(root), 50)
+
+    def test_backoff(self):
+        """Ensure the delay backs off while nothing changes, up to the
+        ceiling."""
+        root = recipe_set(('Waiting', []))
+        delays = [self.scheduler.reschedule('RS:1', root, now=0)
+                  for _ in range(6)]
+        self.assertEqual(delays[:3], [120, 180, 270])
+        self.assertEqual(delays[-1], 600)
+
+        root = recipe_set(('Running', ['status="Running"']))
+        self.assertEqual(self.scheduler.reschedule('RS:1', root, now=0), 60)
+
+    def test_floor(self):
+        """Ensure the delay doesn't go below the floor."""
+        root = recipe_set(('Running', ['status="Running" avg_time="1"']))
+        self.assertEqual(self.scheduler.reschedule('RS:1', root, now=0), 10)
+
+    def test_pop_due(self):
+        """Ensure recipe sets are taken off the queue in due order."""
+        self.scheduler.sync({'RS:1', 'RS:2', 'RS:3'}, now=0)
+        self.scheduler.reschedule('RS:1', recipe_set(('Queued', [])), now=0)
+        self.scheduler.reschedule('RS:2', recipe_set(
+            ('Running', ['status="Running"'])
+        ), now=0)
+
+        self.assertEqual(self.scheduler.next_due(), 60)
+        self.assertEqual(sorted(self.scheduler.pop_due(now=60)),
+                         ['RS:2', 'RS:3'])
+        self.assertEqual(self.scheduler.pop_due(now=239), [])
+        self.assertEqual(self.scheduler.pop_due(now=240), ['RS:1'])
+        self.assertIsNone(self.scheduler.next_due())
+
+        # popped recipe sets which are still watched are scheduled again
+        self.scheduler.sync({'RS:1'}, now=300)
+        self.assertEqual(self.scheduler.next_due(), 360)
@@ -0,0 +1,131 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for splitting module."""
+import json
+import os
+import tempfile
+import unittest
+
+from defusedxml.ElementTree import fromstring
+from defusedxml.ElementTree import tostring
+
+from benchmarks.fakes import FakeTransport
+from skt.misc import SKT_FAIL
+from skt.runner import BeakerRunner
+from skt.splitting import DEFAULT_TASK_TIME, get_recipe_set_duration
+from skt.splitting import load_task_durations, split_job
+from tests import misc
+
+
+def build_template(*recipe_set_times):
+    """Build a job template with recipe sets with tasks of the given
+    expected times.
+
+    Args:
+        recipe_set_times: list of the expected task times of each recipe of
+                          each recipe set
+    Returns:
+        xml root of the job
+    """
+    job = fromstring('<job retention_tag="scratch"><whiteboard>skt'
+                     '</whiteboard></job>')
+    for set_number, recipes in enumerate(recipe_set_times):
+        recipe_set = fromstring('<recipeSet/>')
+        recipe_set.attrib['priority'] = str(set_number)
+        for task_times in recipes:
+            recipe = fromstring('<recipe><hostRequires/></recipe>')
+            for task_time in task_times:
+                task = fromstring('<task name="/test"/>')
+                if task_time is not None:
+                    task.attrib['expectedTime'] = str(task_time)
+                recipe.append(task)
+            recipe_set.append(recipe)
+        job.append(recipe_set)
+
+    return job
+
+
+class TestSplitting(unittest.TestCase):
+    """Test cases for splitting jobs."""
+
+    def test_recipe_set_duration(self):
+        """Ensure the longest recipe decides the recipe set duration."""
+        job = build_template([[100, 200], [50, None]])
+
+        self.assertEqual(get_recipe_set_duration(job.find('recipeSet')),
+                         50 + DEFAULT_TASK_TIME)
+        self.assertEqual(get_recipe_set_duration(job.find('recipeSet'),
+                                                 {'/test': 1000}), 1050)
+
+    def test_split_job(self):
+        """Ensure the recipe sets are packed into balanced jobs."""
+        job = build_template([[400]], [[300]], [[200]], [[200]], [[100]])
+
+        jobs = split_job(job, 2)
+
+        durations = [sum(get_recipe_set_duration(recipe_set)
+                         for recipe_set in part.findall('recipeSet'))
+                     for part in jobs]
+        self.assertEqual(sorted(durations), [600, 600])
+        for part in jobs:
+            self.assertEqual(part.attrib, {'retention_tag': 'scratch'})
+            self.assertEqual(part.find('whiteboard').text, 'skt')
+            # the original order is kept
+            priorities = [int(recipe_set.attrib['priority'])
+                          for recipe_set in part.findall('recipeSet')]
+            self.assertEqual(priorities, sorted(priorities))
+
+    def test_split_job_small(self):
+        """Ensure jobs aren't split into more parts than recipe sets."""
+        job = build_template([[100]], [[100]])
+
+        self.assertEqual(len(split_job(job, 5)), 2)
+        self.assertEqual(split_job(job, 1), [job])
+
+    def test_load_task_durations(self):
+        """Ensure task durations are loaded and validated."""
+        with tempfile.NamedTemporaryFile('w') as fileh:
+            json.dump({'/test': 60}, fileh)
+            fileh.flush()
+            self.assertEqual(load_task_durations(fileh.name), {'/test': 60})
+
+        with tempfile.NamedTemporaryFile('w') as fileh:
+            json.dump({'/test': 'long'}, fileh)
+            fileh.flush()
+            with self.assertRaises(ValueError):
+                load_task_durations(fileh.name)
+
+    def test_run_split(self):
+        """Ensure split jobs are watched as one run."""
+        template = build_template([[400]], [[300]], [[200]])
+        fail_job = misc.build_job('beaker_recipe_set_fail_results.xml')
+        transport = FakeTransport(fail_job)
+        with tempfile.NamedTemporaryFile('wb', suffix='.xml',
+                                         delete=False) as fileh:
+            fileh.write(tostring(template))
+        try:
+            myrunner = BeakerRunner(fileh.name, transport=transport)
+            myrunner.watchdelay = 0.01
+            myrunner.split_jobs = 2
+
+            result = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                                  '4.17.0-rc1', True)
+        finally:
+            os.unlink(fileh.name)
+
+        self.assertEqual(len(transport.submitted), 2)
+        self.assertEqual(sorted(myrunner.job_to_recipe_set_map),
+                         ['J:1', 'J:2'])
+        # the failure in one of the jobs fails the whole run
+        self.assertEqual(result, SKT_FAIL)
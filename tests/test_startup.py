@@ -0,0 +1,87 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for the startup of the skt command."""
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only the commands need, not loaded by importing the entry point
+HEAVY_MODULES = ['rcdefinition', 'defusedxml', 'cki_lib', 'requests',
+                 'subprocess', 'asyncio', 'xmlrpc', 'http.server',
+                 'skt.runner', 'skt.beaker', 'skt.daemon', 'skt.metrics']
+
+# Modules of optional features, not loaded by a plain "skt run"
+OPTIONAL_MODULES = ['asyncio', 'http.server', 'skt.async_runner',
+                    'skt.daemon', 'skt.notifications', 'skt.export',
+                    'skt.splitting']
+
+RUN_SKT = 'from skt.executable import main; main()'
+
+
+def heavy_modules_loaded(code, *argv, modules=None):
+    """
+    Get the heavy modules loaded by running Python code, also if it exits.
+
+    Args:
+        code:    Python code to run.
+        argv:    Arguments of the code.
+        modules: List of the modules to look for, HEAVY_MODULES by default.
+
+    Returns:
+        Sorted list of the modules which were loaded.
+    """
+    modules = modules or HEAVY_MODULES
+    report = ('import atexit, sys\n'
+              'atexit.register(lambda: sys.stderr.write("\\nLOADED: " + " "'
+              '.join(m for m in {!r} if m in sys.modules)))\n'.format(modules))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + (os.pathsep + env['PYTHONPATH']
+                                if env.get('PYTHONPATH') else '')
+    process = subprocess.run([sys.executable, '-c', report + code] +
+                             list(argv), env=env, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, universal_newlines=True,
+                             check=False)
+    return sorted(process.stderr.rpartition('LOADED: ')[2].split())
+
+
+class TestStartup(unittest.TestCase):
+    """Test cases for the startup of the skt command. The startup time
+    budget is checked by python3 -m benchmarks.startup."""
+
+    def test_import_lazy(self):
+        """Ensure importing the entry point doesn't load the commands."""
+        self.assertEqual(heavy_modules_loaded('import skt.executable'), [])
+
+    def test_arguments_lazy(self):
+        """Ensure help and argument errors don't load the commands."""
+        self.assertEqual(heavy_modules_loaded(RUN_SKT, '--help'), [])
+        self.assertEqual(
+            heavy_modules_loaded(RUN_SKT, 'run', '--poll-workers', 'many'),
+            []
+        )
+
+    def test_run_lazy(self):
+        """Ensure the runner and the transports don't load the optional
+        features."""
+        self.assertEqual(
+            heavy_modules_loaded('import skt.runner, skt.beaker',
+                                 modules=OPTIONAL_MODULES), []
+        )
+
+    def test_heavy_modules_detected(self):
+        """Ensure loading the commands is noticed."""
+        self.assertIn('skt.runner', heavy_modules_loaded('import skt.runner'))
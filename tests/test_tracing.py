@@ -0,0 +1,142 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for tracing module."""
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks.fakes import FakeTransport
+from skt import tracing
+from skt.async_runner import AsyncBeakerRunner
+from skt.misc import SKT_SUCCESS
+from skt.runner import BeakerRunner
+from tests import misc
+
+
+class TestTracing(unittest.TestCase):
+    """Test cases for the tracer and the traced phases."""
+
+    def setUp(self):
+        tracing.disable()
+
+    def tearDown(self):
+        tracing.disable()
+
+    def test_disabled(self):
+        """Ensure nothing is recorded while disabled."""
+        with tracing.span('run', template='job.xml') as span:
+            span.set(job='J:1')
+        tracing.recipe_status('R:1', 'Queued', 'RS:1')
+
+        self.assertIs(tracing.span('run'), tracing.NULL_SPAN)
+        self.assertIsNone(tracing.TRACER)
+
+    def test_span(self):
+        """Ensure spans are recorded as complete events with attributes."""
+        tracer = tracing.enable()
+        with tracing.span('jobsubmit') as span:
+            span.set(job='J:1')
+        with self.assertRaises(ValueError):
+            with tracing.span('parse', taskspec='J:1'):
+                raise ValueError
+
+        self.assertEqual(len(tracer.events), 2)
+        submit = tracer.events[0]
+        parse = tracer.events[1]
+        self.assertEqual(submit['name'], 'jobsubmit')
+        self.assertEqual(submit['ph'], 'X')
+        self.assertEqual(submit['args'], {'job': 'J:1'})
+        self.assertGreaterEqual(submit['dur'], 0)
+        self.assertGreaterEqual(parse['ts'], submit['ts'])
+        self.assertEqual(parse['args'], {'taskspec': 'J:1',
+                                         'error': 'ValueError'})
+
+    def test_max_events(self):
+        """Ensure events over the limit are dropped and counted."""
+        tracer = tracing.enable(max_events=1)
+        for _ in range(3):
+            with tracing.span('sweep'):
+                pass
+
+        trace = tracer.to_json()
+        self.assertEqual(len(tracer.events), 1)
+        self.assertEqual(trace['otherData'], {'dropped_events': 2})
+
+    def test_recipe_statuses(self):
+        """Ensure the time spent in each recipe status is traced."""
+        tracer = tracing.enable()
+        for status in ['Queued', 'Queued', 'Installing', 'Running']:
+            tracing.recipe_status('R:1', status, 'RS:1')
+
+        events = [event for event in tracer.to_json()['traceEvents']
+                  if event['ph'] == 'X']
+        self.assertEqual([event['name'] for event in events],
+                         ['Queued', 'Installing', 'Running'])
+        for event in events:
+            self.assertEqual(event['tid'], tracing.BEAKER_TID)
+            self.assertEqual(event['args'],
+                             {'recipe': 'R:1', 'recipe_set': 'RS:1'})
+        # the open status isn't recorded twice by the next write
+        self.assertEqual(len(tracer.to_json()['traceEvents']),
+                         len(events) + 2)
+
+    def check_run_trace(self, runner_class):
+        """Run a job with a resubmission, return the names of the spans."""
+        tracer = tracing.enable()
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_infra_results.xml')
+        myrunner = runner_class(transport=FakeTransport(job),
+                                **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+
+        result = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                              '4.17.0-rc1', True)
+
+        self.assertEqual(result, SKT_SUCCESS)
+        names = [event['name'] for event in tracer.to_json()['traceEvents']]
+        for name in ['run', 'jobsubmit', 'sweep', 'getresultstree', 'parse',
+                     'decide_run_result_by_task', 'getresults', 'Completed']:
+            self.assertIn(name, names)
+        self.assertEqual(names.count('jobsubmit'), 2)
+        run, = [event for event in tracer.events if event['name'] == 'run']
+        self.assertEqual(run['args'], {'template': myrunner.template,
+                                       'wait': True})
+        return names
+
+    def test_runner_trace(self):
+        """Ensure the phases of a run are traced."""
+        names = self.check_run_trace(BeakerRunner)
+        self.assertIn('resubmit', names)
+
+    def test_async_runner_trace(self):
+        """Ensure the phases of an asynchronous run are traced."""
+        self.check_run_trace(AsyncBeakerRunner)
+
+    def test_write_trace(self):
+        """Ensure the trace is written as JSON."""
+        tracing.enable()
+        with tracing.span('run'):
+            pass
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'trace.json')
+            tracing.write_trace(path)
+            with open(path) as fileh:
+                trace = json.load(fileh)
+            self.assertEqual(os.listdir(tmpdir), ['trace.json'])
+
+        self.assertEqual(trace['displayTimeUnit'], 'ms')
+        self.assertIn('run', [event['name']
+                              for event in trace['traceEvents']])
@@ -0,0 +1,109 @@
+# Copyright (c) 2020 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General Public
+# License v.2 or later.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+"""Test cases for verdict module."""
+import unittest
+
+from benchmarks.fakes import FakeTransport
+from skt.misc import SKT_BOOT, SKT_ERROR, SKT_FAIL, SKT_SUCCESS
+from skt.runner import BeakerRunner
+from skt.verdict import VerdictAggregator
+from tests import misc
+
+
+class TestVerdictAggregator(unittest.TestCase):
+    """Test cases for VerdictAggregator."""
+
+    def test_running_result(self):
+        """Ensure the most severe verdict and its first recipe are known as
+        verdicts are recorded."""
+        verdicts = VerdictAggregator()
+        self.assertEqual(verdicts.retcode, SKT_SUCCESS)
+
+        verdicts.add('RS:1', 'R:1', None, SKT_SUCCESS, 'passed')
+        verdicts.add('RS:1', 'R:2', None, SKT_FAIL, 'failed')
+        verdicts.add('RS:2', 'R:3', None, SKT_BOOT, 'not booting')
+        verdicts.add('RS:2', 'R:4', None, SKT_FAIL, 'failed too')
+        # the first verdict of a recipe counts
+        verdicts.add('RS:2', 'R:4', None, SKT_ERROR, 'aborted')
+
+        self.assertEqual(verdicts.retcode, SKT_BOOT)
+        self.assertEqual(verdicts.first(SKT_FAIL), 'R:2')
+        self.assertIsNone(verdicts.first(SKT_ERROR))
+        self.assertEqual(verdicts.count(SKT_FAIL), 2)
+        self.assertEqual(verdicts.get('RS:2'), {
+            'R:3': (SKT_BOOT, 'not booting'), 'R:4': (SKT_FAIL, 'failed too')
+        })
+        self.assertEqual(verdicts.lookup('RS:2', 'R:4'),
+                         (None, SKT_FAIL, 'failed too'))
+        self.assertIsNone(verdicts.lookup('RS:2', 'R:5'))
+
+    def test_forget(self):
+        """Ensure verdicts of forgotten recipe sets don't count."""
+        verdicts = VerdictAggregator()
+        verdicts.add('RS:1', 'R:1', None, SKT_FAIL, 'failed')
+        verdicts.add('RS:2', 'R:2', None, SKT_ERROR, 'aborted')
+
+        verdicts.forget('RS:2')
+        verdicts.add('RS:2', 'R:3', None, SKT_ERROR, 'aborted')
+
+        self.assertEqual(verdicts.retcode, SKT_FAIL)
+        self.assertEqual(verdicts.count(SKT_ERROR), 0)
+        self.assertTrue(verdicts.recorded('RS:2', 'R:3'))
+
+    def test_redecide(self):
+        """Ensure recorded verdicts can be decided again."""
+        verdicts = VerdictAggregator()
+        verdicts.add('RS:1', 'R:1', 'pass', SKT_SUCCESS, 'passed')
+        verdicts.add('RS:1', 'R:2', 'fail', SKT_FAIL, 'failed')
+
+        verdicts.redecide(lambda analysis, recipe_id: (
+            (SKT_SUCCESS, 'passed') if analysis == 'pass'
+            else (SKT_ERROR, 'too many aborted recipes!')
+        ))
+
+        self.assertEqual(verdicts.retcode, SKT_ERROR)
+        self.assertEqual(verdicts.first(SKT_ERROR), 'R:2')
+        self.assertEqual(verdicts.count(SKT_FAIL), 0)
+
+
+class TestRunnerVerdicts(unittest.TestCase):
+    """Test cases for the verdicts recorded while watching."""
+
+    def test_recorded_while_watching(self):
+        """Ensure verdicts are recorded as recipes finish, without those of
+        resubmitted recipe sets with infrastructure issues."""
+        job = misc.build_job('beaker_recipe_set_results.xml',
+                             'beaker_recipe_set_infra_results.xml',
+                             'beaker_recipe_set_fail_results.xml')
+        transport = FakeTransport(job)
+        myrunner = BeakerRunner(transport=transport, **misc.DEFAULT_ARGS)
+        myrunner.watchdelay = 0.01
+        retcodes = []
+        # the watch state is checkpointed after every poll
+        myrunner.checkpoint = lambda: retcodes.append(
+            myrunner.verdicts.retcode
+        )
+        myrunner.checkpoint_interval = 0
+        result = myrunner.run('http://example.com/kernel.tar.gz', 3,
+                              '4.17.0-rc1', True)
+
+        self.assertEqual(result, SKT_FAIL)
+        # the failure was known before the run ended
+        self.assertEqual(retcodes[0], SKT_FAIL)
+        self.assertEqual(myrunner.verdicts.first(SKT_FAIL), 'R:3')
+        self.assertIn('RS:2', myrunner.verdicts.forgotten)
+        self.assertEqual(myrunner.verdicts.get('RS:2'), {})
+        # the resubmitted recipe set passed
+        self.assertEqual(len(transport.submitted), 2)
+        self.assertEqual(myrunner.verdicts.count(SKT_SUCCESS), 2)